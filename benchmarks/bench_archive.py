@@ -0,0 +1,79 @@
+"""
+バイナリアーカイブの大きさと走査速度
+
+--sessions 件のセッション（1 件 64 試行）を CSV とアーカイブの両方に書いて大きさを比べ、
+続けてアーカイブを --trials 件まで複製して全件走査の速さ（MiB/s・試行/s）を測る。
+100M 試行（約 1.5GiB）で測るときは --trials 100000000。
+
+    python benchmarks/bench_archive.py [--sessions 2000] [--trials 20000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import archive, engine  # noqa: E402
+from cst.artifacts import build_csv  # noqa: E402
+
+
+def make_session():
+    state = engine.default_state()
+    engine.start_test(state)
+    while not state["finished"]:
+        engine.score_selection(state, random.randrange(4))
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--trials", type=int, default=20_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = archive.Archive(os.path.join(tmp, "archive"))
+        csv_bytes = 0
+        sessions = [make_session() for _ in range(args.sessions)]
+        t0 = time.perf_counter()
+        for i, state in enumerate(sessions):
+            store.append_session(f"{i:064x}", state["logs"], state["trial_times"])
+        write = time.perf_counter() - t0
+        for state in sessions:
+            csv_bytes += len(build_csv(state["logs"]))
+        bin_bytes = sum(os.path.getsize(p) for p in store.segment_paths())
+        trials = sum(len(s["logs"]) for s in sessions)
+        print(f"sessions={args.sessions} trials={trials} write={trials / write:.0f} trials/s")
+        print(f"csv={csv_bytes / 2**20:.2f}MiB  archive={bin_bytes / 2**20:.2f}MiB  "
+              f"ratio={bin_bytes / csv_bytes:.1%}")
+
+        # 往復の確認
+        state = sessions[0]
+        assert store.load_logs(f"{0:064x}") == state["logs"]
+
+        # 走査用に、書いたレコードを複製してセッションを増やす
+        block = store.segments()[0][:trials].copy()
+        n = len(sessions)
+        while sum(len(s) for s in store.segments()) < args.trials:
+            for offset in range(0, len(block), 64):
+                store.append_records(f"{n:064x}", block[offset:offset + 64])
+                n += 1
+                if n % 20000 == 0 and sum(len(s) for s in store.segments()) >= args.trials:
+                    break
+        size = sum(os.path.getsize(p) for p in store.segment_paths())
+
+        # ページキャッシュに載った状態（2 回目）と合わせて表示する
+        for label in ("first", "warm"):
+            t0 = time.perf_counter()
+            result = archive.scan(store)
+            elapsed = time.perf_counter() - t0
+            print(f"scan {label:5s} trials={result['trials']} {elapsed:.2f}s  "
+                  f"{size / 2**20 / elapsed:.0f}MiB/s  {result['trials'] / elapsed / 1e6:.0f}M trials/s")
+
+
+if __name__ == "__main__":
+    main()
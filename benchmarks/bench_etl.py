@@ -0,0 +1,99 @@
+"""
+分析用ストアへの差分 ETL の処理速度と冪等性
+
+一時ストアに --sessions 件のセッション（1 件 64 試行前後）を保存して 1 コアで ETL を回し、
+セッション/時・試行/秒を測る。続けて
+- 新しいセッションが無いときの再実行が何も書かないこと
+- 追加した --more 件だけが取り込まれること
+- 確定前に落ちた実行の残りファイルが次の実行で消え、行が重複しないこと
+- 分析用ストアから読んだ値がストアの試行ログと一致すること
+を確かめる。
+
+    python benchmarks/bench_etl.py [--sessions 5000] [--more 500] [--batch 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import artifacts, engine, etl  # noqa: E402
+from cst.store import Store  # noqa: E402
+
+
+def make_sessions(n, day):
+    sessions = []
+    for i in range(n):
+        state = engine.default_state()
+        state["patient_name"] = f"患者{i % 300}"
+        engine.start_test(state)
+        while not state["finished"]:
+            engine.score_selection(state, random.randrange(4))
+        meta = artifacts.session_meta(state)
+        meta["started_at"] = meta["finished_at"] = day + i * 60
+        sessions.append((uuid.uuid4().hex, meta, state["logs"]))
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--more", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=etl.DEFAULT_BATCH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Store(os.path.join(tmp, "cst.sqlite3"))
+        analytics = etl.Analytics(os.path.join(tmp, "analytics"))
+        store.save_sessions(make_sessions(args.sessions, time.time() - 3 * 86400))
+
+        result = etl.run(analytics, store, batch=args.batch)
+        print(f"initial: sessions={result['sessions']} trials={result['trials']} {result['elapsed_s']:.2f}s "
+              f"-> {result['sessions_per_s'] * 3600:,.0f} sessions/h, {result['trials_per_s']:,.0f} trials/s "
+              f"(read {result['read_s']:.2f}s transform {result['transform_s']:.2f}s write {result['write_s']:.2f}s)")
+
+        again = etl.run(analytics, store, batch=args.batch)
+        assert again["sessions"] == 0, again
+        print(f"rerun:   sessions=0 {again['elapsed_s'] * 1000:.1f}ms")
+
+        store.save_sessions(make_sessions(args.more, time.time()))
+        # 確定前に落ちた実行の残り（マニフェストに無いファイル）
+        orphan = os.path.join(analytics.root, "trials", "date=2000-01-01", "part-store-crashed.parquet")
+        os.makedirs(os.path.dirname(orphan))
+        open(orphan, "wb").close()
+        delta = etl.run(analytics, store, batch=args.batch)
+        assert delta["sessions"] == args.more and delta["orphans_removed"] == 1, delta
+        assert not os.path.exists(orphan)
+        print(f"delta:   sessions={delta['sessions']} {delta['elapsed_s']:.2f}s")
+
+        for _ in range(etl.COMPACT_MIN_FILES):
+            store.save_sessions(make_sessions(3, time.time() + random.random()))
+            etl.run(analytics, store, batch=args.batch)
+        total = args.sessions + args.more + 3 * etl.COMPACT_MIN_FILES
+
+        sessions = analytics.read("sessions")
+        trials = analytics.read("trials")
+        assert len(sessions) == total and sessions["session_id"].is_unique
+        assert len(trials) == sum(row["total_trials"] for row in store.conn.execute("SELECT total_trials FROM sessions"))
+        assert not trials.duplicated(["session_id", "trial"]).any()
+
+        # 1 セッションを取り出してストアの試行ログと比べる
+        sid = sessions["session_id"].iloc[len(sessions) // 2]
+        rows = trials[trials["session_id"] == sid].sort_values("trial")
+        logs = store.load_logs(sid)
+        assert rows["error_type"].astype(str).tolist() == [e["エラー種別"] for e in logs]
+        assert rows["correct"].tolist() == [e["正誤"] == "○" for e in logs]
+        assert rows["target_shape"].astype(str).tolist() == [e["ターゲット_形"] for e in logs]
+
+        size = sum(info["bytes"] for info in analytics.manifest()["files"].values())
+        print(f"files={len(analytics.manifest()['files'])} size={size / 2**20:.2f}MiB "
+              f"({size / len(trials):.1f} bytes/trial) sessions={len(sessions)} trials={len(trials)}  ok")
+
+
+if __name__ == "__main__":
+    main()
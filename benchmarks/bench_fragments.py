@@ -0,0 +1,68 @@
+"""
+テスト画面の部分再実行（st.fragment）による 1 タップあたりの削減量
+
+同じ入力方式で ?fragments=0（従来の全体再実行）と ?fragments=1 を比較し、
+タップ → 表示更新までの時間と WebSocket 受信バイト数を表示する。
+サーバー側の再実行時間は bench_input_modes.py の screen.* を参照。
+
+--server-only ではブラウザを使わず、AppTest で 1 タップごとにサーバーが送る ForwardMsg（delta）の
+バイト数を、全体再実行の分とフラグメント内（delta.fragment_id 付き）の分に分けて数え、
+screen.show_test（全体）と screen.test_body（フラグメント）の処理時間と並べる。
+AppTest は常に全体を再実行するので、フラグメント側はその中の同じ部分から見積もった値になる。
+
+    python benchmarks/bench_fragments.py [--sessions 3] [--taps 30]
+    python benchmarks/bench_fragments.py --server-only [--sessions 3]
+"""
+
+import argparse
+
+from browser import describe, run_session, streamlit_server
+
+
+def measure_server(sessions):
+    from bench_input_modes import TAP_BUTTON_KEY, recorded_deltas
+    from bench_input_modes import run_session as run_apptest_session
+
+    from cst import perf
+
+    for mode in TAP_BUTTON_KEY:
+        perf.reset()
+        taps = []
+        with recorded_deltas() as sent:
+            for s in range(sessions):
+                run_apptest_session(mode, seed=s, sent=sent, per_tap=taps)
+        full = sum(n for tap in taps for _, n in tap) / len(taps)
+        fragment = sum(n for tap in taps for in_fragment, n in tap if in_fragment) / len(taps)
+        timing = perf.summary("screen.")
+        print(f"{mode:<7} delta bytes/tap  full={full / 1024:5.1f}KiB  fragment={fragment / 1024:5.1f}KiB   "
+              f"p50  show_test={timing['screen.show_test']['p50_ms']:5.2f}ms  "
+              f"test_body={timing['screen.test_body']['p50_ms']:5.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--taps", type=int, default=30)
+    parser.add_argument("--mode", default="button", choices=["component", "hidden", "button"])
+    parser.add_argument("--server-only", action="store_true")
+    args = parser.parse_args()
+
+    if args.server_only:
+        measure_server(args.sessions)
+        return
+
+    from playwright.sync_api import sync_playwright
+
+    with streamlit_server() as base, sync_playwright() as pw:
+        browser = pw.chromium.launch()
+        for fragments in ("0", "1"):
+            samples = []
+            for s in range(args.sessions):
+                samples += run_session(browser, base, args.mode, params={"fragments": fragments},
+                                       taps=args.taps, seed=s)
+            print(f"fragments={fragments}  {describe(samples)}")
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+CSV 一括取り込みのスループット
+
+一時ディレクトリに cst_result_*.csv を N 件（うち一部は再ダウンロードを模した重複）作り、
+初回の取り込みと、変更のない状態での再実行（差分だけ処理されること）の時間を測る。
+
+    python benchmarks/bench_importer.py [--files 2000] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import engine  # noqa: E402
+from cst.artifacts import build_csv  # noqa: E402
+from cst.importer import Importer  # noqa: E402
+from cst.store import Store  # noqa: E402
+
+
+def make_files(root, n, duplicate_ratio=0.05):
+    for i in range(n):
+        state = engine.default_state()
+        engine.start_test(state)
+        while not state["finished"]:
+            engine.score_selection(state, random.randrange(4))
+        sub = os.path.join(root, f"{i // 500:03d}")
+        os.makedirs(sub, exist_ok=True)
+        path = os.path.join(sub, f"cst_result_p{i}.csv")
+        with open(path, "wb") as f:
+            f.write(build_csv(state["logs"]))
+        if random.random() < duplicate_ratio:
+            shutil.copy(path, os.path.join(sub, f"cst_result_p{i} (1).csv"))
+
+
+def run(root, store, workers):
+    t0 = time.perf_counter()
+    stats = Importer(store=store, workers=workers).run([root])
+    return stats, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "csv")
+        make_files(root, args.files)
+        store = Store(os.path.join(tmp, "cst.sqlite3"))
+        for label in ("initial", "rerun"):
+            stats, elapsed = run(root, store, args.workers)
+            print(f"{label:8s} {elapsed:6.2f}s  files/s={stats['scanned'] / elapsed:8.0f}  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+一括受け付け API の持続処理量と過負荷時のふるまい
+
+一時ディレクトリに tenants.json を作って python -m cst.ingest を別プロセスで起動し、
+ローカルの負荷生成（asyncio のクライアント --clients 本、keep-alive）から gzip した JSONL を
+--batch セッションずつ POST する。429 は Retry-After 秒待って同じ本文を再送する。
+- sustained：--clients 本で全セッションを送り切るまでのセッション/秒と応答時間
+- overload：10 セッションずつの小さな本文を MAX_IN_FLIGHT を大きく超える本数で送り、429 が返って受け付け済みの分が失われないこと
+最後にストアの件数が受け付けたセッション数と一致することを確かめる。
+
+    python benchmarks/bench_ingest.py [--sessions 4000] [--batch 50] [--clients 8] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cst import artifacts, engine  # noqa: E402
+from cst.ingest import encode_batch  # noqa: E402
+
+TOKEN = "bench-partner-token"
+
+
+def make_sessions(n, prefix):
+    sessions = []
+    for i in range(n):
+        state = engine.default_state()
+        state["patient_name"] = f"{prefix}{i}"
+        engine.start_test(state)
+        while not state["finished"]:
+            engine.score_selection(state, random.randrange(4))
+        sessions.append((artifacts.session_meta(state), state["logs"]))
+    return sessions
+
+
+async def post(port, body, conn=None):
+    # 戻り値：(status, headers, payload, conn)。conn は keep-alive で使い回す
+    if conn is None:
+        conn = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = conn
+    head = (f"POST /ingest HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/x-ndjson\r\n"
+            f"Content-Encoding: gzip\r\nX-CST-Tenant-Token: {TOKEN}\r\nContent-Length: {len(body)}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+    payload = json.loads(await reader.readexactly(int(headers["content-length"])))
+    if headers.get("connection") == "close":
+        writer.close()
+        conn = None
+    return status, headers, payload, conn
+
+
+async def run_clients(port, bodies, clients):
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+    latencies, accepted, throttled = [], set(), 0
+
+    async def client():
+        nonlocal throttled
+        conn = None
+        while not queue.empty():
+            body = queue.get_nowait()
+            while True:
+                t0 = time.perf_counter()
+                status, headers, payload, conn = await post(port, body, conn)
+                if status == 429:
+                    throttled += 1
+                    await asyncio.sleep(float(headers.get("retry-after", 1)))
+                    continue
+                assert status == 200, (status, payload)
+                latencies.append(time.perf_counter() - t0)
+                accepted.update(payload["accepted"])
+                break
+        if conn is not None:
+            conn[1].close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - t0, sorted(latencies), accepted, throttled
+
+
+def report(label, sessions, elapsed, latencies, throttled):
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:9s} sessions={sessions} {elapsed:.2f}s -> {sessions / elapsed:,.0f} sessions/s  "
+          f"request p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms  429={throttled}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=4000)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--port", type=int, default=18766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "tenants.json"), "w", encoding="utf-8") as f:
+            json.dump({"partner": {"tokens": [TOKEN]}}, f)
+        env = {**os.environ, "CST_DATA_DIR": tmp, "CST_TENANTS": os.path.join(tmp, "tenants.json"),
+               "CST_INGEST_MAX_IN_FLIGHT": "16"}
+        command = [sys.executable, "-m", "cst.ingest", "--port", str(args.port)]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+        try:
+            print(server.stdout.readline().strip())
+            sustained = make_sessions(args.sessions, "sustained-")
+            overload = make_sessions(args.sessions // 2, "overload-")
+
+            def batches(sessions, size=args.batch):
+                return [encode_batch(sessions[i:i + size]) for i in range(0, len(sessions), size)]
+
+            elapsed, latencies, accepted, throttled = asyncio.run(run_clients(args.port, batches(sustained), args.clients))
+            report("sustained", len(accepted), elapsed, latencies, throttled)
+
+            elapsed, latencies, accepted2, throttled = asyncio.run(run_clients(args.port, batches(overload, 10), 128))
+            report("overload", len(accepted2), elapsed, latencies, throttled)
+            assert throttled > 0
+
+            # 同じ本文の再送は重複しない
+            asyncio.run(run_clients(args.port, batches(sustained[:args.batch]), 1))
+        finally:
+            server.terminate()
+            server.wait()
+
+        path = os.path.join(tmp, "tenants", "partner", "cst.sqlite3")
+        stored = sqlite3.connect(path).execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        assert stored == len(accepted) + len(accepted2), (stored, len(accepted), len(accepted2))
+        print(f"stored={stored} (no duplicates, nothing lost)  ok")
+
+
+if __name__ == "__main__":
+    main()
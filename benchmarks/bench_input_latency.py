@@ -0,0 +1,38 @@
+"""
+入力方式ごとの タップ → フィードバック 時間（低スペックタブレット想定）
+
+ヘッドレス Chromium に CPU スロットリング（既定 6 倍）と低速回線を設定し、
+component（カスタムコンポーネント）・hidden（旧 DOM 探索ブリッジ）・button を比較する。
+
+    python benchmarks/bench_input_latency.py [--sessions 3] [--taps 30] [--cpu 6] [--fast-network]
+"""
+
+import argparse
+
+from playwright.sync_api import sync_playwright
+
+from browser import LOW_END_CPU_THROTTLE, TAPPERS, describe, run_session, streamlit_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--taps", type=int, default=30)
+    parser.add_argument("--cpu", type=float, default=LOW_END_CPU_THROTTLE)
+    parser.add_argument("--fast-network", action="store_true")
+    args = parser.parse_args()
+
+    with streamlit_server() as base, sync_playwright() as pw:
+        browser = pw.chromium.launch()
+        print(f"cpu throttle x{args.cpu}, network={'fast' if args.fast_network else 'slow 3G'}")
+        for mode in TAPPERS:
+            samples = []
+            for s in range(args.sessions):
+                samples += run_session(browser, base, mode, taps=args.taps, cpu_throttle=args.cpu,
+                                       slow_network=not args.fast_network, seed=s)
+            print(f"{mode:<10} {describe(samples)}")
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
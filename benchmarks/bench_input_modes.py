@@ -0,0 +1,88 @@
+"""
+入力方式ごとの タップ → フィードバック 表示時間の比較
+
+Streamlit の AppTest でヘッドレスに 1 セッション分（最大64試行）をタップし、
+cst.perf に記録されたサーバー側の処理時間と、1 タップでサーバーが送る delta（ForwardMsg）のバイト数を
+入力方式ごとに集計する。ブラウザ側の時間（component 方式を含む）は bench_input_latency.py で測る。
+
+    python benchmarks/bench_input_modes.py [--sessions 5]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from cst import perf  # noqa: E402
+
+# AppTest はカスタムコンポーネントを操作できないため、ボタンを持つ方式だけを比較する
+# （component 方式はブラウザで計測する：bench_input_latency.py）
+TAP_BUTTON_KEY = {
+    "hidden": "hbtn_{i}",
+    "button": "card_{i}",
+}
+
+
+@contextlib.contextmanager
+def recorded_deltas():
+    # この中で実行した AppTest が送る delta を (フラグメント内か, バイト数) のリストに記録する
+    sent = []
+    enqueue = ForwardMsgQueue.enqueue
+    def record(self, msg):
+        if msg.WhichOneof("type") == "delta":
+            sent.append((bool(msg.delta.fragment_id), msg.ByteSize()))
+        return enqueue(self, msg)
+    ForwardMsgQueue.enqueue = record
+    try:
+        yield sent
+    finally:
+        ForwardMsgQueue.enqueue = enqueue
+
+
+def run_session(mode, seed, sent=None, per_tap=None):
+    # sent を渡すと、最終試行以外の 1 タップごとに送った delta の一覧を per_tap に足す
+    rng = random.Random(seed)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    at.query_params["from"] = "blog"
+    at.query_params["input"] = mode
+    at.run()
+    at.button[0].click().run()                       # テスト開始
+    while not at.session_state["finished"]:
+        key = TAP_BUTTON_KEY[mode].format(i=rng.randrange(4))
+        if sent is not None:
+            sent.clear()
+        at.button(key=key).click().run()
+        if sent is not None and not at.session_state["finished"]:
+            per_tap.append(list(sent))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+
+    perf.reset()
+    per_tap = {}
+    with recorded_deltas() as sent:
+        for mode in TAP_BUTTON_KEY:
+            for s in range(args.sessions):
+                run_session(mode, seed=s, sent=sent, per_tap=per_tap.setdefault(mode, []))
+
+    print(f"{'metric':<32} {'n':>5} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}  (ms)")
+    for name, st in perf.summary().items():
+        print(f"{name:<32} {st['n']:>5} {st['mean_ms']:>8.2f} {st['p50_ms']:>8.2f} "
+              f"{st['p95_ms']:>8.2f} {st['max_ms']:>8.2f}")
+    for mode, taps in per_tap.items():
+        total = sum(n for tap in taps for _, n in tap)
+        print(f"delta bytes/tap {mode:<8} {total / len(taps) / 1024:.1f}KiB")
+
+
+if __name__ == "__main__":
+    main()
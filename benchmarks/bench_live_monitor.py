@@ -0,0 +1,86 @@
+"""
+ライブモニターの配信負荷
+
+12 人の患者セッションが並行して 1 秒に 1 回程度タップし、検査者の SSE 接続が
+それを受け取るまでの遅延と、publish 1 回あたりのサーバー側コストを測る。
+
+    python benchmarks/bench_live_monitor.py [--patients 12] [--examiners 1] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import engine, live  # noqa: E402
+
+
+def patient(room, seconds, publish_costs):
+    state = engine.default_state()
+    engine.start_test(state)
+    key = os.urandom(4).hex()
+    deadline = time.time() + seconds
+    while time.time() < deadline and not state["finished"]:
+        time.sleep(random.uniform(0.5, 1.5))
+        engine.score_selection(state, random.randrange(4))
+        data = live.snapshot(state, key)
+        data["sent_at"] = time.time()
+        t0 = time.perf_counter()
+        live.get_hub().publish(room, key, data)
+        publish_costs.append(time.perf_counter() - t0)
+
+
+def examiner(url, latencies, stop):
+    resp = urllib.request.urlopen(url)
+    for line in resp:
+        if stop.is_set():
+            return
+        if line.startswith(b"data:"):
+            now = time.time()
+            for data in json.loads(line[5:]).values():
+                latencies.append(now - data["sent_at"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=12)
+    parser.add_argument("--examiners", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=18765)
+    args = parser.parse_args()
+
+    live.ensure_server(args.port)
+    room = "default/bench"                           # 部屋名は "<テナント>/<部屋>"
+    stop = threading.Event()
+    latencies, publish_costs = [], []
+    for _ in range(args.examiners):
+        url = f"http://127.0.0.1:{args.port}/live/{room}?ticket={live.room_ticket(room)}"
+        threading.Thread(target=examiner, args=(url, latencies, stop),
+                         daemon=True).start()
+    time.sleep(0.3)
+
+    threads = [threading.Thread(target=patient, args=(room, args.seconds, publish_costs))
+               for _ in range(args.patients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(0.5)
+    stop.set()
+
+    lat = sorted(latencies)
+    print(f"patients={args.patients} examiners={args.examiners} publishes={len(publish_costs)}")
+    print(f"publish cost  mean={sum(publish_costs) / len(publish_costs) * 1e6:.1f}us")
+    if lat:
+        print(f"push latency  p50={lat[len(lat) // 2] * 1000:.2f}ms  "
+              f"p95={lat[int(len(lat) * 0.95)] * 1000:.2f}ms  delivered={len(lat)}")
+
+
+if __name__ == "__main__":
+    main()
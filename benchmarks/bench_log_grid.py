@@ -0,0 +1,116 @@
+"""
+試行ログの表（サーバー側のページ分け）の応答時間と送る量
+
+一時ストアに --sessions 件のセッション（1 件 64 試行前後）を保存し、全セッションの表で
+絞り込み・並べ替え・ページ位置の組み合わせごとに「件数 + 1 ページ」の取得時間を測る。
+ページは前のページの最後の行のキーから引く（キーセット）。索引（store.TRIAL_INDEXES）なしとありを比べ、
+深いページについては同じ位置を LIMIT/OFFSET で引いた場合も並べる。最後に全行を送る場合と 1 ページだけ送る場合の
+Arrow での大きさ（st.dataframe がブラウザへ送る形）を比べる。
+
+    python benchmarks/bench_log_grid.py [--sessions 8000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import artifacts, engine, log_grid  # noqa: E402
+from cst.store import TRIAL_INDEXES, Store  # noqa: E402
+
+CASES = [
+    # (ラベル, 絞り込み, 並べ替え, 降順, ページ)
+    ("all / 試行順 / p1",           {}, "試行順", False, 1),
+    ("all / 試行順 / last page",    {}, "試行順", False, None),
+    ("errors / エラー種別 / p1",     {"correct": ["×"]}, "エラー種別", False, 1),
+    ("ミルナー / 試行順 / p1",        {"error_type": ["ミルナー型保続"]}, "試行順", False, 1),
+    ("errors / 試行順 / p1000",      {"correct": ["×"]}, "試行順", False, 1000),
+    ("rule=形 / 正解ルール desc / p1", {"rule": ["形"]}, "正解ルール", True, 1),
+    ("rule=形 + errors / 試行順 / p1", {"rule": ["形"], "correct": ["×"]}, "試行順", False, 1),
+]
+
+
+def make_sessions(n):
+    sessions = []
+    for i in range(n):
+        state = engine.default_state()
+        engine.start_test(state)
+        while not state["finished"]:
+            engine.score_selection(state, random.randrange(4))
+        sessions.append((f"{i:08d}", artifacts.session_meta(state), state["logs"]))
+    return sessions
+
+
+def offset_page(store, filters, sort, descending, offset):
+    # 比較用：同じページを LIMIT/OFFSET で引く
+    clauses, params = log_grid.StoreSource(store)._where(filters)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    order = ", ".join(f"{c} DESC" if descending else c for c in log_grid.SORTS[sort])
+    return store.conn.execute(f"SELECT * FROM trials{where} ORDER BY {order} LIMIT ? OFFSET ?",
+                              params + [log_grid.PAGE_SIZE, offset]).fetchall()
+
+
+def measure(source, repeat=5):
+    results = []
+    for label, filters, sort, descending, page in CASES:
+        total = source.count(filters)
+        pages = max(1, -(-total // log_grid.PAGE_SIZE))
+        page = min(page or pages, pages)
+        # 1 つ前のページの最後の行のキー（画面では表示中のページから持ち越す）
+        cursor = {}
+        if page > 1:
+            cursor = {"after": source.page(filters, sort, descending, (page - 1) * log_grid.PAGE_SIZE)[1][-1]}
+        best = best_offset = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            source.count(filters)
+            rows, _ = source.page(filters, sort, descending, log_grid.PAGE_SIZE, **cursor)
+            best = min(best, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            source.count(filters)
+            offset_page(source.store, filters, sort, descending, (page - 1) * log_grid.PAGE_SIZE)
+            best_offset = min(best_offset, time.perf_counter() - t0)
+        results.append((label, total, len(rows), best, best_offset))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=8000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Store(os.path.join(tmp, "cst.sqlite3"))
+        store.save_sessions(make_sessions(args.sessions))
+        source = log_grid.StoreSource(store)
+        trials = source.count({})
+        print(f"sessions={args.sessions} trials={trials:,}")
+
+        for name in re.findall(r"CREATE INDEX IF NOT EXISTS (\w+)", TRIAL_INDEXES):
+            store.conn.execute(f"DROP INDEX {name}")
+        without = measure(source, repeat=1)
+        store.conn.executescript(TRIAL_INDEXES)
+        with_index = measure(source)
+
+        print(f"{'case':34s} {'matches':>9s} {'no index':>10s} {'indexed':>10s} {'offset':>10s}")
+        for (label, total, _, slow, _), (_, _, _, fast, offset) in zip(without, with_index):
+            print(f"{label:34s} {total:9,d} {slow * 1000:8.1f}ms {fast * 1000:8.1f}ms {offset * 1000:8.1f}ms")
+
+        columns = ["session_id", *engine.LOG_COLUMNS.values()]
+        full = pd.DataFrame(store.conn.execute(f"SELECT {', '.join(columns)} FROM trials").fetchall(), columns=columns)
+        page = pd.DataFrame(source.page({}, "試行順", False, log_grid.PAGE_SIZE)[0])
+        full_bytes = pa.Table.from_pandas(full).nbytes
+        page_bytes = pa.Table.from_pandas(page).nbytes
+        print(f"payload: all rows {full_bytes / 2**20:.1f}MiB  one page {page_bytes / 1024:.1f}KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+患者履歴の読み出し時間
+
+一時ストアに患者 N 人 × セッション M 回分の集計行を作り、経過比較画面が使う
+registry.history() 1 回あたりの時間を測る（試行ログは読まない）。
+
+    python benchmarks/bench_patient_history.py [--patients 5000] [--sessions 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cst import engine, registry  # noqa: E402
+from cst.store import Store  # noqa: E402
+
+
+def fake_summary():
+    metrics = engine.new_metrics()
+    for _ in range(64):
+        ok = random.random() < 0.7
+        engine.update_metrics(metrics, {"正誤": "○" if ok else "×",
+                                        "エラー種別": "－" if ok else random.choice(engine.ERROR_TYPES)})
+    metrics["categories"] = random.randrange(7)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Store(os.path.join(tmp, "cst.sqlite3"))
+        t0 = time.perf_counter()
+        now = time.time()
+        for p in range(args.patients):
+            registry.record_sessions([
+                (f"{p}-{s}", {"patient_name": f"患者{p}", "finished_at": now - s * 86400},
+                 None, fake_summary(), None)
+                for s in range(args.sessions)
+            ], store)
+        print(f"seeded {args.patients * args.sessions} summaries in {time.perf_counter() - t0:.1f}s")
+
+        costs = []
+        for _ in range(args.lookups):
+            name = f"患者{random.randrange(args.patients)}"
+            t0 = time.perf_counter()
+            rows = registry.history(name, store)
+            costs.append(time.perf_counter() - t0)
+            assert len(rows) == args.sessions
+        costs.sort()
+        print(f"history()  p50={costs[len(costs) // 2] * 1000:.2f}ms  "
+              f"p95={costs[int(len(costs) * 0.95)] * 1000:.2f}ms  max={costs[-1] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
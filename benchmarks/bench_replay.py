@@ -0,0 +1,93 @@
+"""
+セッション再生のシーク時間とまとめて QA の処理速度
+
+長いプロトコル（--trials 試行）のログを作り、スナップショットからのシークと
+1 試行目からの再生し直しを比べる。続けて一時ストアに --sessions 件を保存し、
+replay.check_sessions で全件を再採点する速さを測る。
+
+    python benchmarks/bench_replay.py [--trials 5000] [--sessions 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_logs(trials):
+    from cst import engine
+    state = engine.default_state()
+    engine.start_test(state)
+    for _ in range(trials):                          # finished を無視して続ける（長いプロトコルの代わり）
+        engine.score_selection(state, random.randrange(4))
+    return state["logs"]
+
+
+def bench_seek(trials, seeks):
+    from cst import engine
+    from cst.replay import Replay
+
+    logs = make_logs(trials)
+    t0 = time.perf_counter()
+    replay = Replay(logs)
+    build = time.perf_counter() - t0
+
+    targets = [random.randint(0, trials) for _ in range(seeks)]
+    t0 = time.perf_counter()
+    for n in targets:
+        replay.state_at(n)
+    seek = (time.perf_counter() - t0) / seeks
+
+    t0 = time.perf_counter()
+    for n in targets[:20]:
+        state = engine.default_state()
+        for entry in logs[:n]:
+            engine.replay_step(state, entry)
+    naive = (time.perf_counter() - t0) / 20
+
+    print(f"trials={trials} build={build * 1000:.1f}ms snapshots={len(replay.snapshots)}")
+    print(f"seek (snapshot) {seek * 1000:.3f}ms   seek (from trial 1) {naive * 1000:.2f}ms")
+
+
+def bench_qa(sessions, workers):
+    from cst import artifacts, engine
+    from cst.replay import check_sessions
+    from cst.store import get_store
+
+    batch = []
+    for _ in range(sessions):
+        state = engine.default_state()
+        engine.start_test(state)
+        while not state["finished"]:
+            engine.score_selection(state, random.randrange(4))
+        meta = artifacts.session_meta(state)
+        batch.append((artifacts.session_hash(state["logs"], meta), meta, state["logs"]))
+    get_store().save_sessions(batch)
+
+    t0 = time.perf_counter()
+    found = check_sessions([sid for sid, _, _ in batch], workers=workers)
+    elapsed = time.perf_counter() - t0
+    print(f"qa sessions={sessions} mismatched={len(found)} {elapsed:.2f}s  sessions/s={sessions / elapsed:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=5000)
+    parser.add_argument("--seeks", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # ワーカープロセスも同じ一時ストアを開くよう、cst を読み込む前に環境変数で指定する
+        os.environ["CST_STORE_PATH"] = os.path.join(tmp, "cst.sqlite3")
+        bench_seek(args.trials, args.seeks)
+        bench_qa(args.sessions, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+結果画面の初回描画時間と転送量：インライン SVG と Plotly の比較
+
+最終試行のタップから結果画面のグラフが表示されるまでの時間と、その間の転送バイト数
+（HTTP の実転送量 + WebSocket）を、低速回線・CPU スロットリング下で測る。
+Plotly の JS チャンクはブラウザキャッシュの影響を避けるため毎回新しいページで読み込む。
+--server-only ではブラウザを使わず、サーバー側でグラフを組み立てる時間と、グラフのためにブラウザへ送る量
+（SVG の文字列 / Plotly の figure JSON と、初回だけ読み込む Plotly の JS チャンクの gzip 後の大きさ）を測る。
+ブラウザ側の描画時間はここには含まれない。
+
+    python benchmarks/bench_results_charts.py [--sessions 3] [--cpu 6]
+    python benchmarks/bench_results_charts.py --server-only [--sessions 50]
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import random
+import sys
+import time
+
+from browser import LOW_END_CPU_THROTTLE, ROOT, SLOW_NETWORK, open_page, play_to_results, start_test, streamlit_server
+
+sys.path.insert(0, ROOT)
+
+CHART_SELECTOR = {
+    "svg":    "svg.cst-chart",
+    "plotly": ".js-plotly-plot .main-svg",
+}
+
+
+def _error_counts(seed):
+    from cst import engine
+
+    rng = random.Random(seed)
+    state = engine.default_state()
+    engine.start_test(state)
+    while not state["finished"]:
+        engine.score_selection(state, rng.randrange(4))
+    return state["metrics"]["error_counts"]
+
+
+def measure_server(sessions):
+    import streamlit
+    from cst import charts
+
+    counts = [_error_counts(s) for s in range(sessions)]
+    builders = {
+        # lru_cache を通さず、毎回組み立てる
+        "svg":    lambda c: charts._error_donut_svg.__wrapped__(tuple(c.items())),
+        "plotly": lambda c: charts.error_pie_figure(c).to_json(),
+    }
+    charts.error_pie_figure({"ミルナー型保続": 1})     # plotly の import を計測から外す
+    static = os.path.join(os.path.dirname(streamlit.__file__), "static", "static", "js")
+    chunk = b"".join(open(p, "rb").read() for p in glob.glob(os.path.join(static, "PlotlyChart.*.js")))
+    for name, build in builders.items():
+        times, sizes = [], []
+        for c in counts:
+            t0 = time.perf_counter()
+            payload = build(c)
+            times.append((time.perf_counter() - t0) * 1000)
+            sizes.append(len(payload.encode("utf-8")))
+        times.sort()
+        extra = f"  js chunk={len(gzip.compress(chunk)) / 1024:.1f}KiB gzip (first load)" if name == "plotly" else ""
+        print(f"{name:<7} build p50={times[len(times) // 2]:6.2f}ms  "
+              f"payload={sum(sizes) / len(sizes) / 1024:6.2f}KiB{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--cpu", type=float, default=LOW_END_CPU_THROTTLE)
+    parser.add_argument("--mode", default="button")
+    parser.add_argument("--server-only", action="store_true")
+    args = parser.parse_args()
+
+    if args.server_only:
+        measure_server(args.sessions)
+        return
+
+    from playwright.sync_api import sync_playwright
+
+    with streamlit_server() as base, sync_playwright() as pw:
+        browser = pw.chromium.launch()
+        for charts, selector in CHART_SELECTOR.items():
+            times, sizes = [], []
+            for s in range(args.sessions):
+                context = browser.new_context()          # キャッシュを共有しない
+                page, counters = open_page(context, args.cpu, slow_network=False)
+                start_test(page, base, args.mode, params={"charts": charts})
+                # タップ中は高速回線、結果画面の読み込みだけ低速回線にする
+                cdp = page.context.new_cdp_session(page)
+                cdp.send("Network.enable")
+                cdp.send("Network.emulateNetworkConditions", SLOW_NETWORK)
+                t0, before = play_to_results(page, args.mode, counters, seed=s)
+                page.wait_for_selector(selector, timeout=60000)
+                times.append((time.perf_counter() - t0) * 1000)
+                sizes.append(counters.total - before)
+                context.close()
+            times.sort()
+            print(f"{charts:<7} first chart p50={times[len(times) // 2]:8.1f}ms  "
+                  f"transferred={sum(sizes) / len(sizes) / 1024:8.1f}KiB")
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
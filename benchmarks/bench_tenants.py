@@ -0,0 +1,117 @@
+"""
+複数施設が同時に使うときの公平さと分離
+
+一時ディレクトリに tenants.json を作り、混んでいる施設 busy（--busy-sessions 件の検査が全速でタップ）と
+ふつうの施設 --quiet 件（人の速さでタップ）を同じプロセスで同時に動かす。
+施設ごとにタップの処理時間と、頻度の上限を超えたタップの数（待たせずに数えるだけ）、
+頻度・同時実施数の上限で開始を断られた検査の数を出し、
+最後に検査後処理（pipeline）が施設ごとの保存先にだけ書いたことを確かめる。
+
+    python benchmarks/bench_tenants.py [--busy-sessions 16] [--quiet 3] [--busy-rate 1200]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_session(tenant, key, pause, results):
+    from cst import engine, pipeline, tenants
+
+    slots = tenants.get_slots()
+    # app.start_test と同じ順：頻度の上限、同時実施数の上限
+    if not tenants.allow_rerun(tenant) or not slots.acquire(tenant, key):
+        results["rejected"] += 1
+        return
+    state = engine.default_state()
+    state["tenant"] = tenant.id
+    engine.start_test(state)
+    while not state["finished"]:
+        t0 = time.perf_counter()
+        if not tenants.allow_rerun(tenant):
+            results["over_rate"] += 1
+        engine.score_selection(state, random.randrange(4))
+        results["latencies"].append(time.perf_counter() - t0)
+        slots.touch(tenant.id, key)
+        if pause:
+            time.sleep(pause)
+    slots.release(tenant.id, key)
+    pipeline.enqueue_finished_session(state)
+    results["finished"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--busy-sessions", type=int, default=16)
+    parser.add_argument("--busy-limit", type=int, default=8)
+    parser.add_argument("--busy-rate", type=int, default=1200)
+    parser.add_argument("--quiet", type=int, default=3)
+    parser.add_argument("--quiet-sessions", type=int, default=2)
+    parser.add_argument("--pause", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="cst-tenants-")
+    conf = {"busy": {"tokens": ["busy-token"], "max_concurrent": args.busy_limit,
+                     "rate_per_minute": args.busy_rate, "burst": 10}}
+    for i in range(args.quiet):
+        conf[f"quiet-{i}"] = {"tokens": [f"quiet-token-{i}"], "max_concurrent": 4, "rate_per_minute": 6000}
+    with open(os.path.join(tmp, "tenants.json"), "w", encoding="utf-8") as f:
+        json.dump(conf, f)
+    os.environ["CST_DATA_DIR"] = tmp
+    os.environ["CST_TENANTS"] = os.path.join(tmp, "tenants.json")
+
+    from cst import jobs, tenants
+    from cst.config import tenant_data_dir
+    from cst.store import get_store
+
+    registry = tenants.get_tenants()
+    results = {tid: {"latencies": [], "rejected": 0, "over_rate": 0, "finished": 0} for tid in registry}
+    threads = []
+    for i in range(args.busy_sessions):
+        threads.append(threading.Thread(target=run_session, args=(registry["busy"], f"busy-{i}", 0, results["busy"])))
+    for tid in registry:
+        if tid == "busy":
+            continue
+        for i in range(args.quiet_sessions):
+            threads.append(threading.Thread(target=run_session,
+                                            args=(registry[tid], f"{tid}-{i}", args.pause, results[tid])))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    queue = jobs.get_queue()
+    while queue.depth():
+        time.sleep(0.1)
+
+    print(f"elapsed={elapsed:.1f}s")
+    for tid, r in results.items():
+        lat = sorted(r["latencies"]) or [0.0]
+        p95 = lat[int(len(lat) * 0.95) - 1] if len(lat) > 1 else lat[0]
+        print(f"{tid:8s} finished={r['finished']:3d} rejected={r['rejected']:3d} taps={len(r['latencies']):5d} "
+              f"over_rate={r['over_rate']:5d} "
+              f"median={statistics.median(lat) * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms")
+
+    # 各施設の保存先には自分の検査だけが入っている
+    for tid, r in results.items():
+        saved = len(get_store(tid).recent_sessions(limit=10_000))
+        assert saved == r["finished"], (tid, saved, r["finished"])
+        assert get_store(tid).path.startswith(tenant_data_dir(tid))
+        # 検査後処理のジャーナル（試行ログを含む）も施設の保存先にだけある
+        if r["finished"]:
+            with open(os.path.join(tenant_data_dir(tid), "jobs.jsonl"), encoding="utf-8") as f:
+                assert all(json.loads(line)["payload"]["tenant"] == tid for line in f if '"enqueued"' in line)
+    print("isolation ok:", {tid: len(get_store(tid).recent_sessions(limit=10_000)) for tid in results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+ブラウザ計測ハーネス（Playwright + 実際の streamlit サーバー）
+
+タップ → 画面が次の試行（ターゲットカードの data-trial）に進むまでの時間と、
+その間に WebSocket で受信したバイト数を 1 タップごとに記録する。
+CPU スロットリング・回線エミュレーションは Chrome DevTools Protocol で指定する。
+
+    pip install playwright && playwright install chromium
+"""
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入力方式ごとの「i 番目の基準カードをタップする」操作
+# component / hidden はどちらも基準カードを描く iframe が画面に一つだけある
+def _tap_iframe_card(page, i):
+    page.frame_locator("iframe").locator(".ref-card").nth(i).click()
+
+def _tap_button(page, i):
+    page.get_by_role("button", name="選ぶ").nth(i).click()
+
+TAPPERS = {
+    "component": _tap_iframe_card,
+    "hidden": _tap_iframe_card,
+    "button": _tap_button,
+}
+
+# 低スペックタブレット相当：CPU 6 倍遅延（DevTools の "6x slowdown"）
+LOW_END_CPU_THROTTLE = 6
+
+# 低スペックタブレット相当の回線（DevTools の "Fast 3G" 程度）
+SLOW_NETWORK = {
+    "offline": False,
+    "latency": 150,
+    "downloadThroughput": 1.6 * 1024 * 1024 / 8,
+    "uploadThroughput": 750 * 1024 / 8,
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def streamlit_server(script="app.py", env=None):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, script),
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                urllib.request.urlopen(base + "/_stcore/health", timeout=1)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("streamlit server did not start")
+                time.sleep(0.2)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+class Counters:
+    # WebSocket 受信バイトと HTTP 転送バイト（圧縮後の実転送量）
+    def __init__(self):
+        self.ws = 0
+        self.http = 0
+
+    @property
+    def total(self):
+        return self.ws + self.http
+
+
+def open_page(browser, cpu_throttle=1, slow_network=False):
+    page = browser.new_page(viewport={"width": 800, "height": 1280})
+    cdp = page.context.new_cdp_session(page)
+    counters = Counters()
+    cdp.send("Network.enable")
+    cdp.on("Network.loadingFinished",
+           lambda ev: setattr(counters, "http", counters.http + ev.get("encodedDataLength", 0)))
+    if cpu_throttle > 1:
+        cdp.send("Emulation.setCPUThrottlingRate", {"rate": cpu_throttle})
+    if slow_network:
+        cdp.send("Network.emulateNetworkConditions", SLOW_NETWORK)
+
+    def on_ws(ws):
+        ws.on("framereceived", lambda payload: setattr(
+            counters, "ws", counters.ws + len(payload if isinstance(payload, (bytes, str)) else b"")))
+    page.on("websocket", on_ws)
+    return page, counters
+
+
+def start_test(page, base_url, mode, params=None):
+    query = {"from": "blog", "input": mode, **(params or {})}
+    page.goto(f"{base_url}/?{urlencode(query)}")
+    page.get_by_role("button", name="🚀 テストを開始する").click()
+    page.wait_for_selector('[data-trial="0"]', timeout=30000)
+
+
+def run_session(browser, base_url, mode, params=None, taps=20, cpu_throttle=1, slow_network=False, seed=0):
+    """1 セッション分タップし、[(latency_ms, ws_bytes), ...] を返す"""
+    import random
+    rng = random.Random(seed)
+
+    page, counters = open_page(browser, cpu_throttle, slow_network)
+    start_test(page, base_url, mode, params)
+
+    tap = TAPPERS[mode]
+    samples = []
+    for trial in range(taps):
+        before = counters.ws
+        t0 = time.perf_counter()
+        tap(page, rng.randrange(4))
+        try:
+            page.wait_for_selector(f'[data-trial="{trial + 1}"]', timeout=30000)
+        except Exception:
+            break                                   # 規定カテゴリー到達で結果画面へ移った
+        samples.append(((time.perf_counter() - t0) * 1000, counters.ws - before))
+    page.close()
+    return samples
+
+
+def play_to_results(page, mode, counters, seed=0):
+    """結果画面に切り替わるまでタップし、最後のタップ時点の (時刻, 転送バイト) を返す"""
+    import random
+    rng = random.Random(seed)
+    tap = TAPPERS[mode]
+    trial = 0
+    while True:
+        t0, before = time.perf_counter(), counters.total
+        tap(page, rng.randrange(4))
+        nxt = page.locator(f'[data-trial="{trial + 1}"]').or_(page.get_by_text("テスト結果レポート"))
+        nxt.first.wait_for(timeout=30000)
+        if page.get_by_text("テスト結果レポート").count():
+            return t0, before
+        trial += 1
+
+
+def describe(samples):
+    if not samples:
+        return "no samples"
+    lat = sorted(s[0] for s in samples)
+    payload = [s[1] for s in samples]
+    p50 = lat[len(lat) // 2]
+    p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+    return (f"n={len(samples):3d}  p50={p50:7.1f}ms  p95={p95:7.1f}ms  "
+            f"ws/tap={sum(payload) / len(payload):8.0f}B")
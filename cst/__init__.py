@@ -0,0 +1,5 @@
+"""
+Card Sorting Task パッケージ
+engine（採点）・render（描画）・inputs（入力方式）・results（結果）を共通化し、
+app.py / app-1.py はエントリーポイントとしてこれを呼び出すだけにする。
+"""
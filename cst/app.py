@@ -0,0 +1,235 @@
+"""
+Card Sorting Task
+Streamlit版 臨床評価ツール (新ドメイン対応・アクセス制限機能付き)
+
+施設（テナント）は ?tenant=<トークン>・プロキシのヘッダ・?from= のいずれかで決まる（tenants.py）。
+検査者用ライブモニターは ?view=monitor&room=...（患者側は ?room=... を付けたときだけ進行状況を送る）。
+患者ごとの経過比較は ?view=history、保存済みセッションの再生は ?view=replay[&session=...]、
+全セッションの試行ログは ?view=trials。ライブモニターとこれらの画面は検査者の合言葉を入れてから開く（examiner.py）。
+入力方式は ?input=component|hidden|button または環境変数 CST_INPUT_MODE で切り替える。
+テスト画面の部分再実行は ?fragments=0 または CST_FRAGMENTS=0 で無効化できる（比較計測用）。
+プロファイリングは CST_PROFILE=1、または CST_PROFILE_TOKEN を設定して ?profile=<トークン>（profiling.py）。
+"""
+
+import uuid
+
+import streamlit as st
+
+from . import engine, examiner, jobs, live, perf, pipeline, profiling, render, tenants
+from .config import MAX_TRIALS, REQUIRED_CORRECT, resolve_fragments, resolve_input_mode
+from .inputs import get_input_mode
+from .render import (
+    BLOCK_HIDE_CHROME_CSS, BLOCK_SCREEN_HTML, DIVIDER_HTML, FEEDBACK_HTML,
+    page_css, target_card_html, target_title_html,
+)
+from .history import show_history
+from .log_grid import show_trials
+from .monitor import show_monitor
+from .replay_view import show_replay
+from .results import show_results
+
+# ─────────────────────────────────────────
+# カード選択時の処理
+# ─────────────────────────────────────────
+@profiling.profiled("callback.on_card_selected")
+@perf.timed("callback.on_card_selected")
+def on_card_selected(ref_index: int):
+    perf.mark_tap(st.session_state)
+    # タップは施設の頻度に数えるだけで、上限を超えても待たせない・落とさない
+    tenants.allow_rerun(tenants.get_tenants()[st.session_state["tenant"]])
+    engine.score_selection(st.session_state, ref_index)
+    _publish_live()
+    slots = tenants.get_slots()
+    # 最終試行：永続化・成果物生成はキューに任せ、この再実行はすぐ結果画面へ進める
+    if st.session_state["finished"]:
+        slots.release(st.session_state["tenant"], st.session_state["live_id"])
+        pipeline.enqueue_finished_session(st.session_state)
+    else:
+        slots.touch(st.session_state["tenant"], st.session_state["live_id"])
+
+def start_test():
+    # 施設ごとの頻度・同時実施数の上限（超えていれば開始しない）
+    live_id = uuid.uuid4().hex[:8]
+    tenant = tenants.get_tenants()[st.session_state["tenant"]]
+    st.session_state["rate_limited"] = not tenants.allow_rerun(tenant)
+    if st.session_state["rate_limited"]:
+        return
+    st.session_state["quota_full"] = not tenants.get_slots().acquire(tenant, live_id)
+    if st.session_state["quota_full"]:
+        return
+    # 入力欄のキーは検査画面で消えるので、開始時点で氏名を通常のキーへ写す
+    # （保存・患者レジストリ・結果画面はこちらを読む）
+    for key in ("patient_name", "examiner_name"):
+        st.session_state[key] = st.session_state.get(f"{key}_input", "").strip()
+    engine.start_test(st.session_state)
+    # ライブモニターへは ?room= を明示したときだけ送る。部屋はテナントごとに分け、
+    # 表示名は患者名ではなく仮名にする（検査画面にも同じ仮名を出して照合できるようにする）
+    room = st.query_params.get("room")
+    st.session_state["live_id"] = live_id
+    st.session_state["live_room"] = f"{tenant.id}/{room}" if live.valid_room(room) else None
+    st.session_state["live_label"] = f"患者 {live_id[:4]}"
+    _publish_live()
+
+def _publish_live():
+    room = st.session_state.get("live_room")
+    if room:
+        live.get_hub().publish(room, st.session_state["live_id"],
+                               live.snapshot(st.session_state, st.session_state["live_label"]))
+
+# ─────────────────────────────────────────
+# 画面①：スタート画面
+# ─────────────────────────────────────────
+def show_start():
+    st.markdown("""
+    <div style="text-align:center; padding: 20px 0;">
+      <h1 style="font-size:2rem; color:#60a5fa; font-family:'BIZ UDPGothic',sans-serif; margin-bottom:5px;">
+        🧠 Card Sorting Task
+      </h1>
+      <p style="color:#94a3b8; font-size:0.9rem;">
+        認知的柔軟性評価ツール
+      </p>
+    </div>""", unsafe_allow_html=True)
+
+    with st.container():
+        col1, col2, col3 = st.columns([1,2,1])
+        with col2:
+            # リセット後は前回の氏名を初期値にする
+            st.text_input("患者名（任意）", value=st.session_state["patient_name"], key="patient_name_input")
+            st.text_input("検査者名（任意）", value=st.session_state["examiner_name"], key="examiner_name_input")
+            st.markdown(f"""
+            <div style="background:#1e293b; padding:15px; border-radius:10px; margin:15px 0;">
+                <p style="margin:0; font-size:0.9rem;">✔️ 総試行数：最大 <b>{MAX_TRIALS}</b> 回</p>
+                <p style="margin:0; font-size:0.9rem;">✔️ 連続正解で達成：<b>{REQUIRED_CORRECT}</b> 回</p>
+            </div>
+            """, unsafe_allow_html=True)
+            if st.session_state.get("quota_full"):
+                st.warning("この施設で同時に実施できる検査数の上限に達しています。しばらくしてからもう一度開始してください。")
+            elif st.session_state.get("rate_limited"):
+                st.warning("ただいま混み合っています。少し待ってからもう一度開始してください。")
+            st.button("🚀 テストを開始する", type="primary",
+                      use_container_width=True, on_click=start_test)
+
+# ─────────────────────────────────────────
+# 画面②：テスト実施画面
+# ─────────────────────────────────────────
+@perf.timed("screen.show_test")
+def show_test(mode, use_fragments=True):
+    # 安全ガード
+    if st.session_state.get("target_card") is None:
+        st.session_state["target_card"] = engine.generate_target()
+
+    # ── 静的部分：フィードバック枠と基準カード（検査中は再実行されない）──
+    if st.session_state.get("live_room"):
+        st.caption(f"ライブモニター上の表示名：{st.session_state['live_label']}")
+    feedback_slot = st.empty()
+    mode.render_static()
+
+    # ── 動的部分：タップごとに変わるのはここだけ ──
+    body = _test_fragment if use_fragments else _test_body
+    body(mode, feedback_slot)
+
+@profiling.profiled("fragment.test_body")
+@perf.timed("screen.test_body")
+def _test_body(mode, feedback_slot):
+    # 64試行目（またはカテゴリー上限）に達したらアプリ全体を再実行して結果画面へ
+    if st.session_state["finished"]:
+        st.rerun()
+
+    target = st.session_state["target_card"]
+    trial  = st.session_state["trial_num"]
+
+    # フィードバック表示（枠はフラグメント外にあるので中身だけ差し替える）
+    feedback_slot.markdown(FEEDBACK_HTML.get(st.session_state.get("feedback"), FEEDBACK_HTML[None]), unsafe_allow_html=True)
+
+    mode.render_controls(trial, on_card_selected)
+
+    st.markdown(DIVIDER_HTML, unsafe_allow_html=True)
+
+    # ── ターゲットカード ─────────────────
+    st.markdown(target_title_html(mode.hint), unsafe_allow_html=True)
+    _, tc_col, _ = st.columns([1.5, 1, 1.5])
+    with tc_col:
+        st.markdown(target_card_html(target, trial), unsafe_allow_html=True)
+
+    perf.finish_tap(st.session_state, mode.name)
+
+# フラグメント内のボタンのコールバックは、このブロックだけを再実行する
+_test_fragment = st.fragment(_test_body)
+
+# ─────────────────────────────────────────
+# ブロック画面（ブログ経由以外のアクセスを弾く）
+# ─────────────────────────────────────────
+def show_block_screen():
+    st.markdown(BLOCK_SCREEN_HTML, unsafe_allow_html=True)
+
+# ─────────────────────────────────────────
+# メイン
+# ─────────────────────────────────────────
+@profiling.profiled("rerun")
+def main(input_mode=None):
+    st.set_page_config(
+        page_title="Card Sorting Task",
+        page_icon="🧠",
+        layout="centered",
+        initial_sidebar_state="collapsed",
+    )
+    # 起動後最初の再実行でジョブキューを作り、前回落ちたときの未完了ジョブをすぐ再投入する
+    # （次の検査が終わるまで待たない。ジョブ種別は pipeline の読み込みで登録済み）
+    jobs.get_queue()
+
+    # アクセス制限チェック
+    # 施設（テナント）を特定できない場合はブロック画面を表示して終了する
+    # （テナントの設定が無ければ従来どおり URL の末尾に「?from=blog」が必要）
+    tenant, _ = tenants.resolve(
+        st.query_params.get("tenant"),
+        st.context.headers.get(tenants.TOKEN_HEADER),
+        st.query_params.get("from"),
+    )
+    if tenant is None:
+        # Streamlitのヘッダー・フッターを消して綺麗なブロック画面にする
+        st.markdown(BLOCK_HIDE_CHROME_CSS, unsafe_allow_html=True)
+        show_block_screen()
+        return
+    st.session_state["tenant"] = tenant.id
+    render.warm_assets()
+
+    # 施設ごとの再実行の頻度の上限。待たずに判定し、超えていれば今回の描画を見送る。
+    # 検査中の再実行は見送らない（試行の途中で画面が差し替わらないように）
+    in_test = st.session_state.get("started") and not st.session_state.get("finished")
+    if not in_test and not tenants.allow_rerun(tenant):
+        st.warning("ただいま混み合っています。少し待ってから再読み込みしてください。")
+        st.button("🔄 再読み込み", type="primary")
+        return
+
+    if st.query_params.get("view") == "monitor":
+        room = st.query_params.get("room", "default")
+        if not live.valid_room(room):
+            st.error("部屋名は英数字・「_」・「-」の 64 文字までで指定してください。")
+            return
+        if examiner.require_examiner(tenant):
+            show_monitor(room, tenant.id)
+        return
+    if st.query_params.get("view") == "history":
+        if examiner.require_examiner(tenant):
+            show_history()
+        return
+    if st.query_params.get("view") == "replay":
+        if examiner.require_examiner(tenant):
+            show_replay(st.query_params.get("session"))
+        return
+    if st.query_params.get("view") == "trials":
+        if examiner.require_examiner(tenant):
+            show_trials()
+        return
+
+    mode = get_input_mode(resolve_input_mode(st.query_params.get("input"), input_mode))
+    st.markdown(page_css(mode.css), unsafe_allow_html=True)
+
+    engine.init_state(st.session_state)
+
+    if not st.session_state["started"]:
+        show_start()
+    elif st.session_state["finished"]:
+        show_results()
+    else:
+        show_test(mode, use_fragments=resolve_fragments(st.query_params.get("fragments")))
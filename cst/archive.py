@@ -0,0 +1,346 @@
+"""
+試行データのバイナリアーカイブ
+1 試行 = 16 バイトの固定長レコード（RECORD_DTYPE）を、ヘッダ付きのセグメントファイルへ追記する。
+セッションごとの位置はセッション索引ファイル（これも固定長レコード）に追記する。
+読み出しは mmap の上の NumPy 構造化配列をそのまま返すので、走査はパースせずディスクの速さで進む。
+
+    ARCHIVE_DIR/
+        seg-000000.cst, seg-000001.cst, ...   # ヘッダ 64 バイト + レコード
+        sessions.idx                         # ヘッダ 64 バイト + SESSION_DTYPE
+
+    python -m cst.archive export [--tenant ID]   # 永続ストアのセッションをまだ入っていない分だけ書き込む
+    python -m cst.archive scan [--tenant ID]     # 全レコードを走査して件数・正答率・速度を表示
+
+書き込み（アプリ本体のジョブキュー・export）は ARCHIVE_DIR/.lock の排他ロック（fcntl.flock）を取ってから行う。
+末尾の修復・セッション番号の採番もロックの中で、ほかのプロセスが足した索引を読み直してから行う。
+"""
+
+import argparse
+import contextlib
+import math
+import os
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:                                  # Windows では排他ロックなし（書き込みは 1 プロセスで）
+    fcntl = None
+
+from .config import COLORS, DATA_DIR, DEFAULT_TENANT, NUMBERS, REFERENCE_CARDS, RULE_LABEL, RULE_ORDER, SHAPES, tenant_data_dir
+from .engine import ERROR_TYPES
+
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+SEGMENT_MAX_RECORDS = 16 * 1024 * 1024               # 1 セグメント 256MiB（16 バイト × 16Mi 件）で次のファイルへ
+
+MAGIC_SEGMENT = b"CSTSEG01"
+MAGIC_INDEX = b"CSTIDX01"
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHd")                    # magic, version, record_size, created_at
+
+NO_TIME = 0xFFFFFFFF
+
+RECORD_DTYPE = np.dtype([
+    ("time_ms",     "<u4"),                          # 回答時刻（セッション開始からのミリ秒。記録が無ければ NO_TIME）
+    ("session",     "<u4"),                          # セッション番号（sessions.idx の行番号）
+    ("trial",       "<u2"),
+    ("target",      "u1"),                           # 色 * 16 + 形 * 4 + 数（各 0〜3）
+    ("chosen",      "u1"),                           # 基準カードの番号 0〜3
+    ("rule",        "u1"),                           # 0 色 / 1 形 / 2 数
+    ("dimension",   "u1"),                           # 選択次元 0 色 / 1 形 / 2 数 / 3 不一致
+    ("error",       "u1"),                           # 0 正解 / 1〜4 = ERROR_TYPES の順（正誤はここから決まる）
+    ("categories",  "u1"),                           # この試行の前までの達成カテゴリー数
+])
+assert RECORD_DTYPE.itemsize == 16
+
+SESSION_DTYPE = np.dtype([
+    ("session_id",  "S64"),
+    ("started_at",  "<f8"),                          # time_ms の基準（UNIX 秒。不明なら NaN）
+    ("segment",     "<u4"),
+    ("count",       "<u4"),
+    ("offset",      "<u8"),                          # セグメント内の先頭レコード番号
+])
+
+# ─────────────────────────────────────────
+# 符号化（ログの日本語の値 ⇔ 小さな整数）
+# ─────────────────────────────────────────
+_RULES = list(dict.fromkeys(RULE_ORDER))             # color, shape, number
+_RULE_NAMES = [RULE_LABEL[r] for r in _RULES]
+_DIMENSION_NAMES = _RULE_NAMES + ["不一致"]
+_ERROR_NAMES = ["－"] + ERROR_TYPES
+
+_COLOR_CODE = {v: i for i, v in enumerate(COLORS)}
+_SHAPE_CODE = {v: i for i, v in enumerate(SHAPES)}
+_NUMBER_CODE = {v: i for i, v in enumerate(NUMBERS)}
+_CHOSEN_CODE = {(c["color"], c["shape"], c["number"]): i for i, c in enumerate(REFERENCE_CARDS)}
+_RULE_CODE = {v: i for i, v in enumerate(_RULE_NAMES)}
+_DIMENSION_CODE = {v: i for i, v in enumerate(_DIMENSION_NAMES)}
+_ERROR_CODE = {v: i for i, v in enumerate(_ERROR_NAMES)}
+
+def encode_logs(logs, session_no=0, times=None, started_at=None):
+    # 定義域外の値は KeyError（書き込む前に気付けるように）
+    records = np.zeros(len(logs), dtype=RECORD_DTYPE)
+    records["time_ms"] = NO_TIME
+    if times:
+        base = started_at if started_at is not None else times[0]
+        offsets = np.round((np.asarray(times[:len(logs)], dtype=np.float64) - base) * 1000)
+        records["time_ms"][:len(offsets)] = np.clip(offsets, 0, NO_TIME - 1)
+    records["session"] = session_no
+    rows = [
+        (
+            e["試行"],
+            _COLOR_CODE[e["ターゲット_色"]] * 16 + _SHAPE_CODE[e["ターゲット_形"]] * 4 + _NUMBER_CODE[e["ターゲット_数"]],
+            _CHOSEN_CODE[(e["選択_色"], e["選択_形"], e["選択_数"])],
+            _RULE_CODE[e["正解ルール"]],
+            _DIMENSION_CODE[e["選択次元"]],
+            _ERROR_CODE[e["エラー種別"]],
+            e["達成カテゴリー"],
+        )
+        for e in logs
+    ]
+    if rows:
+        columns = np.array(rows, dtype=np.int64).T
+        for name, values in zip(("trial", "target", "chosen", "rule", "dimension", "error", "categories"), columns):
+            records[name] = values
+    return records
+
+def decode_records(records):
+    # score_selection と同じ日本語キーの dict に戻す（再採点・CSV 書き出し用）
+    logs = []
+    for r in records.tolist():
+        _, _, trial, target, chosen, rule, dimension, error, categories = r
+        card = REFERENCE_CARDS[chosen]
+        logs.append({
+            "試行":          trial,
+            "ターゲット_色":  COLORS[target >> 4],
+            "ターゲット_形":  SHAPES[(target >> 2) & 3],
+            "ターゲット_数":  NUMBERS[target & 3],
+            "選択_色":        card["color"],
+            "選択_形":        card["shape"],
+            "選択_数":        card["number"],
+            "正解ルール":      _RULE_NAMES[rule],
+            "選択次元":        _DIMENSION_NAMES[dimension],
+            "正誤":           "×" if error else "○",
+            "エラー種別":      _ERROR_NAMES[error],
+            "達成カテゴリー":  categories,
+        })
+    return logs
+
+# ─────────────────────────────────────────
+# ファイル
+# ─────────────────────────────────────────
+def _segment_path(root, n):
+    return os.path.join(root, f"seg-{n:06d}.cst")
+
+def _index_path(root):
+    return os.path.join(root, "sessions.idx")
+
+def _create(path, magic, dtype):
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(magic, 1, dtype.itemsize, time.time()).ljust(HEADER_SIZE, b"\0"))
+
+def _check_header(path, magic, dtype):
+    with open(path, "rb") as f:
+        got_magic, _, record_size, _ = _HEADER.unpack(f.read(_HEADER.size))
+    if got_magic != magic or record_size != dtype.itemsize:
+        raise ValueError(f"{path}: not a {magic.decode()} file")
+
+def _count(path, dtype):
+    return (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+
+def _view(path, dtype):
+    # 読み取り専用の mmap（コピーしない）。空のファイルは mmap できないので空配列
+    n = _count(path, dtype)
+    if n <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+
+class Archive:
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._session_nos = {}                       # session_id -> セッション番号（索引の行が増えた分だけ足す）
+        os.makedirs(root, exist_ok=True)
+        with self.locked():
+            if not os.path.exists(_index_path(root)):
+                _create(_index_path(root), MAGIC_INDEX, SESSION_DTYPE)
+        _check_header(_index_path(root), MAGIC_INDEX, SESSION_DTYPE)
+
+    @contextlib.contextmanager
+    def locked(self):
+        # 書き込みはプロセスをまたいで同時に 1 つだけ
+        with open(os.path.join(self.root, ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _repair(self):
+        # 索引に載る前に落ちた書き込み（セグメント末尾の余り・途中までの行）を切り捨てる。locked() の中で呼ぶ。
+        # 書き込みは常に最後のセグメントへの追記なので、索引の最後の行より後ろだけを見ればよい
+        index = _view(_index_path(self.root), SESSION_DTYPE)
+        index_bytes = HEADER_SIZE + len(index) * SESSION_DTYPE.itemsize
+        if os.path.getsize(_index_path(self.root)) != index_bytes:
+            os.truncate(_index_path(self.root), index_bytes)
+        last_segment, end = (int(index[-1]["segment"]), int(index[-1]["offset"] + index[-1]["count"])) if len(index) else (0, 0)
+        for n, path in enumerate(self.segment_paths()):
+            if n < last_segment:
+                continue
+            expected = HEADER_SIZE + (end if n == last_segment else 0) * RECORD_DTYPE.itemsize
+            if os.path.getsize(path) != expected:
+                os.truncate(path, expected)
+
+    def segment_paths(self):
+        paths = []
+        while os.path.exists(_segment_path(self.root, len(paths))):
+            paths.append(_segment_path(self.root, len(paths)))
+        return paths
+
+    # ── 読み出し ──
+    def index(self):
+        return _view(_index_path(self.root), SESSION_DTYPE)
+
+    def segments(self):
+        # セグメントごとの構造化配列（mmap のビュー）
+        return [_view(p, RECORD_DTYPE) for p in self.segment_paths()]
+
+    def _load_session_nos(self):
+        # 呼び出し側でロック済み。ほかのプロセスが索引に足した行も読む（書きかけの行は _view が数えない）
+        index = self.index()
+        known = len(self._session_nos)
+        if len(index) > known:
+            for i, sid in enumerate(index["session_id"][known:].tolist(), start=known):
+                self._session_nos[sid.decode("ascii")] = i
+        return self._session_nos
+
+    def session_nos(self):
+        with self._lock:
+            return self._load_session_nos()
+
+    def has_session(self, session_id):
+        return session_id in self.session_nos()
+
+    def session(self, session_id):
+        # 1 セッション分のレコード（ビュー）。無ければ None
+        no = self.session_nos().get(session_id)
+        if no is None:
+            return None
+        row = self.index()[no]
+        segment = _view(_segment_path(self.root, int(row["segment"])), RECORD_DTYPE)
+        return segment[int(row["offset"]):int(row["offset"]) + int(row["count"])]
+
+    def load_times(self, session_id):
+        # 各試行の回答時刻（UNIX 秒）。記録の無い試行は NaN
+        no = self.session_nos().get(session_id)
+        if no is None:
+            return None
+        records = self.session(session_id)
+        times = self.index()[no]["started_at"] + records["time_ms"] / 1000.0
+        times[records["time_ms"] == NO_TIME] = math.nan
+        return times
+
+    def load_logs(self, session_id):
+        records = self.session(session_id)
+        return None if records is None else decode_records(records)
+
+    # ── 書き込み ──
+    def append_session(self, session_id, logs, times=None, started_at=None):
+        # 同じ session_id は二度書かない。戻り値は書いたかどうか
+        if not logs:
+            return False
+        if started_at is None and times:
+            started_at = times[0]
+        return self.append_records(session_id, encode_logs(logs, times=times, started_at=started_at), started_at)
+
+    def append_records(self, session_id, records, started_at=None):
+        with self._lock, self.locked():
+            self._repair()
+            session_nos = self._load_session_nos()
+            if session_id in session_nos:
+                return False
+            records = records.copy()
+            records["session"] = len(session_nos)
+
+            paths = self.segment_paths()
+            if not paths or _count(paths[-1], RECORD_DTYPE) + len(records) > SEGMENT_MAX_RECORDS:
+                _create(_segment_path(self.root, len(paths)), MAGIC_SEGMENT, RECORD_DTYPE)
+                paths.append(_segment_path(self.root, len(paths)))
+            offset = _count(paths[-1], RECORD_DTYPE)
+
+            # レコード → 索引の順に書く（途中で落ちても索引に無いレコードは _repair で消える）
+            with open(paths[-1], "ab") as f:
+                f.write(records.tobytes())
+            entry = np.array([(session_id.encode("ascii"), math.nan if started_at is None else started_at,
+                               len(paths) - 1, len(records), offset)],
+                             dtype=SESSION_DTYPE)
+            with open(_index_path(self.root), "ab") as f:
+                f.write(entry.tobytes())
+            session_nos[session_id] = len(session_nos)
+            return True
+
+_archives = {}
+_archive_lock = threading.Lock()
+
+def get_archive(tenant=None):
+    tenant = tenant or DEFAULT_TENANT
+    with _archive_lock:
+        if tenant not in _archives:
+            root = ARCHIVE_DIR if tenant == DEFAULT_TENANT else os.path.join(tenant_data_dir(tenant), "archive")
+            _archives[tenant] = Archive(root)
+        return _archives[tenant]
+
+# ─────────────────────────────────────────
+# コマンドライン
+# ─────────────────────────────────────────
+def export_store(archive=None, store=None, batch=1000):
+    from .store import get_store
+    archive = archive or get_archive()
+    store = store or get_store()
+    known = archive.session_nos()
+    written = 0
+    rows = store.conn.execute("SELECT session_id FROM sessions ORDER BY finished_at").fetchall()
+    for row in rows:
+        if row["session_id"] in known:
+            continue
+        written += archive.append_session(row["session_id"], store.load_logs(row["session_id"]))
+    return written
+
+def scan(archive=None):
+    # 全セグメントをベクトル演算で集計する（レコードをパースしない）
+    archive = archive or get_archive()
+    trials = correct = 0
+    errors = np.zeros(len(_ERROR_NAMES), dtype=np.int64)
+    for records in archive.segments():
+        trials += len(records)
+        correct += int(np.count_nonzero(records["error"] == 0))
+        errors += np.bincount(records["error"], minlength=len(_ERROR_NAMES))
+    return {"trials": trials, "correct": correct,
+            "errors": {name: int(n) for name, n in zip(_ERROR_NAMES[1:], errors[1:])}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="試行データのバイナリアーカイブ")
+    parser.add_argument("command", choices=("export", "scan"))
+    parser.add_argument("--tenant", default=None)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.command == "export":
+        from .store import get_store
+        written = export_store(get_archive(args.tenant), get_store(args.tenant))
+        print(f"exported {written} sessions in {time.perf_counter() - t0:.1f}s")
+    else:
+        result = scan(get_archive(args.tenant))
+        elapsed = time.perf_counter() - t0
+        size = sum(os.path.getsize(p) for p in get_archive(args.tenant).segment_paths())
+        print(result)
+        print(f"scanned {size / 2**20:.1f}MiB in {elapsed:.2f}s ({size / 2**20 / elapsed if elapsed else 0:.0f}MiB/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
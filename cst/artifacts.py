@@ -0,0 +1,158 @@
+"""
+レポート成果物
+終了したセッションから CSV / JSON / PNG（グラフ）/ PDF を一度だけ生成し、
+セッションハッシュをキーに ArtifactCache へ保存する。以降の表示・ダウンロードはキャッシュから返す。
+
+PNG は kaleido がインストールされている場合のみ生成する（PDF は常に生成する）。
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from . import engine
+from .cache import ArtifactCache
+from .charts import error_pie_figure
+from .config import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES, DEFAULT_TENANT, tenant_data_dir
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+CSV_NAME  = "report.csv"
+JSON_NAME = "report.json"
+PNG_NAME  = "chart.png"
+PDF_NAME  = "report.pdf"
+
+_PDF_FONT = "HeiseiKakuGo-W5"
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+def get_cache(tenant=None):
+    # テナントごとに別のキャッシュ（上限もそれぞれに効く）
+    tenant = tenant or DEFAULT_TENANT
+    with _cache_lock:
+        if tenant not in _caches:
+            root = ARTIFACT_CACHE_DIR if tenant == DEFAULT_TENANT else os.path.join(tenant_data_dir(tenant), "artifacts")
+            _caches[tenant] = ArtifactCache(root, ARTIFACT_CACHE_MAX_BYTES)
+        return _caches[tenant]
+
+# ─────────────────────────────────────────
+# セッションハッシュ
+# ─────────────────────────────────────────
+def session_meta(state):
+    return {
+        "patient_name":  state.get("patient_name", ""),
+        "examiner_name": state.get("examiner_name", ""),
+        "categories":    state["categories_achieved"],
+        "started_at":    state.get("started_at"),
+        "finished_at":   state.get("finished_at"),
+    }
+
+def session_hash(logs, meta):
+    payload = json.dumps({"meta": meta, "logs": logs}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ─────────────────────────────────────────
+# 個別の成果物
+# ─────────────────────────────────────────
+def build_csv(logs):
+    # Excel で文字化けしないよう BOM 付き UTF-8
+    return pd.DataFrame(logs).to_csv(index=False).encode("utf-8-sig")
+
+def build_json(logs, meta, summary):
+    return json.dumps(
+        {"meta": meta, "summary": summary, "logs": logs},
+        ensure_ascii=False, indent=1,
+    ).encode("utf-8")
+
+def build_chart_png(summary):
+    if not summary["total_errors"]:
+        return None
+    fig = error_pie_figure(summary["error_counts"], font_color="#1f2937")
+    try:
+        return fig.to_image(format="png", width=480, height=360, scale=2)
+    except Exception:                                  # kaleido 未導入・ブラウザ起動失敗など
+        return None
+
+def build_pdf(logs, meta, summary, chart_png=None):
+    if _PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(_PDF_FONT))
+
+    styles = getSampleStyleSheet()
+    for name in ("Title", "Heading2", "Normal"):
+        styles[name].fontName = _PDF_FONT
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=15 * mm, bottomMargin=15 * mm, title="Card Sorting Task")
+    story = [Paragraph("Card Sorting Task テスト結果レポート", styles["Title"])]
+    if meta["patient_name"] or meta["examiner_name"]:
+        story.append(Paragraph(f"患者名：{escape(meta['patient_name'])}　検査者：{escape(meta['examiner_name'])}", styles["Normal"]))
+    story.append(Spacer(1, 4 * mm))
+
+    base_style = [
+        ("FONT", (0, 0), (-1, -1), _PDF_FONT, 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e2e8f0")),
+    ]
+    story.append(Table([
+        ["総試行数", "達成カテゴリー", "総正解数", "総エラー数"],
+        [summary["total_trials"], summary["categories"], summary["total_correct"], summary["total_errors"]],
+    ], style=TableStyle(base_style)))
+    story.append(Spacer(1, 4 * mm))
+
+    story.append(Paragraph("エラー種別の内訳", styles["Heading2"]))
+    story.append(Table(
+        [["エラー種別", "回数"]] + [[k, v] for k, v in summary["error_counts"].items()],
+        style=TableStyle(base_style),
+    ))
+    if chart_png:
+        story.append(Image(io.BytesIO(chart_png), width=80 * mm, height=60 * mm))
+    story.append(Spacer(1, 4 * mm))
+
+    story.append(Paragraph("全試行の詳細ログ", styles["Heading2"]))
+    if logs:
+        columns = list(logs[0].keys())
+        rows = [columns] + [[str(entry[c]) for c in columns] for entry in logs]
+        story.append(Table(rows, repeatRows=1, style=TableStyle(base_style + [("FONT", (0, 0), (-1, -1), _PDF_FONT, 6)])))
+
+    doc.build(story)
+    return buf.getvalue()
+
+# ─────────────────────────────────────────
+# 生成とキャッシュ
+# ─────────────────────────────────────────
+def build_artifacts(logs, meta):
+    summary = engine.summarize(logs, meta["categories"])
+    artifacts = {
+        CSV_NAME:  build_csv(logs),
+        JSON_NAME: build_json(logs, meta, summary),
+    }
+    chart_png = build_chart_png(summary)
+    if chart_png:
+        artifacts[PNG_NAME] = chart_png
+    artifacts[PDF_NAME] = build_pdf(logs, meta, summary, chart_png)
+    return artifacts
+
+def ensure_artifacts(logs, meta, cache=None):
+    # 同じセッションは二度生成しない。戻り値は (セッションハッシュ, {名前: bytes})
+    cache = cache or get_cache()
+    key = session_hash(logs, meta)
+    if cache.has(key):
+        cached = cache.get_all(key)
+        if cached and CSV_NAME in cached:
+            return key, cached
+    artifacts = build_artifacts(logs, meta)
+    cache.put(key, artifacts)
+    return key, artifacts
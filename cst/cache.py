@@ -0,0 +1,132 @@
+"""
+成果物キャッシュ
+セッションハッシュをキーにした内容アドレス方式のディスクキャッシュ。
+圧縮して保存し（zstandard があれば zstd、なければ gzip）、合計サイズが上限を超えたら
+最終アクセスの古いセッションから削除する（LRU）。
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # 任意依存
+    zstandard = None
+
+
+def _compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".zst"
+    return gzip.compress(data, compresslevel=9, mtime=0), ".gz"
+
+
+def _decompress(data, suffix):
+    if suffix == ".zst":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ArtifactCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._sizes = self._scan()                   # {session_hash: 合計バイト}
+
+    # ── パス ──
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _scan(self):
+        sizes = {}
+        for prefix in os.listdir(self.root):
+            pdir = os.path.join(self.root, prefix)
+            if not os.path.isdir(pdir):
+                continue
+            for key in os.listdir(pdir):
+                edir = os.path.join(pdir, key)
+                if key.startswith(".tmp-"):          # 書き込み途中で落ちた残骸
+                    shutil.rmtree(edir, ignore_errors=True)
+                    continue
+                sizes[key] = sum(os.path.getsize(os.path.join(edir, f)) for f in os.listdir(edir))
+        return sizes
+
+    def _find(self, key, name):
+        edir = self._entry_dir(key)
+        for suffix in (".zst", ".gz"):
+            path = os.path.join(edir, name + suffix)
+            if os.path.exists(path):
+                return path, suffix
+        return None, None
+
+    # ── 読み書き ──
+    def has(self, key):
+        return key in self._sizes
+
+    def get(self, key, name):
+        path, suffix = self._find(key, name)
+        if path is None:
+            return None
+        if suffix == ".zst" and zstandard is None:
+            return None
+        # ディレクトリの mtime を最終アクセス時刻として使う
+        try:
+            now = time.time()
+            os.utime(self._entry_dir(key), (now, now))
+            with open(path, "rb") as f:
+                return _decompress(f.read(), suffix)
+        except FileNotFoundError:                    # 直前に追い出された
+            return None
+
+    def get_all(self, key):
+        edir = self._entry_dir(key)
+        if not os.path.isdir(edir):
+            return None
+        out = {}
+        for fname in os.listdir(edir):
+            name, suffix = os.path.splitext(fname)
+            data = self.get(key, name)
+            if data is not None:
+                out[name] = data
+        return out
+
+    def put(self, key, artifacts):
+        # artifacts: {"report.csv": bytes, ...}。セッション単位でまとめて書き込み、
+        # 一時ディレクトリからの rename で途中状態が見えないようにする
+        edir = self._entry_dir(key)
+        os.makedirs(os.path.dirname(edir), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(edir), prefix=".tmp-")
+        total = 0
+        for name, data in artifacts.items():
+            blob, suffix = _compress(data)
+            with open(os.path.join(tmp, name + suffix), "wb") as f:
+                f.write(blob)
+            total += len(blob)
+        with self._lock:
+            if os.path.isdir(edir):
+                shutil.rmtree(edir)
+            os.rename(tmp, edir)
+            self._sizes[key] = total
+            self._evict(keep=key)
+
+    def _evict(self, keep=None):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(
+            (k for k in self._sizes if k != keep),
+            key=lambda k: os.path.getmtime(self._entry_dir(k)),
+        )
+        for key in by_age:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= self._sizes.pop(key)
+
+    def total_bytes(self):
+        return sum(self._sizes.values())
@@ -0,0 +1,136 @@
+"""
+グラフ生成
+既定はサーバー側で組み立てる軽量なインライン SVG（generate_card_svg と同じ方式）。
+Plotly は対話的表示を選んだ場合（?charts=plotly）と PNG 書き出しのときだけ読み込む。
+"""
+
+import math
+from functools import lru_cache
+
+ERROR_COLOR_MAP = {
+    "ミルナー型保続": "#ef4444",
+    "ネルソン型保続": "#f97316",
+    "セット維持困難": "#eab308",
+    "非保続性エラー": "#6b7280",
+}
+CORRECT_COLOR = "#22c55e"
+
+def _ordered(error_counts):
+    # 0 回の種別は描かない・多い順
+    return sorted((k for k, v in error_counts.items() if v), key=lambda k: -error_counts[k])
+
+# ─────────────────────────────────────────
+# Plotly（対話モード・画像書き出し用）
+# ─────────────────────────────────────────
+def error_pie_figure(error_counts, font_color="#e2e8f0"):
+    import plotly.graph_objects as go
+
+    labels = _ordered(error_counts)
+    values = [error_counts[k] for k in labels]
+    fig = go.Figure(go.Pie(
+        labels=labels,
+        values=values,
+        marker_colors=[ERROR_COLOR_MAP.get(x, "#6b7280") for x in labels],
+        hole=0.4,
+        textinfo="label+value+percent",
+    ))
+    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", font_color=font_color, showlegend=False, margin=dict(t=10,b=10,l=10,r=10))
+    return fig
+
+# ─────────────────────────────────────────
+# インライン SVG
+# ─────────────────────────────────────────
+def _arc_path(cx, cy, r_out, r_in, start, end):
+    # start/end はラジアン（12時方向が 0、時計回り）
+    large = 1 if end - start > math.pi else 0
+    def pt(r, a):
+        return f"{cx + r * math.sin(a):.1f},{cy - r * math.cos(a):.1f}"
+    return (f"M{pt(r_out, start)}A{r_out},{r_out} 0 {large} 1 {pt(r_out, end)}"
+            f"L{pt(r_in, end)}A{r_in},{r_in} 0 {large} 0 {pt(r_in, start)}Z")
+
+@lru_cache(maxsize=512)
+def _error_donut_svg(items):
+    error_counts = dict(items)
+    labels = _ordered(error_counts)
+    total = sum(error_counts[k] for k in labels)
+    if not total:
+        return '<p style="color:#94a3b8; text-align:center;">エラーはありません</p>'
+
+    cx, cy, r_out, r_in = 80, 80, 75, 45
+    parts = []
+    angle = 0.0
+    for label in labels:
+        sweep = 2 * math.pi * error_counts[label] / total
+        color = ERROR_COLOR_MAP.get(label, "#6b7280")
+        if sweep >= 2 * math.pi - 1e-9:              # 1 種類だけなら円環をそのまま描く
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{(r_out + r_in) / 2}" fill="none" '
+                         f'stroke="{color}" stroke-width="{r_out - r_in}"/>')
+        else:
+            parts.append(f'<path d="{_arc_path(cx, cy, r_out, r_in, angle, angle + sweep)}" fill="{color}"/>')
+        angle += sweep
+    parts.append(f'<text x="{cx}" y="{cy + 6}" text-anchor="middle" font-size="18" '
+                 f'font-weight="bold" fill="#e2e8f0">{total}</text>')
+
+    legend = []
+    for i, label in enumerate(labels):
+        y = 30 + i * 26
+        n = error_counts[label]
+        legend.append(
+            f'<rect x="180" y="{y - 11}" width="12" height="12" rx="2" fill="{ERROR_COLOR_MAP.get(label, "#6b7280")}"/>'
+            f'<text x="198" y="{y}" font-size="13" fill="#e2e8f0">{label}　{n}回（{n / total:.0%}）</text>'
+        )
+    return (f'<svg class="cst-chart" viewBox="0 0 360 160" style="width:100%; height:auto;" '
+            f'role="img" aria-label="エラー種別の内訳">{"".join(parts)}{"".join(legend)}</svg>')
+
+def error_donut_svg(error_counts):
+    return _error_donut_svg(tuple(error_counts.items()))
+
+@lru_cache(maxsize=512)
+def _accuracy_timeline_svg(outcomes, category_trials, window):
+    n = len(outcomes)
+    if not n:
+        return ""
+    w, h, pad = 640, 120, 24
+    step = (w - 2 * pad) / max(n - 1, 1)
+    x = [pad + i * step for i in range(n)]
+
+    # 試行ごとのマーカー（正解は緑、エラーは種別色）
+    marks = "".join(
+        f'<rect x="{x[i] - 3:.1f}" y="{h - 14}" width="6" height="10" rx="1" '
+        f'fill="{CORRECT_COLOR if o == "○" else ERROR_COLOR_MAP.get(o, "#6b7280")}"/>'
+        for i, o in enumerate(outcomes)
+    )
+    # 直近 window 試行の正答率の推移
+    points, hits = [], 0
+    for i, o in enumerate(outcomes):
+        hits += o == "○"
+        if i >= window:
+            hits -= outcomes[i - window] == "○"
+        rate = hits / min(i + 1, window)
+        points.append(f"{x[i]:.1f},{pad + (1 - rate) * (h - 2 * pad - 10):.1f}")
+    line = f'<polyline points="{" ".join(points)}" fill="none" stroke="#60a5fa" stroke-width="2"/>'
+    # カテゴリー達成の位置
+    cats = "".join(
+        f'<line x1="{x[t - 1]:.1f}" y1="{pad - 8}" x2="{x[t - 1]:.1f}" y2="{h - 16}" '
+        f'stroke="#fbbf24" stroke-dasharray="3,3"/>'
+        for t in category_trials if 0 < t <= n
+    )
+    axis = (f'<text x="{pad}" y="{pad - 10}" font-size="11" fill="#94a3b8">直近{window}試行の正答率</text>'
+            f'<text x="{w - pad}" y="{pad - 10}" font-size="11" fill="#94a3b8" text-anchor="end">'
+            f'<tspan fill="#fbbf24">┆</tspan> カテゴリー達成</text>')
+    return (f'<svg class="cst-chart" viewBox="0 0 {w} {h}" style="width:100%; height:auto;" '
+            f'role="img" aria-label="試行ごとの正誤と正答率の推移">{axis}{cats}{line}{marks}</svg>')
+
+def accuracy_timeline_svg(logs, final_categories=None, window=8):
+    # outcomes: 正解は "○"、エラーはエラー種別名
+    outcomes = tuple("○" if e["正誤"] == "○" else e["エラー種別"] for e in logs)
+    # 達成カテゴリー数が増えた直前の試行 = カテゴリーを達成した試行
+    category_trials = [
+        logs[i - 1]["試行"] for i in range(1, len(logs))
+        if logs[i]["達成カテゴリー"] > logs[i - 1]["達成カテゴリー"]
+    ]
+    # 最終試行での達成はログの次の行が無いので、検査終了時のカテゴリー数で補う
+    if logs and final_categories is not None and final_categories > logs[-1]["達成カテゴリー"]:
+        category_trials.append(logs[-1]["試行"])
+    category_trials = tuple(category_trials)
+    return _accuracy_timeline_svg(outcomes, category_trials, window)
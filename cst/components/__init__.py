@@ -0,0 +1,38 @@
+"""
+カスタムコンポーネント
+"""
+
+import os
+from functools import lru_cache
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from ..config import REFERENCE_CARDS
+from ..render import card_svg
+
+_card_picker = components.declare_component(
+    "card_picker",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "card_picker"),
+)
+
+# 引数は検査中ずっと同じ値を渡す（iframe を作り直させない・ウィジェットIDを変えない）
+@lru_cache(maxsize=1)
+def _cards_arg():
+    return [
+        {
+            "svg":   card_svg(card, size="small"),
+            "title": f"{card['color']}・{card['shape']}・{card['number']}",
+        }
+        for card in REFERENCE_CARDS
+    ]
+
+def card_picker(on_select, key="card_picker"):
+    # 値は {"index", "seq", "nonce"}。タップのたびに seq が増えるので on_change が必ず発火する
+    def _changed():
+        value = st.session_state.get(key) or {}
+        index = value.get("index")
+        if isinstance(index, int) and 0 <= index < len(REFERENCE_CARDS):
+            on_select(index)
+
+    return _card_picker(cards=_cards_arg(), key=key, default=None, on_change=_changed)
@@ -0,0 +1,107 @@
+"""
+定数・設定
+検査プロトコルの定数と、環境変数／クエリパラメータからの設定解決
+"""
+
+import os
+
+# ─────────────────────────────────────────
+# 検査プロトコル
+# ─────────────────────────────────────────
+MAX_TRIALS = 64
+REQUIRED_CORRECT = 6
+MAX_CATEGORIES = 6
+
+COLORS  = ["赤", "緑", "黄", "青"]
+SHAPES  = ["三角", "星", "十字", "丸"]
+NUMBERS = ["1", "2", "3", "4"]
+
+RULE_LABEL   = {"color": "色", "shape": "形", "number": "数"}
+RULE_ORDER   = ["color", "shape", "number", "color", "shape", "number"]
+
+REFERENCE_CARDS = [
+    {"color": "赤",  "shape": "三角", "number": "1"},
+    {"color": "緑",  "shape": "星",   "number": "2"},
+    {"color": "黄",  "shape": "十字", "number": "3"},
+    {"color": "青",  "shape": "丸",   "number": "4"},
+]
+
+# ★★★ ここを新しいドメインに変更しました ★★★
+BLOG_URL = "https://dementia-stroke-st.com/"
+
+# ─────────────────────────────────────────
+# 入力方式
+# ─────────────────────────────────────────
+# component : 基準カードを直接タップ（カスタムコンポーネント・既定）
+# hidden    : 基準カードを直接タップ（隠しボタン + components.html ブリッジ・旧方式）
+# button    : 基準カード下の「選ぶ」ボタン
+INPUT_MODE_NAMES = ("component", "hidden", "button")
+DEFAULT_INPUT_MODE = os.environ.get("CST_INPUT_MODE", "component")
+
+
+def resolve_input_mode(query_value=None, default=None):
+    # 優先順位：クエリパラメータ（?input=...） > 呼び出し側の既定値 > 環境変数
+    for candidate in (query_value, default, DEFAULT_INPUT_MODE):
+        if candidate in INPUT_MODE_NAMES:
+            return candidate
+    return INPUT_MODE_NAMES[0]
+
+# ─────────────────────────────────────────
+# テスト画面の部分再実行（st.fragment）
+# ─────────────────────────────────────────
+DEFAULT_FRAGMENTS = os.environ.get("CST_FRAGMENTS", "1") != "0"
+
+
+def resolve_fragments(query_value=None):
+    if query_value is not None:
+        return query_value != "0"
+    return DEFAULT_FRAGMENTS
+
+# ─────────────────────────────────────────
+# 保存先
+# ─────────────────────────────────────────
+DATA_DIR = os.environ.get("CST_DATA_DIR", os.path.join(os.getcwd(), "data"))
+ARTIFACT_CACHE_DIR = os.path.join(DATA_DIR, "artifacts")
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("CST_ARTIFACT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# ─────────────────────────────────────────
+# 結果画面のグラフ
+# ─────────────────────────────────────────
+# svg    : サーバー側で組み立てるインライン SVG（既定・タブレット向け）
+# plotly : 対話的な Plotly グラフ（Plotly の JS を読み込む）
+CHART_MODES = ("svg", "plotly")
+DEFAULT_CHART_MODE = os.environ.get("CST_CHARTS", "svg")
+
+
+def resolve_chart_mode(query_value=None):
+    for candidate in (query_value, DEFAULT_CHART_MODE):
+        if candidate in CHART_MODES:
+            return candidate
+    return CHART_MODES[0]
+
+# ─────────────────────────────────────────
+# プロファイリング（既定は無効）
+# ─────────────────────────────────────────
+# CST_PROFILE=1 で全再実行を計測する。CST_PROFILE_TOKEN を設定すると
+# ?profile=<トークン> を付けたセッションだけを計測できる（管理者用）
+PROFILE_ENABLED = os.environ.get("CST_PROFILE", "0") not in ("", "0")
+PROFILE_TOKEN = os.environ.get("CST_PROFILE_TOKEN", "")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+# ─────────────────────────────────────────
+# テナント（施設）
+# ─────────────────────────────────────────
+# CST_TENANTS の JSON（既定 DATA_DIR/tenants.json）で施設ごとのトークン・上限を定義する（tenants.py）。
+# ファイルが無ければ従来どおり ?from=blog で入る "default" テナントだけになる
+TENANTS_FILE = os.environ.get("CST_TENANTS", os.path.join(DATA_DIR, "tenants.json"))
+DEFAULT_TENANT = "default"
+# 検査者用の画面（ライブモニターなど）の合言葉。施設ごとには tenants.json の examiner_tokens、
+# default テナントで examiner_tokens が無ければこの値を使う（どちらも無ければ検査者用の画面は開けない）
+EXAMINER_TOKEN = os.environ.get("CST_EXAMINER_TOKEN", "")
+
+
+def tenant_data_dir(tenant=None):
+    # default テナントは従来の DATA_DIR をそのまま使う（既存のデータを移さなくてよい）
+    if tenant in (None, DEFAULT_TENANT):
+        return DATA_DIR
+    return os.path.join(DATA_DIR, "tenants", tenant)
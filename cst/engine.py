@@ -0,0 +1,257 @@
+"""
+採点エンジン
+Streamlit に依存しない検査ロジック。state は st.session_state と同じ dict 互換オブジェクト。
+"""
+
+import random
+import time
+
+from .config import (
+    COLORS, SHAPES, NUMBERS, RULE_LABEL, RULE_ORDER, REFERENCE_CARDS,
+    MAX_TRIALS, REQUIRED_CORRECT, MAX_CATEGORIES,
+)
+
+# ─────────────────────────────────────────
+# 試行ログのスキーマ（score_selection が作る dict のキー → 保存用の列名）
+# ─────────────────────────────────────────
+LOG_COLUMNS = {
+    "試行":          "trial",
+    "ターゲット_色":  "target_color",
+    "ターゲット_形":  "target_shape",
+    "ターゲット_数":  "target_number",
+    "選択_色":        "chosen_color",
+    "選択_形":        "chosen_shape",
+    "選択_数":        "chosen_number",
+    "正解ルール":      "rule",
+    "選択次元":        "chosen_dimension",
+    "正誤":           "correct",
+    "エラー種別":      "error_type",
+    "達成カテゴリー":  "categories_before",
+}
+
+# ─────────────────────────────────────────
+# 初期化
+# ─────────────────────────────────────────
+def default_state():
+    return {
+        "started": False,
+        "finished": False,
+        "trial_num": 0,
+        "logs": [],
+        "trial_times": [],                           # 各試行の回答時刻（logs と同じ並び）
+        "current_rule_index": 0,
+        "consecutive_correct": 0,
+        "categories_achieved": 0,
+        "target_card": None,
+        "feedback": None,
+        "prev_wrong_dimension": None,
+        "prev_correct_rule": None,
+        "rule_just_changed": False,
+        "patient_name": "",
+        "examiner_name": "",
+        "started_at": None,
+        "finished_at": None,
+        "session_id": None,
+        "metrics": new_metrics(),
+    }
+
+# リセット時に消去するキー（患者名・検査者名は残す）
+TEST_KEYS = [
+    "started","finished","trial_num","logs","trial_times",
+    "current_rule_index","consecutive_correct","categories_achieved",
+    "target_card","feedback","prev_wrong_dimension",
+    "prev_correct_rule","rule_just_changed",
+    "started_at","finished_at","session_id","metrics",
+]
+
+def init_state(state):
+    for k, v in default_state().items():
+        if k not in state:
+            state[k] = v
+
+def reset_test(state):
+    for k in TEST_KEYS:
+        if k in state:
+            del state[k]
+    init_state(state)
+
+def generate_target():
+    return {
+        "color":  random.choice(COLORS),
+        "shape":  random.choice(SHAPES),
+        "number": random.choice(NUMBERS),
+    }
+
+def current_rule(state):
+    idx = state["current_rule_index"]
+    return RULE_ORDER[idx] if idx < len(RULE_ORDER) else "color"
+
+def start_test(state):
+    state["started"] = True
+    state["started_at"] = time.time()
+    state["target_card"] = generate_target()
+
+# ─────────────────────────────────────────
+# カード選択時の処理
+# ─────────────────────────────────────────
+def score_selection(state, ref_index: int):
+    target  = state["target_card"]
+    chosen  = REFERENCE_CARDS[ref_index]
+    rule    = current_rule(state)
+    is_correct = target[rule] == chosen[rule]
+
+    error_type = None
+    chosen_dimension = _match_dimension(target, chosen)
+
+    if not is_correct:
+        if (state["rule_just_changed"]
+                and chosen_dimension == state["prev_correct_rule"]):
+            error_type = "milner"
+        elif (state["prev_wrong_dimension"] is not None
+              and chosen_dimension == state["prev_wrong_dimension"]
+              and chosen_dimension != rule):
+            error_type = "nelson"
+        elif state["consecutive_correct"] >= 3:
+            error_type = "failure_to_maintain"
+        else:
+            error_type = "other"
+
+    log_entry = {
+        "試行":          state["trial_num"] + 1,
+        "ターゲット_色":  target["color"],
+        "ターゲット_形":  target["shape"],
+        "ターゲット_数":  target["number"],
+        "選択_色":        chosen["color"],
+        "選択_形":        chosen["shape"],
+        "選択_数":        chosen["number"],
+        "正解ルール":      RULE_LABEL[rule],
+        "選択次元":        RULE_LABEL.get(chosen_dimension, "不一致"),
+        "正誤":           "○" if is_correct else "×",
+        "エラー種別":      _error_label(error_type),
+        "達成カテゴリー":  state["categories_achieved"],
+    }
+    state["logs"].append(log_entry)
+    state["trial_times"].append(time.time())
+    update_metrics(state["metrics"], log_entry)
+
+    if is_correct:
+        state["consecutive_correct"] += 1
+        state["prev_wrong_dimension"] = None
+        state["rule_just_changed"] = False
+
+        if state["consecutive_correct"] >= REQUIRED_CORRECT:
+            state["categories_achieved"] += 1
+            state["metrics"]["categories"] = state["categories_achieved"]
+            state["consecutive_correct"] = 0
+            old_rule = current_rule(state)
+            state["current_rule_index"] += 1
+            state["prev_correct_rule"]   = old_rule
+            state["rule_just_changed"]   = True
+    else:
+        state["consecutive_correct"] = 0
+        state["prev_wrong_dimension"] = chosen_dimension
+        state["rule_just_changed"]    = False
+
+    state["feedback"]   = "correct" if is_correct else "incorrect"
+    state["trial_num"] += 1
+    state["target_card"] = generate_target()
+
+    if (state["trial_num"] >= MAX_TRIALS
+            or state["categories_achieved"] >= MAX_CATEGORIES):
+        state["finished"] = True
+        state["finished_at"] = time.time()
+
+    return log_entry
+
+def _match_dimension(target, chosen):
+    for dim in ["color", "shape", "number"]:
+        if target[dim] == chosen[dim]:
+            return dim
+    return None
+
+def _error_label(error_type):
+    mapping = {
+        "milner":             "ミルナー型保続",
+        "nelson":             "ネルソン型保続",
+        "failure_to_maintain":"セット維持困難",
+        "other":              "非保続性エラー",
+        None:                 "－",
+    }
+    return mapping.get(error_type, "非保続性エラー")
+
+# ─────────────────────────────────────────
+# 集計（1試行ごとに O(1) で更新するランニング指標）
+# ─────────────────────────────────────────
+ERROR_TYPES = ["ミルナー型保続", "ネルソン型保続", "セット維持困難", "非保続性エラー"]
+PERSEVERATIVE_TYPES = ("ミルナー型保続", "ネルソン型保続")
+
+def new_metrics():
+    return {
+        "total_trials":  0,
+        "categories":    0,
+        "total_correct": 0,
+        "total_errors":  0,
+        "error_counts":  {label: 0 for label in ERROR_TYPES},
+        "perseverative": 0,                          # ミルナー型 + ネルソン型
+        "streak":        0,                          # 現在の連続正解数
+        "max_streak":    0,
+    }
+
+def update_metrics(metrics, log_entry):
+    metrics["total_trials"] += 1
+    if log_entry["正誤"] == "○":
+        metrics["total_correct"] += 1
+        metrics["streak"] += 1
+        metrics["max_streak"] = max(metrics["max_streak"], metrics["streak"])
+    else:
+        label = log_entry["エラー種別"]
+        metrics["total_errors"] += 1
+        metrics["error_counts"][label] = metrics["error_counts"].get(label, 0) + 1
+        if label in PERSEVERATIVE_TYPES:
+            metrics["perseverative"] += 1
+        metrics["streak"] = 0
+
+def summarize(logs, categories_achieved):
+    # 保存済み・取り込んだログなど、ランニング指標を持たないログから同じ集計を作る
+    metrics = new_metrics()
+    for entry in logs:
+        update_metrics(metrics, entry)
+    metrics["categories"] = categories_achieved
+    return metrics
+
+# ─────────────────────────────────────────
+# 記録済みログの再採点
+# ─────────────────────────────────────────
+def chosen_index(entry):
+    # ログの「選択_*」から基準カードの番号を引く（見つからなければ None）
+    for i, card in enumerate(REFERENCE_CARDS):
+        if (card["color"], card["shape"], card["number"]) == (entry["選択_色"], entry["選択_形"], entry["選択_数"]):
+            return i
+    return None
+
+def rescore(logs, state=None):
+    # 記録されたターゲットと選択だけを使って採点をやり直す。
+    # 戻り値は (やり直した後の state, 記録と食い違った試行番号のリスト)
+    state = state if state is not None else default_state()
+    state["started"] = True
+    mismatches = []
+    for entry in logs:
+        recomputed = replay_step(state, entry)
+        if recomputed is None or any(recomputed[k] != entry[k] for k in LOG_COLUMNS):
+            mismatches.append(entry.get("試行"))
+    return state, mismatches
+
+def replay_step(state, entry):
+    # 記録 1 行分を state に適用する（ターゲットは記録どおり）。選択が読めなければ None
+    index = chosen_index(entry)
+    if index is None:
+        return None
+    state["target_card"] = logged_target(entry)
+    return score_selection(state, index)
+
+def logged_target(entry):
+    return {
+        "color":  entry["ターゲット_色"],
+        "shape":  entry["ターゲット_形"],
+        "number": entry["ターゲット_数"],
+    }
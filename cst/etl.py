@@ -0,0 +1,355 @@
+"""
+分析用ストアへの差分 ETL
+永続ストア（sessions / trials）から前回の実行以降に保存されたセッションだけを読み、
+日本語の値の列を型付き・コード化した列（Parquet の dictionary 列）へまとめて変換して、
+終了日ごとのパーティションに追記する。
+
+    ANALYTICS_DIR/
+        _manifest.json                                 # 取り込み元ごとの最高水位・有効なファイル・実行の記録
+        sessions/date=YYYY-MM-DD/part-*.parquet
+        trials/date=YYYY-MM-DD/part-*.parquet
+
+    python -m cst.etl [--tenant ID] [--batch 2000] [--follow 秒]
+
+- 最高水位：sessions の rowid（保存順に増える。取り込みで古い日付のセッションが後から入っても取りこぼさない）
+- 冪等・再開可能：ファイルとその取り込み元の水位は、マニフェストの置き換え（os.replace）1 回で同時に確定する。
+  途中で落ちたら確定前のファイルは次の実行で消し、同じ範囲からやり直す
+- 小さなファイルが COMPACT_MIN_FILES 個たまった日付は 1 ファイルにまとめ直す
+- コードの並び（COLORS・SHAPES・NUMBERS・ルール・選択次元・エラー種別）はバイナリアーカイブと同じ
+"""
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:                                  # Windows では排他ロックなし（書き込みは 1 プロセスで）
+    fcntl = None
+
+from . import perf, registry
+from .config import COLORS, DATA_DIR, DEFAULT_TENANT, NUMBERS, RULE_LABEL, RULE_ORDER, SHAPES, tenant_data_dir
+from .engine import ERROR_TYPES, PERSEVERATIVE_TYPES
+from .store import TRIAL_COLUMNS, get_store
+
+ANALYTICS_DIR = os.path.join(DATA_DIR, "analytics")
+MANIFEST = "_manifest.json"
+DEFAULT_BATCH = 2000                                 # 1 バッチのセッション数（約 13 万試行）
+COMPACT_MIN_FILES = 8                                # 同じ日付にこれだけたまったら 1 ファイルにまとめる
+MAX_RUNS = 100                                       # マニフェストに残す実行の記録
+
+# ─────────────────────────────────────────
+# スキーマ
+# ─────────────────────────────────────────
+_RULE_NAMES = [RULE_LABEL[r] for r in dict.fromkeys(RULE_ORDER)]
+VOCABULARIES = {
+    "target_color":     COLORS,
+    "target_shape":     SHAPES,
+    "target_number":    NUMBERS,
+    "chosen_color":     COLORS,
+    "chosen_shape":     SHAPES,
+    "chosen_number":    NUMBERS,
+    "rule":             _RULE_NAMES,
+    "chosen_dimension": _RULE_NAMES + ["不一致"],
+    "error_type":       ["－"] + ERROR_TYPES,
+}
+_CODE = pa.dictionary(pa.int8(), pa.string())
+
+TRIALS_SCHEMA = pa.schema([
+    ("session_id",        pa.dictionary(pa.int32(), pa.string())),
+    ("date",              pa.date32()),
+    ("trial",             pa.uint16()),
+    *[(name, _CODE) for name in VOCABULARIES],
+    ("correct",           pa.bool_()),
+    ("perseverative",     pa.bool_()),
+    ("categories_before", pa.uint8()),
+])
+
+SESSIONS_SCHEMA = pa.schema([
+    ("session_id",    pa.string()),
+    ("date",          pa.date32()),
+    ("patient_key",   pa.string()),                  # registry.patient_key（患者名そのものは持たない）
+    ("started_at",    pa.timestamp("ms", tz="UTC")),
+    ("finished_at",   pa.timestamp("ms", tz="UTC")),
+    ("total_trials",  pa.uint16()),
+    ("categories",    pa.uint8()),
+    ("total_errors",  pa.uint16()),
+    ("perseverative", pa.uint16()),
+])
+
+SCHEMAS = {"sessions": SESSIONS_SCHEMA, "trials": TRIALS_SCHEMA}
+
+# ─────────────────────────────────────────
+# 変換（バッチ単位でまとめて）
+# ─────────────────────────────────────────
+def _coded(values, name):
+    vocabulary = VOCABULARIES[name]
+    codes = pd.Categorical(values, categories=vocabulary).codes
+    if (codes < 0).any():
+        raise ValueError(f"{name}: 定義域外の値 {sorted(set(np.asarray(values)[codes < 0]))}")
+    return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int8()), pa.array(vocabulary, type=pa.string()))
+
+def _session_dates(sessions):
+    # 終了日（無ければ開始日）の現地の日付。どちらも無ければ None（セッション単位なので 1 件ずつでよい）
+    stamps = sessions["finished_at"].fillna(sessions["started_at"])
+    return [datetime.date.fromtimestamp(t) if pd.notna(t) else None for t in stamps]
+
+def _timestamps(seconds):
+    # UNIX 秒（欠損は NaN）→ ミリ秒の timestamp
+    millis = seconds.mul(1000).round().astype("Int64")
+    return pa.array(millis, type=pa.int64()).cast(SESSIONS_SCHEMA.field("started_at").type)
+
+def transform(sessions, trials, tenant=None):
+    # sessions / trials：ストアから読んだ DataFrame。戻り値：(sessions の Table, trials の Table)
+    # tenant は患者キーの鍵を選ぶため（registry.patient_key）
+    dates = _session_dates(sessions)
+    date_of = dict(zip(sessions["session_id"], dates))
+    trial_dates = trials["session_id"].map(date_of)
+
+    error = _coded(trials["error_type"].to_numpy(), "error_type")
+    correct = trials["correct"].to_numpy() == "○"
+    perseverative = trials["error_type"].isin(PERSEVERATIVE_TYPES).to_numpy()
+    trials_table = pa.Table.from_arrays([
+        pa.array(trials["session_id"], type=pa.string()).dictionary_encode(),
+        pa.array(trial_dates, type=pa.date32()),
+        pa.array(trials["trial"].to_numpy(), type=pa.uint16()),
+        *[error if name == "error_type" else _coded(trials[name].to_numpy(), name) for name in VOCABULARIES],
+        pa.array(correct),
+        pa.array(perseverative),
+        pa.array(trials["categories_before"].to_numpy(), type=pa.uint8()),
+    ], schema=TRIALS_SCHEMA)
+
+    per_session = pd.DataFrame({"session_id": trials["session_id"], "error": ~correct, "perseverative": perseverative})
+    counts = per_session.groupby("session_id", sort=False)[["error", "perseverative"]].sum()
+    counts = counts.reindex(sessions["session_id"], fill_value=0)
+    keys = [registry.patient_key(name, tenant) if name and name.strip() else None for name in sessions["patient_name"]]
+    sessions_table = pa.Table.from_arrays([
+        pa.array(sessions["session_id"], type=pa.string()),
+        pa.array(dates, type=pa.date32()),
+        pa.array(keys, type=pa.string()),
+        _timestamps(sessions["started_at"]),
+        _timestamps(sessions["finished_at"]),
+        pa.array(sessions["total_trials"].to_numpy(), type=pa.uint16()),
+        pa.array(sessions["categories"].to_numpy(), type=pa.uint8()),
+        pa.array(counts["error"].to_numpy(), type=pa.uint16()),
+        pa.array(counts["perseverative"].to_numpy(), type=pa.uint16()),
+    ], schema=SESSIONS_SCHEMA)
+    return sessions_table, trials_table
+
+# ─────────────────────────────────────────
+# 分析用ストア（Parquet パーティション + マニフェスト）
+# ─────────────────────────────────────────
+def _date_dir(kind, date):
+    return f"{kind}/date={date.isoformat() if date is not None else 'unknown'}"
+
+
+class Analytics:
+    def __init__(self, root=ANALYTICS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    # ── マニフェスト ──
+    def manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return {"version": 1, "sources": {}, "files": {}, "runs": []}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def watermark(self, source):
+        return self.manifest()["sources"].get(source, {}).get("watermark", 0)
+
+    @contextlib.contextmanager
+    def locked(self):
+        # 書き込み（ETL・compact）は同時に 1 つだけ
+        with open(os.path.join(self.root, ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def remove_orphans(self):
+        # マニフェストに載っていないファイル（確定前に落ちた実行の残り）を消す。locked() の中で呼ぶ
+        known = set(self.manifest()["files"])
+        removed = 0
+        for kind in SCHEMAS:
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, kind)):
+                for name in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+                    if rel not in known:
+                        os.remove(os.path.join(dirpath, name))
+                        removed += 1
+        return removed
+
+    # ── 書き込み ──
+    def write_file(self, rel, table):
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path + ".tmp", compression="zstd", row_group_size=1 << 20)
+        os.replace(path + ".tmp", path)
+        return {"rows": table.num_rows, "bytes": os.path.getsize(path)}
+
+    def commit(self, source, watermark, added, removed=(), run=None):
+        # added：{相対パス: 情報}。ファイルと水位をマニフェストの置き換え 1 回で確定する
+        manifest = self.manifest()
+        for rel in removed:
+            manifest["files"].pop(rel, None)
+        manifest["files"].update(added)
+        if source is not None:
+            manifest["sources"][source] = {"watermark": watermark, "updated_at": time.time()}
+        if run is not None:
+            manifest["runs"] = (manifest["runs"] + [run])[-MAX_RUNS:]
+        self._save_manifest(manifest)
+        for rel in removed:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.root, rel))
+
+    def compact(self, min_files=COMPACT_MIN_FILES):
+        # 日付ごとに小さなファイルをまとめ直す。locked() の中で呼ぶ
+        groups = {}
+        for rel in self.manifest()["files"]:
+            groups.setdefault(os.path.dirname(rel), []).append(rel)
+        compacted = 0
+        for directory, files in sorted(groups.items()):
+            if len(files) < min_files:
+                continue
+            files.sort()
+            kind = directory.split("/", 1)[0]
+            table = pa.concat_tables(pq.read_table(os.path.join(self.root, rel), schema=SCHEMAS[kind])
+                                     for rel in files)
+            if kind == "trials":
+                table = table.unify_dictionaries()
+            name = hashlib.sha1("\n".join(files).encode()).hexdigest()[:16]
+            rel = f"{directory}/compact-{name}.parquet"
+            self.commit(None, None, {rel: self.write_file(rel, table)}, removed=files)
+            compacted += len(files)
+        return compacted
+
+    # ── 読み出し ──
+    def files(self, kind):
+        return sorted(rel for rel in self.manifest()["files"] if rel.startswith(kind + "/"))
+
+    def dataset(self, kind):
+        # 確定済みのファイルだけの pyarrow Dataset（filter・列の選択は Dataset 側で）
+        paths = [os.path.join(self.root, rel) for rel in self.files(kind)]
+        return ds.dataset(paths, schema=SCHEMAS[kind], format="parquet")
+
+    def read(self, kind, columns=None, filter=None):
+        return self.dataset(kind).to_table(columns=columns, filter=filter).to_pandas()
+
+
+_analytics = {}
+
+def get_analytics(tenant=None):
+    tenant = tenant or DEFAULT_TENANT
+    if tenant not in _analytics:
+        root = ANALYTICS_DIR if tenant == DEFAULT_TENANT else os.path.join(tenant_data_dir(tenant), "analytics")
+        _analytics[tenant] = Analytics(root)
+    return _analytics[tenant]
+
+# ─────────────────────────────────────────
+# 差分実行
+# ─────────────────────────────────────────
+_SESSIONS_SQL = (
+    "SELECT rowid, session_id, patient_name, started_at, finished_at, total_trials, categories "
+    "FROM sessions WHERE rowid > ? ORDER BY rowid LIMIT ?"
+)
+_TRIALS_SQL = (
+    f"SELECT t.session_id, {', '.join('t.' + c for c in TRIAL_COLUMNS)} FROM sessions s "
+    "JOIN trials t ON t.session_id = s.session_id WHERE s.rowid > ? AND s.rowid <= ? ORDER BY s.rowid, t.trial"
+)
+
+def run(analytics=None, store=None, source="store", batch=DEFAULT_BATCH, max_batches=None):
+    # 水位より後に保存されたセッションを batch 件ずつ取り込む。戻り値：この実行の計測値
+    analytics = analytics or get_analytics()
+    store = store or get_store()
+    totals = {"sessions": 0, "trials": 0, "batches": 0, "read_s": 0.0, "transform_s": 0.0, "write_s": 0.0}
+    started = time.perf_counter()
+    with analytics.locked():
+        totals["orphans_removed"] = analytics.remove_orphans()
+        watermark = analytics.watermark(source)
+        while max_batches is None or totals["batches"] < max_batches:
+            t0 = time.perf_counter()
+            sessions = pd.read_sql_query(_SESSIONS_SQL, store.conn, params=(watermark, batch))
+            if sessions.empty:
+                break
+            high = int(sessions["rowid"].iloc[-1])
+            trials = pd.read_sql_query(_TRIALS_SQL, store.conn, params=(watermark, high))
+            t1 = time.perf_counter()
+            sessions_table, trials_table = transform(sessions, trials, store.tenant)
+            t2 = time.perf_counter()
+            added = {}
+            name = f"part-{source}-{watermark + 1:012d}-{high:012d}.parquet"
+            for kind, table in (("sessions", sessions_table), ("trials", trials_table)):
+                dates = table.column("date")
+                for date in pc.unique(dates).to_pylist():
+                    mask = pc.is_null(dates) if date is None else pc.equal(dates, date)
+                    rel = f"{_date_dir(kind, date)}/{name}"
+                    added[rel] = analytics.write_file(rel, table.filter(mask))
+            analytics.commit(source, high, added)
+            t3 = time.perf_counter()
+            perf.record("etl.batch", t3 - t0)
+            watermark = high
+            totals["sessions"] += len(sessions)
+            totals["trials"] += len(trials)
+            totals["batches"] += 1
+            totals["read_s"] += t1 - t0
+            totals["transform_s"] += t2 - t1
+            totals["write_s"] += t3 - t2
+        totals["compacted_files"] = analytics.compact()
+        elapsed = time.perf_counter() - started
+        totals.update({
+            "source":         source,
+            "watermark":      watermark,
+            "finished_at":    time.time(),
+            "elapsed_s":      elapsed,
+            "sessions_per_s": totals["sessions"] / elapsed if elapsed else 0.0,
+            "trials_per_s":   totals["trials"] / elapsed if elapsed else 0.0,
+        })
+        if totals["batches"] or totals["compacted_files"]:
+            analytics.commit(None, None, {}, run=totals)
+    return totals
+
+# ─────────────────────────────────────────
+# コマンドライン
+# ─────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="永続ストアから分析用ストアへの差分 ETL")
+    parser.add_argument("--tenant", default=None)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--follow", type=float, default=None, help="指定した秒数ごとに繰り返す")
+    args = parser.parse_args(argv)
+
+    while True:
+        result = run(get_analytics(args.tenant), get_store(args.tenant), batch=args.batch)
+        print(f"sessions={result['sessions']} trials={result['trials']} batches={result['batches']} "
+              f"watermark={result['watermark']} elapsed={result['elapsed_s']:.2f}s "
+              f"({result['sessions_per_s'] * 3600:.0f} sessions/h, {result['trials_per_s']:.0f} trials/s; "
+              f"read {result['read_s']:.2f}s transform {result['transform_s']:.2f}s write {result['write_s']:.2f}s) "
+              f"compacted={result['compacted_files']}", flush=True)
+        if args.follow is None:
+            return 0
+        time.sleep(args.follow)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""
+検査者用の画面（ライブモニター・経過比較・再生・試行ログ）の入口
+施設の検査者の合言葉（tenants.Tenant.examiner_tokens）をフォームで入力してもらい、
+合っていればこのブラウザのセッションの間だけ開けるようにする。合言葉は URL に載せない。
+"""
+
+import streamlit as st
+
+from . import tenants
+
+def require_examiner(tenant):
+    # 開いてよければ True。まだなら入力フォームを出して False
+    ss = st.session_state
+    if ss.get("examiner_tenant") == tenant.id:
+        return True
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>🔒 検査者用の画面</h2>""", unsafe_allow_html=True)
+    if not tenant.examiner_tokens:
+        st.info("この施設では検査者用の画面が設定されていません。")
+        return False
+    with st.form("examiner_login"):
+        secret = st.text_input("検査者用パスワード", type="password")
+        submitted = st.form_submit_button("開く", type="primary")
+    if submitted:
+        if tenants.is_examiner(tenant, secret):
+            ss["examiner_tenant"] = tenant.id
+            st.rerun()
+        st.error("パスワードが違います。")
+    return False
@@ -0,0 +1,76 @@
+"""
+経過比較画面（?view=history）
+患者名から患者キーを引き、session_summaries の集計行だけでリハビリ前後の成績を比べる。
+患者名で記録を引けるので、検査者の合言葉を確かめてから開く（examiner.py）。
+"""
+
+import time
+
+import pandas as pd
+import streamlit as st
+
+from . import registry
+from .engine import ERROR_TYPES
+from .perf import timed
+from .store import get_store
+
+# (表示名, キー, 少ないほうが良いか)
+COMPARE_METRICS = [
+    ("達成カテゴリー", "categories",    False),
+    ("総正解数",      "total_correct", False),
+    ("総エラー数",    "total_errors",  True),
+    ("保続性エラー",  "perseverative", True),
+    ("最長連続正解",  "max_streak",    False),
+]
+
+def _date_label(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "日時不明"
+
+def _history_table(rows):
+    return pd.DataFrame([
+        {
+            "実施日時":      _date_label(r["session_date"]),
+            "総試行数":      r["total_trials"],
+            "達成カテゴリー": r["categories"],
+            "総正解数":      r["total_correct"],
+            "総エラー数":    r["total_errors"],
+            "保続性エラー":   r["perseverative"],
+            **{label: r["error_counts"][label] for label in ERROR_TYPES},
+        }
+        for r in rows
+    ])
+
+@timed("history.render")
+def show_history():
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>📈 経過比較</h2>""", unsafe_allow_html=True)
+
+    name = st.text_input("患者名", key="history_patient")
+    if not name.strip():
+        st.caption("検査時に入力した患者名を入れると、その患者の過去の検査結果を一覧します。")
+        return
+
+    rows = registry.history(name, get_store(st.session_state.get("tenant")))
+    if not rows:
+        st.info("この患者名の検査記録はありません。")
+        return
+
+    st.dataframe(_history_table(rows), use_container_width=True, hide_index=True)
+    if len(rows) < 2:
+        return
+
+    st.subheader("前後比較")
+    labels = [f"{i + 1}. {_date_label(r['session_date'])}" for i, r in enumerate(rows)]
+    col_pre, col_post = st.columns(2)
+    pre  = col_pre.selectbox("比較元（リハビリ前）", range(len(rows)), index=0, format_func=labels.__getitem__)
+    post = col_post.selectbox("比較先（リハビリ後）", range(len(rows)), index=len(rows) - 1, format_func=labels.__getitem__)
+
+    for col, (label, key, lower_is_better) in zip(st.columns(len(COMPARE_METRICS)), COMPARE_METRICS):
+        col.metric(label, rows[post][key], delta=rows[post][key] - rows[pre][key],
+                   delta_color="inverse" if lower_is_better else "normal")
+
+    st.markdown(
+        "| エラー種別 | 比較元 | 比較先 |\n|---|---|---|\n" + "\n".join(
+            f"| {label} | {rows[pre]['error_counts'][label]}回 | {rows[post]['error_counts'][label]}回 |"
+            for label in ERROR_TYPES
+        )
+    )
@@ -0,0 +1,247 @@
+"""
+過去の CSV 書き出し（cst_result_*.csv）の一括取り込み
+
+    python -m cst.importer DIR [DIR ...] [--workers N] [--chunk 64] [--tenant ID]
+
+ディレクトリを順に走査し、ファイルをまとめてプロセスプールで検証・正規化して永続ストアへ保存する。
+- 検証：列が on_card_selected のログと一致すること、値が定義域内であること、
+  記録されたターゲットと選択で再採点した結果が記録と一致すること
+- 重複排除：ファイル内容の SHA-256 を索引に持ち、再ダウンロードされた同じ内容のファイルは取り込まない
+- 差分実行：パス・サイズ・更新時刻が前回と同じファイルは読みもしない
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import engine, registry
+from .artifacts import session_hash
+from .config import COLORS, NUMBERS, RULE_LABEL, SHAPES
+from .store import get_store
+
+FILE_PATTERN = re.compile(r"^cst_result_(?P<name>.*?)(?: ?\(\d+\))?\.csv$")
+
+IMPORT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_files (
+    content_hash  TEXT PRIMARY KEY,
+    path          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime         REAL NOT NULL,
+    status        TEXT NOT NULL,              -- imported / invalid
+    session_id    TEXT,
+    error         TEXT,
+    imported_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS import_seen (
+    path          TEXT PRIMARY KEY,
+    size          INTEGER NOT NULL,
+    mtime         REAL NOT NULL,
+    content_hash  TEXT NOT NULL
+);
+"""
+
+# ─────────────────────────────────────────
+# 1ファイルの検証・正規化（プロセスプール側）
+# ─────────────────────────────────────────
+_INT_COLUMNS = ("試行", "達成カテゴリー")
+_ALLOWED = {
+    "ターゲット_色": set(COLORS),  "ターゲット_形": set(SHAPES),  "ターゲット_数": set(NUMBERS),
+    "選択_色":       set(COLORS),  "選択_形":       set(SHAPES),  "選択_数":       set(NUMBERS),
+    "正解ルール":     set(RULE_LABEL.values()),
+    "選択次元":       set(RULE_LABEL.values()) | {"不一致"},
+    "正誤":          {"○", "×"},
+    "エラー種別":     set(engine.ERROR_TYPES) | {"－"},
+}
+
+class InvalidFile(ValueError):
+    pass
+
+def validate_logs(logs):
+    # score_selection と同じ形の dict のリストを検査する（値は型変換済みであること）
+    if not logs:
+        raise InvalidFile("empty")
+    for n, entry in enumerate(logs, start=1):
+        if not isinstance(entry, dict) or list(entry) != list(engine.LOG_COLUMNS):
+            raise InvalidFile(f"row {n}: unexpected columns")
+        for key in engine.LOG_COLUMNS:
+            value = entry[key]
+            if key in _INT_COLUMNS:
+                if type(value) is not int or value < 0:
+                    raise InvalidFile(f"row {n}: {key}={value!r}")
+            elif value not in _ALLOWED[key]:
+                raise InvalidFile(f"row {n}: {key}={value!r}")
+        if entry["試行"] != n:
+            raise InvalidFile(f"row {n}: trial number {entry['試行']}")
+    return logs
+
+def parse_logs(data):
+    # BOM 付き UTF-8 の CSV を score_selection と同じ形の dict のリストにする
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise InvalidFile("not utf-8")
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or list(reader.fieldnames) != list(engine.LOG_COLUMNS):
+        raise InvalidFile(f"unexpected columns: {reader.fieldnames}")
+    logs = []
+    for n, row in enumerate(reader, start=1):
+        for key in _INT_COLUMNS:
+            if not (row[key] or "").isdigit():
+                raise InvalidFile(f"row {n}: {key}={row[key]!r}")
+            row[key] = int(row[key])
+        logs.append(row)
+    return validate_logs(logs)
+
+def process_file(path):
+    # 戻り値：{"path", "size", "mtime", "hash", "session": (id, meta, logs) | None, "error"}
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    result = {"path": path, "size": st.st_size, "mtime": st.st_mtime,
+              "hash": hashlib.sha256(data).hexdigest(), "session": None, "error": None}
+    try:
+        logs = parse_logs(data)
+        state, mismatches = engine.rescore(logs)
+        if mismatches:
+            raise InvalidFile(f"rescore mismatch at trials {mismatches[:5]}")
+        m = FILE_PATTERN.match(os.path.basename(path))
+        name = m.group("name") if m else ""
+        meta = {
+            "patient_name":  "" if name == "patient" else name,
+            "examiner_name": "",
+            "categories":    state["categories_achieved"],
+            "started_at":    None,
+            "finished_at":   None,
+        }
+        result["session"] = (session_hash(logs, meta), meta, logs)
+    except InvalidFile as exc:
+        result["error"] = str(exc)
+    return result
+
+def _process_chunk(paths):
+    return [process_file(p) for p in paths]
+
+# ─────────────────────────────────────────
+# 走査と取り込み（メインプロセス側）
+# ─────────────────────────────────────────
+def iter_files(roots):
+    stack = list(roots)
+    while stack:
+        root = stack.pop()
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and FILE_PATTERN.match(entry.name):
+                    yield entry.path, entry.stat()
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Importer:
+    def __init__(self, store=None, workers=None, chunk_size=64):
+        self.store = store or get_store()
+        self.store.conn.executescript(IMPORT_SCHEMA)
+        registry.ensure_schema(self.store)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.stats = {"scanned": 0, "skipped": 0, "imported": 0, "duplicate": 0, "invalid": 0}
+
+    def _unchanged(self, path, stat):
+        row = self.store.conn.execute(
+            "SELECT size, mtime FROM import_seen WHERE path = ?", (path,)).fetchone()
+        return row is not None and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime
+
+    def _pending_paths(self, roots):
+        for path, stat in iter_files(roots):
+            self.stats["scanned"] += 1
+            if self._unchanged(path, stat):
+                self.stats["skipped"] += 1
+                continue
+            yield path
+
+    def run(self, roots):
+        # 同時に投入するチャンク数を抑え、ファイル一覧全体をメモリに載せない
+        max_in_flight = self.workers * 2
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = []
+            for chunk in _chunks(self._pending_paths(roots), self.chunk_size):
+                in_flight.append(pool.submit(_process_chunk, chunk))
+                if len(in_flight) >= max_in_flight:
+                    self._commit(in_flight.pop(0).result())
+            for fut in in_flight:
+                self._commit(fut.result())
+        return self.stats
+
+    def _commit(self, results):
+        # チャンク単位で 1 トランザクション。取り込み済みの記録（import_seen / import_files）と
+        # セッション・集計行を同じトランザクションで確定し、保存に失敗したら記録も残さない
+        # （次の実行で同じファイルを取り込み直す）
+        conn = self.store.conn
+        now = time.time()
+        sessions, seen_hashes, counts = [], set(), {}
+        with conn:
+            for r in results:
+                conn.execute(
+                    "INSERT OR REPLACE INTO import_seen (path, size, mtime, content_hash) VALUES (?, ?, ?, ?)",
+                    (r["path"], r["size"], r["mtime"], r["hash"]),
+                )
+                known = conn.execute(
+                    "SELECT 1 FROM import_files WHERE content_hash = ?", (r["hash"],)).fetchone()
+                if known or r["hash"] in seen_hashes:
+                    counts["duplicate"] = counts.get("duplicate", 0) + 1
+                    continue
+                seen_hashes.add(r["hash"])
+                status = "invalid" if r["error"] else "imported"
+                session_id = r["session"][0] if r["session"] else None
+                conn.execute(
+                    "INSERT INTO import_files (content_hash, path, size, mtime, status, session_id, error, imported_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r["hash"], r["path"], r["size"], r["mtime"], status, session_id, r["error"], now),
+                )
+                counts[status] = counts.get(status, 0) + 1
+                if r["session"]:
+                    sid, meta, logs = r["session"]
+                    # 書き出しに日時は残っていないので、経過比較の並び順にはファイルの更新時刻を使う
+                    sessions.append((sid, meta, logs, None, r["mtime"]))
+            if sessions:
+                self.store.insert_sessions([(sid, meta, logs) for sid, meta, logs, _, _ in sessions])
+                registry.insert_summaries(sessions, self.store)
+        # 確定してから数える
+        for status, n in counts.items():
+            self.stats[status] += n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="cst_result_*.csv を永続ストアへ一括取り込み")
+    parser.add_argument("dirs", nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=64)
+    parser.add_argument("--tenant", default=None, help="取り込み先のテナント（既定は default）")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    stats = Importer(get_store(args.tenant), workers=args.workers, chunk_size=args.chunk).run(args.dirs)
+    elapsed = time.perf_counter() - t0
+    processed = stats["scanned"] - stats["skipped"]
+    print(" ".join(f"{k}={v}" for k, v in stats.items()),
+          f"elapsed={elapsed:.1f}s", f"files/s={processed / elapsed if elapsed else 0:.0f}")
+    return 0 if not stats["invalid"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+検査結果の一括受け付け API（提携施設のタブレットから）
+on_card_selected と同じ形の試行ログを 1 行 1 セッションの JSONL にして gzip で POST してもらい、
+検証・再採点してから永続ストアへ保存する。Streamlit とは別プロセスの asyncio サーバー。
+
+    python -m cst.ingest [--port 8766] [--workers N]
+
+    POST /ingest                                     # 本文：gzip した JSONL（Content-Encoding: gzip）
+        X-CST-Tenant-Token: <テナントのトークン>         # 保存先の施設（tenants.json）
+        1 行 = {"meta": {"patient_name", "examiner_name", "started_at", "finished_at"}, "logs": [...]}
+    → 200 {"accepted": [session_id, ...], "rejected": [{"line": n, "error": "..."}]}
+    GET /metrics                                     # 受け付け数・429 の数・キューの深さなど
+        Authorization: Bearer <CST_INGEST_METRICS_TOKEN>  # 未設定なら /metrics は開かない
+
+- 検証と再採点（importer.validate_logs・engine.rescore）はプロセスプールで行う
+- JSON のキーの順番は問わない（列の集合が一致すれば LOG_COLUMNS の順に並べ直す）。gzip は複数メンバーでもよい
+- 保存は書き込み用のタスク 1 つが複数のリクエストの分を施設ごとにまとめて、セッション・試行ログ・集計行を
+  1 トランザクションで行い、リクエストは自分の施設の分が確定してから応答を受け取る（ほかの施設の失敗は巻き込まない。
+  同じ内容の再送は session_id が同じなので重複しない）
+- 過負荷時：処理中のリクエストが MAX_IN_FLIGHT、保存待ちのセッションが MAX_QUEUED を超えたら
+  待たせずに 429（Retry-After 付き）を返す
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import hmac
+import json
+import os
+import signal
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import engine, perf, registry, tenants
+from .artifacts import session_hash
+from .importer import InvalidFile, validate_logs
+from .store import get_store
+
+INGEST_PORT = int(os.environ.get("CST_INGEST_PORT", 8766))
+MAX_BODY = 16 * 1024 * 1024                          # 圧縮後の本文の上限
+MAX_DECOMPRESSED = 128 * 1024 * 1024                 # 展開後の上限（gzip 爆弾よけ）
+MAX_IN_FLIGHT = int(os.environ.get("CST_INGEST_MAX_IN_FLIGHT", 32))
+MAX_QUEUED = int(os.environ.get("CST_INGEST_MAX_QUEUED", 20000))
+WRITE_BATCH = 2000                                   # 1 トランザクションの最大セッション数
+WRITE_WINDOW = 0.02                                  # まとめるために待つ最大秒数
+RETRY_AFTER = 1
+METRICS_TOKEN = os.environ.get("CST_INGEST_METRICS_TOKEN", "")
+_META_TEXT = ("patient_name", "examiner_name")
+_META_TIME = ("started_at", "finished_at")
+
+# ─────────────────────────────────────────
+# 検証（プロセスプール側）
+# ─────────────────────────────────────────
+def _decompress(body, encoding):
+    if encoding == "gzip" or body[:2] == b"\x1f\x8b":
+        # 複数メンバーの gzip（追記して作った本文など）は続けて展開する。展開後の上限は全メンバーの合計
+        parts, total, rest = [], 0, body
+        while rest:
+            d = zlib.decompressobj(wbits=31)
+            data = d.decompress(rest, MAX_DECOMPRESSED - total)
+            if d.unconsumed_tail:
+                raise InvalidFile("body too large after decompression")
+            if not d.eof:
+                raise InvalidFile("truncated gzip body")
+            parts.append(data)
+            total += len(data)
+            rest = d.unused_data.lstrip(b"\x00")    # メンバーの後ろの 0 埋めは gzip と同じく読み飛ばす
+            if rest and total >= MAX_DECOMPRESSED:     # decompress の上限 0 は「無制限」なので先に断る
+                raise InvalidFile("body too large after decompression")
+        return b"".join(parts)
+    if encoding not in ("", "identity"):
+        raise InvalidFile(f"unsupported encoding: {encoding}")
+    return body
+
+def _clean_meta(meta):
+    if not isinstance(meta, dict):
+        raise InvalidFile("meta must be an object")
+    clean = {}
+    for key in _META_TEXT:
+        value = meta.get(key, "")
+        if not isinstance(value, str) or len(value) > 200:
+            raise InvalidFile(f"meta.{key}")
+        clean[key] = value
+    for key in _META_TIME:
+        value = meta.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise InvalidFile(f"meta.{key}")
+        clean[key] = value
+    return clean
+
+def _ordered_logs(logs):
+    # JSON のキーの順番は書き手次第（sort_keys=True など）なので、列の集合で比べて LOG_COLUMNS の順に並べ直す
+    if not isinstance(logs, list):
+        raise InvalidFile("logs must be a list")
+    columns = set(engine.LOG_COLUMNS)
+    ordered = []
+    for n, entry in enumerate(logs, start=1):
+        if not isinstance(entry, dict) or entry.keys() != columns:
+            raise InvalidFile(f"row {n}: unexpected columns")
+        ordered.append({key: entry[key] for key in engine.LOG_COLUMNS})
+    return ordered
+
+def process_batch(body, encoding=""):
+    # 戻り値：(sessions, rejected)。sessions = [(session_id, meta, logs, summary), ...]
+    try:
+        data = _decompress(body, encoding)
+    except (InvalidFile, zlib.error) as exc:
+        return [], [{"line": 0, "error": str(exc)}]
+    sessions, rejected = [], []
+    for n, line in enumerate(data.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise InvalidFile("line must be an object")
+            meta = _clean_meta(record.get("meta", {}))
+            logs = validate_logs(_ordered_logs(record.get("logs")))
+            state, mismatches = engine.rescore(logs)
+            if mismatches:
+                raise InvalidFile(f"rescore mismatch at trials {mismatches[:5]}")
+            meta["categories"] = state["categories_achieved"]
+            meta = {k: meta[k] for k in ("patient_name", "examiner_name", "categories", "started_at", "finished_at")}
+            sessions.append((session_hash(logs, meta), meta, logs, state["metrics"]))
+        except (InvalidFile, ValueError, TypeError) as exc:
+            rejected.append({"line": n, "error": str(exc)})
+    return sessions, rejected
+
+# ─────────────────────────────────────────
+# まとめ書き（イベントループ側）
+# ─────────────────────────────────────────
+class Writer:
+    def __init__(self, max_queued=MAX_QUEUED):
+        self.max_queued = max_queued
+        self.queued = 0                              # 保存待ちのセッション数
+        self._queue = asyncio.Queue()
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cst-ingest-db")
+        self.stats = {"transactions": 0, "written": 0}
+
+    def try_submit(self, tenant_id, sessions):
+        # 上限を超えるなら None（呼び出し側が 429 を返す）。受け付けたら確定時に完了する Future
+        if self.queued + len(sessions) > self.max_queued:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self.queued += len(sessions)
+        self._queue.put_nowait((tenant_id, sessions, future))
+        return future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            count = len(items[0][1])
+            deadline = loop.time() + WRITE_WINDOW
+            while count < WRITE_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                count += len(item[1])
+            t0 = time.perf_counter()
+            by_tenant = {}
+            for tenant_id, sessions, future in items:
+                pending = by_tenant.setdefault(tenant_id, ([], []))
+                pending[0].extend(sessions)
+                pending[1].append(future)
+            # 施設ごとに 1 トランザクション。確定した施設のリクエストから応答し、失敗はその施設のリクエストにだけ返す
+            for tenant_id, (sessions, futures) in by_tenant.items():
+                try:
+                    await loop.run_in_executor(self._db, self._write, tenant_id, sessions)
+                except Exception as exc:             # noqa: BLE001 - その施設の各リクエストに失敗を返す
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(exc)
+                else:
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(None)
+                finally:
+                    self.queued -= len(sessions)
+            perf.record("ingest.write", time.perf_counter() - t0)
+
+    def _write(self, tenant_id, sessions):
+        # セッションと集計行を同じトランザクションで（片方だけ確定することがない）
+        registry.save_sessions([(sid, meta, logs, summary, None) for sid, meta, logs, summary in sessions],
+                               get_store(tenant_id))
+        self.stats["transactions"] += 1
+        self.stats["written"] += len(sessions)
+
+# ─────────────────────────────────────────
+# HTTP（最小限の HTTP/1.1。keep-alive あり、chunked なし）
+# ─────────────────────────────────────────
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+            500: "Internal Server Error"}
+
+
+class IngestServer:
+    def __init__(self, workers=None, max_in_flight=MAX_IN_FLIGHT, max_queued=MAX_QUEUED):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.writer = Writer(max_queued)
+        self.stats = {"requests": 0, "accepted": 0, "rejected": 0, "throttled": 0, "errors": 0}
+        self._pool = None
+
+    async def serve(self, host="0.0.0.0", port=INGEST_PORT, ready=None):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        writer_task = asyncio.create_task(self.writer.run())
+        server = await asyncio.start_server(self._handle, host, port, limit=64 * 1024)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):   # Windows では Ctrl+C の KeyboardInterrupt で止まる
+                asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            writer_task.cancel()
+            self._pool.shutdown(cancel_futures=True)
+
+    def metrics(self):
+        return {**self.stats, **self.writer.stats, "in_flight": self.in_flight, "queued": self.writer.queued,
+                "latency": perf.summary("ingest.")}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = (lines[0].split(" ", 2) + ["", ""])[:3]
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                status, payload, extra = await self._dispatch(method, target, headers, reader)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close" and status not in (411, 413)
+                response = [f"HTTP/1.1 {status} {_REASONS[status]}", "Content-Type: application/json; charset=utf-8",
+                            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                            *extra]
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):   # 本文の途中で切られた
+            return
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, headers, reader):
+        path = target.split("?", 1)[0]
+        if path == "/metrics" and method == "GET":
+            if not _metrics_authorized(headers.get("authorization", "")):
+                return 401, {"error": "metrics token required"}, []
+            return 200, self.metrics(), []
+        if path != "/ingest":
+            return 404, {"error": "not found"}, []
+        if method != "POST":
+            return 405, {"error": "POST only"}, []
+        length = headers.get("content-length", "")
+        if not length.isdigit():
+            return 411, {"error": "Content-Length required"}, []
+        if int(length) > MAX_BODY:
+            return 413, {"error": f"body larger than {MAX_BODY} bytes"}, []
+        body = await reader.readexactly(int(length))
+        self.stats["requests"] += 1
+
+        tenant, _ = tenants.resolve(header_token=headers.get(tenants.TOKEN_HEADER.lower()))
+        if tenant is None or not tenant.tokens:
+            return 401, {"error": "unknown tenant token"}, []
+        # 過負荷なら検証もしないで断る（クライアントは Retry-After 秒後に同じ本文を再送すればよい）
+        if self.in_flight >= self.max_in_flight or self.writer.queued >= self.writer.max_queued:
+            self.stats["throttled"] += 1
+            return 429, {"error": "busy"}, [f"Retry-After: {RETRY_AFTER}"]
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            sessions, rejected = await loop.run_in_executor(
+                self._pool, process_batch, body, headers.get("content-encoding", "").lower())
+            self.stats["rejected"] += len(rejected)
+            if sessions:
+                future = self.writer.try_submit(tenant.id, sessions)
+                if future is None:
+                    self.stats["throttled"] += 1
+                    return 429, {"error": "write queue full"}, [f"Retry-After: {RETRY_AFTER}"]
+                try:
+                    await future
+                except Exception as exc:             # noqa: BLE001
+                    self.stats["errors"] += 1
+                    return 500, {"error": str(exc)}, []
+            self.stats["accepted"] += len(sessions)
+            status = 400 if rejected and not sessions else 200
+            return status, {"accepted": [s[0] for s in sessions], "rejected": rejected}, []
+        finally:
+            self.in_flight -= 1
+
+
+def _metrics_authorized(authorization):
+    # 受け付け数などは施設をまたいだ値なので、施設のトークンではなく運用側のトークンで見せる
+    scheme, _, token = authorization.partition(" ")
+    return bool(METRICS_TOKEN) and scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), METRICS_TOKEN)
+
+
+def encode_batch(sessions):
+    # クライアント側の参考実装：[(meta, logs), ...] → POST する本文（gzip した JSONL）
+    lines = (json.dumps({"meta": meta, "logs": logs}, ensure_ascii=False) for meta, logs in sessions)
+    return gzip.compress("\n".join(lines).encode("utf-8"), compresslevel=6)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="検査結果の一括受け付け API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=INGEST_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED)
+    args = parser.parse_args(argv)
+
+    server = IngestServer(args.workers, args.max_in_flight, args.max_queued)
+
+    def ready():
+        print(f"ingest listening on {args.host}:{args.port} (workers={server.workers})", flush=True)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
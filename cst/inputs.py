@@ -0,0 +1,213 @@
+"""
+入力方式（ストラテジー）
+基準カードの描画と選択の受け付け方だけを差し替える。採点・結果表示は共通。
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from .components import card_picker
+from .config import REFERENCE_CARDS
+from .render import REFERENCE_TITLE_HTML, card_svg
+
+
+@dataclass(frozen=True)
+class InputMode:
+    name: str
+    hint: str                                   # ターゲットカード上の案内文
+    css: str                                    # secondary ボタンの見た目
+    render_static: Callable                     # () -> None  基準カードの絵柄（検査中不変）
+    render_controls: Callable                   # (trial, on_select) -> None  選択の受け付け
+
+
+# ─────────────────────────────────────────
+# component：基準カードを直接タップ（カスタムコンポーネントが番号を直接返す）
+# ─────────────────────────────────────────
+def _render_component_static():
+    # ── 基準カード ──
+    st.markdown(REFERENCE_TITLE_HTML, unsafe_allow_html=True)
+
+def _render_component_controls(trial, on_select):
+    # キーは固定。試行ごとにウィジェットを作り直さない
+    card_picker(on_select)
+
+
+# ─────────────────────────────────────────
+# hidden：基準カードを直接タップ（隠しボタン + クリックブリッジ）
+# 旧方式。比較計測・切り戻し用に残している
+# ─────────────────────────────────────────
+HIDDEN_CSS = """
+    /* 隠しボタン: iOSで .click() が効く「視覚的に隠す」方式
+       position:fixed; top:-9999px はiOSで .click() が効かないため使用禁止 */
+    button[kind="secondary"] {
+        position: absolute !important;
+        clip: rect(0 0 0 0) !important;
+        clip-path: inset(50%) !important;
+        height: 1px !important;
+        width: 1px !important;
+        overflow: hidden !important;
+        white-space: nowrap !important;
+        touch-action: manipulation !important;
+        -webkit-tap-highlight-color: transparent !important;
+    }
+"""
+
+# 基準カードは検査中に変化しないため、ブリッジHTMLはプロセスで一度だけ組み立てる
+@lru_cache(maxsize=1)
+def _hidden_cards_block():
+    cards_html_parts = []
+    for i, card in enumerate(REFERENCE_CARDS):
+        svg = card_svg(card, size="small")
+        cards_html_parts.append(f"""
+        <div class="ref-card" onclick="selectCard({i})" title="{card['color']}・{card['shape']}・{card['number']}">
+            {svg}
+        </div>""")
+
+    return f"""
+    <style>
+      body {{ margin:0; padding:0; background:transparent; }}
+      .cards-row {{ display:flex; gap:10px; justify-content:center; padding:4px; }}
+      .ref-card {{
+        flex:1; background:#f8fafc; border:2px solid #cbd5e1;
+        border-radius:10px; cursor:pointer;
+        display:flex; justify-content:center; align-items:center;
+        height:120px; transition: border-color .15s, box-shadow .15s, transform .1s;
+        user-select:none;
+      }}
+      .ref-card:hover {{
+        border-color:#60a5fa;
+        box-shadow:0 0 16px rgba(96,165,250,0.7);
+        transform:translateY(-3px);
+      }}
+      .ref-card:active {{ transform:translateY(0); border-color:#2563eb; }}
+    </style>
+    <div class="cards-row">{''.join(cards_html_parts)}</div>
+    <script>
+      function selectCard(i) {{
+        var label = 'CST_CARD_' + i;
+        var buttons = window.parent.document.querySelectorAll('button');
+        for (var j = 0; j < buttons.length; j++) {{
+          if (buttons[j].innerText.trim() === label) {{
+            buttons[j].click();
+            return;
+          }}
+        }}
+      }}
+    </script>"""
+
+def _render_hidden_static():
+    # ── 基準カード ──
+    st.markdown(REFERENCE_TITLE_HTML, unsafe_allow_html=True)
+    components.html(_hidden_cards_block(), height=145)
+
+def _render_hidden_controls(trial, on_select):
+    # ── 隠しボタン（on_click方式・iOS対応）──
+    hcols = st.columns(4)
+    for i, col in enumerate(hcols):
+        with col:
+            st.button(
+                f"CST_CARD_{i}",
+                key=f"hbtn_{i}",
+                on_click=on_select,
+                args=(i,),
+            )
+
+
+# ─────────────────────────────────────────
+# button：基準カード下の「選ぶ」ボタン
+# ─────────────────────────────────────────
+BUTTON_CSS = """
+    /* 選択ボタン（カード下部） */
+    button[kind="secondary"] {
+        background-color: #f1f5f9 !important;
+        color: #334155 !important;
+        border: 2px solid #cbd5e1 !important;
+        border-radius: 10px !important;
+        font-size: 0.9rem !important;
+        font-weight: bold !important;
+        min-height: 40px !important;
+        transition: background-color 0.15s, border-color 0.15s !important;
+        touch-action: manipulation !important;
+        -webkit-tap-highlight-color: transparent !important;
+        -webkit-user-select: none !important;
+        user-select: none !important;
+    }
+    button[kind="secondary"]:hover {
+        background-color: #1e40af !important;
+        color: white !important;
+        border-color: #3b82f6 !important;
+    }
+    button[kind="secondary"]:active {
+        background-color: #1d4ed8 !important;
+        color: white !important;
+    }
+"""
+
+@lru_cache(maxsize=None)
+def _button_card_html(i):
+    # カード絵柄（白背景・角丸）
+    svg = card_svg(REFERENCE_CARDS[i], size="small")
+    return (
+        f'<div style="background:#f8fafc; border:2px solid #cbd5e1; '
+        f'border-radius:10px; '
+        f'height:110px; display:flex; justify-content:center; align-items:center;">'
+        f'{svg}</div>'
+    )
+
+def _render_button_static():
+    # ── 基準カード ──
+    st.markdown(REFERENCE_TITLE_HTML, unsafe_allow_html=True)
+
+    ref_cols = st.columns(4)
+    for i, col in enumerate(ref_cols):
+        with col:
+            st.markdown(_button_card_html(i), unsafe_allow_html=True)
+
+def _render_button_controls(trial, on_select):
+    # 選択ボタン（on_click方式）
+    # 絵柄とは別の列セットに置き、タップ時はこちらだけを再描画する
+    btn_cols = st.columns(4)
+    for i, col in enumerate(btn_cols):
+        with col:
+            st.button(
+                "選ぶ",
+                key=f"card_{i}",
+                on_click=on_select,
+                args=(i,),
+                use_container_width=True,
+            )
+
+
+# ─────────────────────────────────────────
+# 登録
+# ─────────────────────────────────────────
+INPUT_MODES = {
+    "component": InputMode(
+        name="component",
+        hint="上の基準カードを直接タップしてください",
+        css="",
+        render_static=_render_component_static,
+        render_controls=_render_component_controls,
+    ),
+    "hidden": InputMode(
+        name="hidden",
+        hint="上の基準カードを直接タップしてください",
+        css=HIDDEN_CSS,
+        render_static=_render_hidden_static,
+        render_controls=_render_hidden_controls,
+    ),
+    "button": InputMode(
+        name="button",
+        hint="上の「選ぶ」ボタンをタップしてください",
+        css=BUTTON_CSS,
+        render_static=_render_button_static,
+        render_controls=_render_button_controls,
+    ),
+}
+
+def get_input_mode(name):
+    return INPUT_MODES[name]
@@ -0,0 +1,199 @@
+"""
+バックグラウンドジョブキュー
+検査終了後の重い処理（成果物生成・永続化など）を利用者の再実行から切り離して
+スレッドプールで実行する。投入・完了はローカルの JSONL ジャーナルに追記し、
+プロセスが落ちても次回起動時に未完了のジョブを再投入する（get_queue() でキューを作った時点。
+アプリは起動後最初の再実行で作る）。
+ジャーナルにはペイロード（試行ログなど）が載るので、施設ごとの保存先に分けて書く（payload["tenant"]）。
+件数・待ち行列の深さ・種別ごとの待ち時間と実行時間は metrics() で取れる（ライブモニターの画面に出す）。
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import perf
+from .config import DATA_DIR, DEFAULT_TENANT
+
+JOURNAL_NAME = "jobs.jsonl"
+WORKERS = int(os.environ.get("CST_JOB_WORKERS", 2))
+MAX_TRACKED_JOBS = 10000                             # 状態を覚えておく完了済みジョブの上限
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024              # 未完了ジョブが無いときにジャーナルを空にする目安
+
+# ─────────────────────────────────────────
+# ジョブ種別の登録
+# ─────────────────────────────────────────
+_handlers = {}
+
+def handler(kind):
+    # @handler("artifacts") で payload(dict) を受け取る関数を登録する
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+class JobQueue:
+    def __init__(self, root=DATA_DIR, workers=WORKERS):
+        # root の下に施設ごとのジャーナルを置く（config.tenant_data_dir と同じ配置）
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cst-job")
+        self._lock = threading.Lock()
+        self._jobs = {}                              # job_id -> 状態 dict
+        self._by_group = {}                          # group（セッション）-> [job_id]
+        self._counts = {"enqueued": 0, "done": 0, "failed": 0}
+        self._tenant_counts = {}                     # tenant -> 同じ形の件数
+        # 全部のジャーナルを詰め直してから再投入する（移したジョブを移し先で二重に拾わないように）
+        recovered = [item for path in self.journal_paths() for item in self._recover(path)]
+        for rec, move in recovered:
+            self._submit(rec["id"], rec["kind"], rec["group"], rec["payload"], journal=move)
+
+    # ── ジャーナル ──
+    def journal_path(self, tenant=None):
+        if tenant in (None, DEFAULT_TENANT):
+            return os.path.join(self.root, JOURNAL_NAME)
+        return os.path.join(self.root, "tenants", tenant, JOURNAL_NAME)
+
+    def journal_paths(self):
+        paths = glob.glob(os.path.join(glob.escape(self.root), "tenants", "*", JOURNAL_NAME))
+        return [self.journal_path()] + sorted(paths)
+
+    def _journal(self, path, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _recover(self, path):
+        # 投入済みで完了記録のないジョブを拾い、ジャーナルはそれだけに詰め直す。戻り値：[(記録, 移すか)]
+        if not os.path.exists(path):
+            return []
+        pending = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:                   # 書き込み途中で落ちた最終行
+                    continue
+                if rec["event"] == "enqueued":
+                    pending[rec["id"]] = rec
+                else:
+                    pending.pop(rec["id"], None)
+        # 施設ごとに分ける前の共通ジャーナルに残っていた他の施設のジョブは、その施設のジャーナルへ移す
+        moved = {i for i, rec in pending.items() if self.journal_path(rec["payload"].get("tenant")) != path}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job_id, rec in pending.items():
+                if job_id not in moved:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        return [(rec, job_id in moved) for job_id, rec in pending.items()]
+
+    # ── 投入 ──
+    def enqueue(self, kind, payload, group=None):
+        if kind not in _handlers:
+            raise KeyError(f"unknown job kind: {kind}")
+        return self._submit(uuid.uuid4().hex, kind, group, payload, journal=True)
+
+    def _count(self, tenant, event):
+        # 呼び出し側でロック済み
+        self._counts[event] += 1
+        counts = self._tenant_counts.setdefault(tenant, {"enqueued": 0, "done": 0, "failed": 0})
+        counts[event] += 1
+
+    def _submit(self, job_id, kind, group, payload, journal):
+        tenant = payload.get("tenant") or DEFAULT_TENANT
+        job = {"id": job_id, "kind": kind, "group": group, "state": "pending", "tenant": tenant,
+               "journal": self.journal_path(tenant),
+               "enqueued_at": time.time(), "result": None, "error": None}
+        with self._lock:
+            self._jobs[job_id] = job
+            self._by_group.setdefault(group, []).append(job_id)
+            self._count(tenant, "enqueued")
+        if journal:
+            self._journal(job["journal"], {"event": "enqueued", "id": job_id, "kind": kind,
+                                           "group": group, "payload": payload})
+        self._executor.submit(self._run, job, payload)
+        return job_id
+
+    def _run(self, job, payload):
+        started = time.time()
+        perf.record(f"job.{job['kind']}.wait", started - job["enqueued_at"])
+        job["state"] = "running"
+        try:
+            job["result"] = _handlers[job["kind"]](payload)
+            job["state"] = "done"
+        except Exception as exc:                     # 失敗は記録して次のジョブへ
+            job["error"] = repr(exc)
+            job["state"] = "failed"
+        finished = time.time()
+        perf.record(f"job.{job['kind']}.run", finished - started)
+        with self._lock:
+            self._count(job["tenant"], job["state"])
+            self._prune()
+        self._journal(job["journal"], {"event": job["state"], "id": job["id"], "error": job["error"]})
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        # ジョブはジャーナルに書く前に _jobs へ登録されるので、ロック中に未完了が 0 件なら
+        # ジャーナルの中身はすべて完了済みで、捨ててよい
+        with self._lock:
+            if any(j["state"] in ("pending", "running") for j in self._jobs.values()):
+                return
+            for path in self.journal_paths():
+                try:
+                    if os.path.getsize(path) < JOURNAL_COMPACT_BYTES:
+                        continue
+                except OSError:
+                    continue
+                open(path, "w").close()
+
+    def _prune(self):
+        # 投入順に並んでいるので、古い完了済みジョブから忘れる（呼び出し側でロック済み）
+        excess = len(self._jobs) - MAX_TRACKED_JOBS
+        if excess <= 0:
+            return
+        for job_id in [i for i, j in self._jobs.items() if j["state"] in ("done", "failed")][:excess]:
+            job = self._jobs.pop(job_id)
+            ids = self._by_group.get(job["group"], [])
+            ids.remove(job_id)
+            if not ids:
+                self._by_group.pop(job["group"], None)
+
+    # ── 参照 ──
+    def group_status(self, group):
+        # {kind: {"state", "result", "error", ...}}（同じ種別が複数あれば最新）
+        with self._lock:
+            return {self._jobs[i]["kind"]: dict(self._jobs[i]) for i in self._by_group.get(group, [])}
+
+    def depth(self, tenant=None):
+        # 未完了のジョブ数（tenant を渡せばその施設の分だけ）
+        with self._lock:
+            return sum(1 for j in self._jobs.values()
+                       if j["state"] in ("pending", "running") and tenant in (None, j["tenant"]))
+
+    def metrics(self, tenant=None):
+        # {"enqueued", "done", "failed", "depth", "latency": {"job.<種別>.wait|run": perf.summary の形}}
+        # 件数と深さは tenant を渡せばその施設の分。待ち時間・実行時間はプロセス全体（患者の情報は含まない）
+        with self._lock:
+            counts = dict(self._counts if tenant is None
+                          else self._tenant_counts.get(tenant, {"enqueued": 0, "done": 0, "failed": 0}))
+        counts["depth"] = self.depth(tenant)
+        counts["latency"] = perf.summary("job.")
+        return counts
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+    return _queue
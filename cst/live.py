@@ -0,0 +1,188 @@
+"""
+検査者用ライブモニター
+患者側の on_card_selected がランニング指標を LiveHub に publish し、
+検査者の画面は Server-Sent Events（SSE）で変更分だけを受け取る（ポーリングの再実行をしない）。
+
+SSE は Streamlit とは別ポートの小さな HTTP サーバーで配信する（CST_LIVE_PORT、既定 8765）。
+既定では 127.0.0.1 だけで待ち受けるので、別の端末から見るときはリバースプロキシを通して CST_LIVE_URL に
+ブラウザから見える URL を指定する（直接公開するなら CST_LIVE_HOST=0.0.0.0）。
+部屋名は "<テナント>/<部屋>"。購読には検査者の画面（monitor.py）が発行する期限付きの ?ticket= が要る。
+患者側は ?room= を付けたときだけ、その部屋へ仮名（患者名ではない）で進行状況を送る。
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+LIVE_HOST = os.environ.get("CST_LIVE_HOST", "127.0.0.1")
+LIVE_PORT = int(os.environ.get("CST_LIVE_PORT", 8765))
+LIVE_URL = os.environ.get("CST_LIVE_URL", "")
+LIVE_ALLOW_ORIGIN = os.environ.get("CST_LIVE_ALLOW_ORIGIN", "")   # 空なら同じホストのページにだけ CORS を許す
+TICKET_TTL = 12 * 3600                               # 検査者の購読チケットの有効期間（秒）
+SESSION_TTL = 6 * 3600                               # 更新の止まったセッションを忘れるまでの秒数
+KEEPALIVE = 15                                       # SSE のコメント行を送る間隔（秒）
+ROOM_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_room(room):
+    # ?room= の値として受け付ける部屋名（英数字・_・- の 64 文字まで）
+    return isinstance(room, str) and ROOM_NAME.match(room) is not None
+
+
+class LiveHub:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._rooms = {}                             # room -> {session_key: {"version", "updated_at", "data"}}
+
+    def publish(self, room, session_key, data):
+        with self._cond:
+            self._version += 1
+            self._rooms.setdefault(room, {})[session_key] = {
+                "version": self._version, "updated_at": time.time(), "data": data,
+            }
+            self._cond.notify_all()
+
+    def changes(self, room, since):
+        # since より新しい版のセッションだけを返す。戻り値は (版, {session_key: data})
+        with self._cond:
+            if since > self._version:                # サーバー再起動前の版番号で再接続してきた
+                since = 0
+            sessions = self._rooms.get(room, {})
+            self._expire(sessions)
+            changed = {k: v["data"] for k, v in sessions.items() if v["version"] > since}
+            return self._version, changed
+
+    def wait(self, since, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > since, timeout=timeout)
+            return self._version
+
+    def _expire(self, sessions):
+        cutoff = time.time() - SESSION_TTL
+        for key in [k for k, v in sessions.items() if v["updated_at"] < cutoff]:
+            del sessions[key]
+
+
+_hub = LiveHub()
+
+def get_hub():
+    return _hub
+
+# ─────────────────────────────────────────
+# 購読チケット（部屋名と期限の HMAC。鍵はプロセスごとに作る）
+# ─────────────────────────────────────────
+_ticket_key = secrets.token_bytes(32)
+
+def _ticket_sig(room, expires):
+    return hmac.new(_ticket_key, f"{room}\n{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+def room_ticket(room, ttl=TICKET_TTL):
+    expires = int(time.time() + ttl)
+    return f"{expires}.{_ticket_sig(room, expires)}"
+
+def check_ticket(room, ticket):
+    expires, _, sig = (ticket or "").partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sig, _ticket_sig(room, int(expires)))
+
+
+# ─────────────────────────────────────────
+# 患者側：試行ごとの publish
+# ─────────────────────────────────────────
+def snapshot(state, label):
+    m = state["metrics"]
+    return {
+        "label":         label,
+        "trial":         state["trial_num"],
+        "categories":    state["categories_achieved"],
+        "correct":       m["total_correct"],
+        "errors":        m["total_errors"],
+        "perseverative": m["perseverative"],
+        "error_counts":  m["error_counts"],
+        "streak":        m["streak"],
+        "feedback":      state.get("feedback"),
+        "finished":      state["finished"],
+    }
+
+
+# ─────────────────────────────────────────
+# SSE サーバー
+# ─────────────────────────────────────────
+class _SSEHandler(BaseHTTPRequestHandler):
+    hub = _hub
+
+    def log_message(self, *args):                    # アクセスログは出さない
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.startswith("/live/"):
+            self.send_error(404)
+            return
+        room = unquote(url.path[len("/live/"):])
+        if not all(valid_room(part) for part in room.split("/", 1)) or "/" not in room:
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        if not check_ticket(room, params.get("ticket", [None])[0]):
+            self.send_error(403)
+            return
+        # 再接続時はブラウザが Last-Event-ID を付けてくるので、その続きから送る
+        since = self.headers.get("Last-Event-ID") or params.get("since", ["0"])[0]
+        since = int(since) if since.isdigit() else 0
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        origin = self._allowed_origin()
+        if origin:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+        self.end_headers()
+
+        try:
+            while True:
+                version, changed = self.hub.changes(room, since)
+                if changed:
+                    body = json.dumps(changed, ensure_ascii=False)
+                    self.wfile.write(f"id: {version}\ndata: {body}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                since = version
+                if self.hub.wait(since, timeout=KEEPALIVE) == since:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _allowed_origin(self):
+        # モニターは Streamlit（別ポート）のページから購読するので、そのページの Origin だけを許す
+        origin = self.headers.get("Origin")
+        if not origin:
+            return None
+        if LIVE_ALLOW_ORIGIN:
+            return origin if origin == LIVE_ALLOW_ORIGIN else None
+        host = urlparse(f"//{self.headers.get('Host', '')}").hostname
+        return origin if host and urlparse(origin).hostname == host else None
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def ensure_server(port=LIVE_PORT, host=LIVE_HOST):
+    # Streamlit プロセス内で一度だけ起動する（デーモンスレッド）
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _SSEHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="cst-live", daemon=True).start()
+    return _server
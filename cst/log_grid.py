@@ -0,0 +1,226 @@
+"""
+試行ログの表（サーバー側でページ分けする）
+絞り込み（エラー種別・正解ルール・正誤）と並べ替えは保存先の側で行い、ブラウザへは表示中の
+1 ページ（PAGE_SIZE 行）だけを送る。ページ送りや絞り込みの変更はこの表のフラグメントだけを再実行する。
+ページ送りは OFFSET ではなくキーセット（前のページの端の行の並べ替えキーより後・前）で引くので、
+深いページでも読む行数は 1 ページ分で済む（最初・前・次・最後へ移る）。
+- StoreSource：永続ストアの trials テーブル（複数セッション・全セッション）。store.TRIAL_INDEXES の索引の順に引く
+- MemorySource：検査直後でまだ手元にあるログ。同じ絞り込み・並べ替えを pandas で
+
+全セッションの表は ?view=trials（患者名で絞り込める。検査者の合言葉を確かめてから開く）。
+"""
+
+import math
+
+import pandas as pd
+import streamlit as st
+
+from . import registry
+from .config import RULE_LABEL
+from .engine import ERROR_TYPES, LOG_COLUMNS
+from .perf import timed
+from .store import get_store
+
+PAGE_SIZE = 50
+ROW_HEIGHT = 35                                      # st.dataframe の 1 行の高さ（px）
+
+# (表示名, 並べ替えの列)。同じ値の中は検査の順（開始日時・セッション・試行）で、最後の 2 列で行が 1 つに決まる。
+# 並べ替えごとに同じ並びの索引がある（store.TRIAL_INDEXES）ので、絞り込んでも全件を並べ替えない
+_IN_ORDER = ("started_at", "session_id", "trial")
+SORTS = {
+    "試行順":        _IN_ORDER,
+    "エラー種別":    ("error_type", *_IN_ORDER),
+    "正解ルール":    ("rule", *_IN_ORDER),
+    "正誤":          ("correct", *_IN_ORDER),
+    "達成カテゴリー": ("categories_before", *_IN_ORDER),
+}
+# 絞り込み：{列: 許す値のリスト}（空・無しは絞り込まない）
+FILTER_OPTIONS = {
+    "error_type": ["－"] + ERROR_TYPES,
+    "rule":       list(dict.fromkeys(RULE_LABEL.values())),
+    "correct":    ["○", "×"],
+}
+_JP = {col: jp for jp, col in LOG_COLUMNS.items()}
+
+ERROR_ROW_COLOR = {
+    "ミルナー型保続":  "rgba(239,68,68,0.2)",
+    "ネルソン型保続":  "rgba(249,115,22,0.2)",
+    "セット維持困難":  "rgba(234,179,8,0.2)",
+    "非保続性エラー":  "rgba(107,114,128,0.2)",
+}
+
+def highlight_errors(row):
+    if row["正誤"] == "○":
+        return ["background-color: rgba(34,197,94,0.1)"] * len(row)
+    color = ERROR_ROW_COLOR.get(row["エラー種別"], "rgba(107,114,128,0.1)")
+    return [f"background-color: {color}"] * len(row)
+
+# ─────────────────────────────────────────
+# 行の出どころ
+# ─────────────────────────────────────────
+class StoreSource:
+    def __init__(self, store, session_ids=None):
+        # session_ids が None なら全セッション
+        self.store = store
+        self.session_ids = list(session_ids) if session_ids is not None else None
+        self.multi_session = self.session_ids is None or len(self.session_ids) > 1
+
+    def _where(self, filters):
+        clauses, params = [], []
+        if self.session_ids is not None:
+            clauses.append(f"session_id IN ({', '.join('?' for _ in self.session_ids)})")
+            params += self.session_ids
+        for column, values in filters.items():
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params += list(values)
+        return clauses, params
+
+    def count(self, filters):
+        clauses, params = self._where(filters)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return self.store.conn.execute(f"SELECT COUNT(*) FROM trials{where}", params).fetchone()[0]
+
+    @staticmethod
+    def order_columns(filters, sort):
+        # 1 つの値だけで絞った列は並べても同じなので外す（外さないと索引の順で引けないことがある）
+        return [c for c in SORTS[sort] if len(filters.get(c) or ()) != 1]
+
+    def page(self, filters, sort, descending, limit, after=None, before=None, from_end=False):
+        # after / before：前に表示したページの端の行のキー。from_end なら最後の limit 行。
+        # 戻り値：(表示順の行, 各行のキー)
+        columns = self.order_columns(filters, sort)
+        clauses, params = self._where(filters)
+        backward = before is not None or from_end    # 逆順に引いてから並べ直す
+        desc = descending != backward
+        cursor = after if after is not None else before
+        if cursor is not None:
+            clauses.append(f"({', '.join(columns)}) {'<' if desc else '>'} ({', '.join('?' for _ in columns)})")
+            params += list(cursor)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        order = ", ".join(f"{c} DESC" if desc else c for c in columns)
+        rows = self.store.conn.execute(
+            f"SELECT session_id, started_at, {', '.join(c for c in LOG_COLUMNS.values())} FROM trials{where} "
+            f"ORDER BY {order} LIMIT ?", params + [limit],
+        ).fetchall()
+        if backward:
+            rows.reverse()
+        keys = [tuple(row[c] for c in columns) for row in rows]
+        return [{"session_id": row["session_id"], **{_JP[c]: row[c] for c in LOG_COLUMNS.values()}} for row in rows], keys
+
+
+class MemorySource:
+    multi_session = False
+
+    def __init__(self, logs):
+        self.df = pd.DataFrame(logs, columns=list(LOG_COLUMNS))
+
+    def _filtered(self, filters):
+        mask = pd.Series(True, index=self.df.index)
+        for column, values in filters.items():
+            if values:
+                mask &= self.df[_JP[column]].isin(values)
+        return self.df[mask]
+
+    def count(self, filters):
+        return len(self._filtered(filters))
+
+    def page(self, filters, sort, descending, limit, after=None, before=None, from_end=False):
+        # StoreSource.page と同じ。1 セッション分（64 行まで）なので並べてからキーの位置を探す
+        columns = [_JP[c] for c in SORTS[sort] if c in _JP]
+        df = self._filtered(filters).sort_values(columns, ascending=not descending, kind="stable")
+        keys = [tuple(k) for k in df[columns].itertuples(index=False)]
+        if after is not None:
+            start = keys.index(tuple(after)) + 1 if tuple(after) in keys else 0
+            end = start + limit
+        elif before is not None or from_end:
+            end = keys.index(tuple(before)) if before is not None and tuple(before) in keys else len(keys)
+            start = max(0, end - limit)
+        else:
+            start, end = 0, limit
+        return df.iloc[start:end].to_dict("records"), keys[start:end]
+
+# ─────────────────────────────────────────
+# 表示
+# ─────────────────────────────────────────
+def _move(key, where):
+    st.session_state[f"{key}_move"] = where
+
+def _grid(source, key):
+    ss = st.session_state
+    col_error, col_rule, col_correct = st.columns([2, 1, 1])
+    filters = {
+        "error_type": col_error.multiselect("エラー種別", FILTER_OPTIONS["error_type"], key=f"{key}_error_type"),
+        "rule":       col_rule.multiselect("正解ルール", FILTER_OPTIONS["rule"], key=f"{key}_rule"),
+        "correct":    col_correct.multiselect("正誤", FILTER_OPTIONS["correct"], key=f"{key}_correct"),
+    }
+    col_sort, col_desc = st.columns([3, 1])
+    sort = col_sort.selectbox("並べ替え", list(SORTS), key=f"{key}_sort")
+    descending = col_desc.toggle("降順", key=f"{key}_desc")
+
+    # 絞り込み・並べ替えを変えたら 1 ページ目へ
+    signature = (tuple(tuple(v) for v in filters.values()), sort, descending)
+    if ss.get(f"{key}_signature") != signature:
+        ss[f"{key}_signature"] = signature
+        ss[f"{key}_cursor"], ss[f"{key}_page"] = {}, 1
+        ss.pop(f"{key}_move", None)
+
+    total = source.count(filters)
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    page, cursor, edges = ss.get(f"{key}_page", 1), ss.get(f"{key}_cursor", {}), ss.get(f"{key}_edges")
+    # 表示中のページの端の行のキー（edges）から次・前のページを引く。再実行ではそのままのページを引き直す
+    move = ss.pop(f"{key}_move", None)
+    if move == "first" or (move in ("next", "prev") and not edges):
+        page, cursor = 1, {}
+    elif move == "next" and page < pages:
+        page, cursor = page + 1, {"after": edges[1]}
+    elif move == "prev" and page > 1:
+        page, cursor = page - 1, {"before": edges[0]}
+    elif move == "last":
+        page, cursor = pages, {"from_end": True}
+    page = min(page, pages)
+    limit = total - (pages - 1) * PAGE_SIZE if cursor.get("from_end") else PAGE_SIZE
+
+    rows, keys = source.page(filters, sort, descending, limit, **cursor)
+    if not rows and cursor:                          # 引き直す間に行が消えた
+        page, cursor = 1, {}
+        rows, keys = source.page(filters, sort, descending, PAGE_SIZE)
+    ss[f"{key}_page"], ss[f"{key}_cursor"] = page, cursor
+    ss[f"{key}_edges"] = (keys[0], keys[-1]) if keys else None
+    if not rows:
+        st.info("条件に合う試行はありません。")
+        return
+    df = pd.DataFrame(rows)
+    if "session_id" in df:
+        if source.multi_session:
+            df["session_id"] = df["session_id"].str[:8]
+            df = df.rename(columns={"session_id": "セッション"})
+        else:
+            df = df.drop(columns="session_id")
+    styled = df.style.apply(highlight_errors, axis=1)
+    st.dataframe(styled, use_container_width=True, hide_index=True, height=min(len(df), 10) * ROW_HEIGHT + 38)
+
+    first = (page - 1) * PAGE_SIZE
+    col_first, col_prev, col_info, col_next, col_last = st.columns([1, 1, 3, 1, 1])
+    col_first.button("⏮", key=f"{key}_first", on_click=_move, args=(key, "first"), disabled=page == 1)
+    col_prev.button("◀", key=f"{key}_prev", on_click=_move, args=(key, "prev"), disabled=page == 1)
+    col_next.button("▶", key=f"{key}_next", on_click=_move, args=(key, "next"), disabled=page >= pages)
+    col_last.button("⏭", key=f"{key}_last", on_click=_move, args=(key, "last"), disabled=page >= pages)
+    col_info.caption(f"ページ {page} / {pages}　全 {total:,} 件中 {first + 1:,}–{first + len(rows):,} 件を表示")
+
+def show_log_grid(source, key="grid"):
+    st.fragment(_grid)(source, key)
+
+@timed("trials.render")
+def show_trials():
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>🗂️ 試行ログ</h2>""", unsafe_allow_html=True)
+
+    store = get_store(st.session_state.get("tenant"))
+    name = st.text_input("患者名（空欄なら全セッション）", key="trials_patient")
+    session_ids = None
+    if name.strip():
+        session_ids = [row["session_id"] for row in registry.history(name, store)]
+        if not session_ids:
+            st.info("この患者名の検査記録はありません。")
+            return
+    show_log_grid(StoreSource(store, session_ids), key="trials_grid")
@@ -0,0 +1,86 @@
+"""
+検査者用ライブモニター画面（?view=monitor&room=...）
+同じ room の患者セッションの進行状況を一覧する。画面は一度描画するだけで、
+以降の更新は live.py の SSE からブラウザ側で受け取って差し替える。
+検査者の合言葉を確かめてから開き（examiner.py）、ブラウザへはその部屋だけを見られる期限付きのチケットを渡す。
+下に検査後処理のジョブキューの状態（jobs.JobQueue.metrics）を出す。
+"""
+
+import json
+
+import pandas as pd
+import streamlit as st
+import streamlit.components.v1 as components
+
+from . import jobs, live
+
+def _script_json(value):
+    # <script> の中に埋め込む JSON。</script> や <!-- で要素を抜けられないよう <>&/ を \u003c などにする
+    text = json.dumps(value)
+    for c in "<>&/":
+        text = text.replace(c, f"\\u{ord(c):04x}")
+    return text
+
+def _board_html(room, port, base_url, ticket):
+    return f"""
+    <style>
+      body {{ margin:0; font-family:'BIZ UDPGothic',sans-serif; color:#e2e8f0; background:transparent; }}
+      .grid {{ display:grid; grid-template-columns:repeat(auto-fill, minmax(220px, 1fr)); gap:10px; }}
+      .card {{ background:#1e293b; border:1px solid #334155; border-radius:10px; padding:10px 12px; }}
+      .card.done {{ opacity:0.6; }}
+      .name {{ font-weight:bold; color:#60a5fa; margin-bottom:6px; }}
+      .row {{ display:flex; justify-content:space-between; font-size:0.85rem; }}
+      .fb-correct {{ color:#4ade80; }} .fb-incorrect {{ color:#f87171; }}
+      .empty, .status {{ color:#94a3b8; font-size:0.85rem; }}
+    </style>
+    <div class="status" id="status">接続中…</div>
+    <div class="grid" id="grid"><div class="empty">この部屋で実施中の検査はありません</div></div>
+    <script>
+      var sessions = {{}};
+      function row(k, v) {{ return '<div class="row"><span>' + k + '</span><b>' + v + '</b></div>'; }}
+      function esc(s) {{ return String(s).replace(/[&<>"]/g, function (c) {{ return {{'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}}[c]; }}); }}
+      function render() {{
+        var keys = Object.keys(sessions);
+        if (!keys.length) return;
+        document.getElementById('grid').innerHTML = keys.map(function (k) {{
+          var s = sessions[k];
+          var fb = s.feedback === 'correct' ? '<span class="fb-correct">✅ 正解</span>'
+                 : s.feedback === 'incorrect' ? '<span class="fb-incorrect">❌ 不正解</span>' : '－';
+          return '<div class="card' + (s.finished ? ' done' : '') + '">'
+            + '<div class="name">' + esc(s.label) + (s.finished ? '（終了）' : '') + '</div>'
+            + row('試行', s.trial) + row('達成カテゴリー', s.categories)
+            + row('正解 / エラー', s.correct + ' / ' + s.errors)
+            + row('保続性エラー', s.perseverative) + row('連続正解', s.streak)
+            + row('直前の反応', fb) + '</div>';
+        }}).join('');
+      }}
+      var base = {_script_json(base_url)} || (window.parent.location.protocol + '//' + window.parent.location.hostname + ':' + {port});
+      var es = new EventSource(base + '/live/' + {_script_json(room)}.split('/').map(encodeURIComponent).join('/')
+                               + '?ticket=' + encodeURIComponent({_script_json(ticket)}));
+      es.onopen = function () {{ document.getElementById('status').textContent = '🟢 ライブ接続中'; }};
+      es.onerror = function () {{ document.getElementById('status').textContent = '🟠 再接続中…'; }};
+      es.onmessage = function (ev) {{
+        var changed = JSON.parse(ev.data);
+        for (var k in changed) sessions[k] = changed[k];
+        render();
+      }};
+    </script>"""
+
+def show_monitor(room, tenant):
+    # 部屋はテナントごとに分かれる（他の施設の部屋は見えない）
+    live.ensure_server()
+    board_room = f"{tenant}/{room}"
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>👀 ライブモニター</h2>""", unsafe_allow_html=True)
+    st.caption(f"部屋：{room}　患者側のURLに ?room={room} を付けると、ここに表示されます")
+    components.html(_board_html(board_room, live.LIVE_PORT, live.LIVE_URL, live.room_ticket(board_room)),
+                    height=900, scrolling=True)
+    _show_job_queue(tenant)
+
+def _show_job_queue(tenant):
+    # 件数・深さはこの施設の分、待ち時間・実行時間はプロセス全体
+    m = jobs.get_queue().metrics(tenant)
+    with st.expander(f"検査後処理のキュー（未完了 {m['depth']} 件）"):
+        st.caption(f"投入 {m['enqueued']} 件　完了 {m['done']} 件　失敗 {m['failed']} 件")
+        if m["latency"]:
+            df = pd.DataFrame(m["latency"]).T.rename_axis("計測").reset_index()
+            st.dataframe(df.round(1), use_container_width=True, hide_index=True)
@@ -0,0 +1,80 @@
+"""
+計測ユーティリティ
+ホットパスの処理時間をプロセス内に記録し、入力方式どうしの比較に使う
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+
+_WINDOW = 2048
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=_WINDOW))
+
+
+def record(name, seconds):
+    with _lock:
+        _samples[name].append(seconds)
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summary(prefix=""):
+    # {名前: {"n", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}
+    with _lock:
+        items = {k: sorted(v) for k, v in _samples.items() if k.startswith(prefix)}
+    out = {}
+    for name, values in sorted(items.items()):
+        n = len(values)
+        out[name] = {
+            "n":       n,
+            "mean_ms": sum(values) / n * 1000 if n else 0.0,
+            "p50_ms":  _percentile(values, 0.50) * 1000,
+            "p95_ms":  _percentile(values, 0.95) * 1000,
+            "max_ms":  (values[-1] if n else 0.0) * 1000,
+        }
+    return out
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+# ─────────────────────────────────────────
+# タップ → フィードバック表示までの計測
+# ─────────────────────────────────────────
+# コールバック開始時に mark_tap()、フィードバックを描画し終えたら
+# finish_tap() を呼ぶと "tap_to_feedback.<入力方式>" に記録される
+_TAP_KEY = "_perf_tap_started"
+
+
+def mark_tap(state):
+    state[_TAP_KEY] = time.perf_counter()
+
+
+def finish_tap(state, mode):
+    started = state.get(_TAP_KEY)
+    if started is None:
+        return
+    del state[_TAP_KEY]
+    record(f"tap_to_feedback.{mode}", time.perf_counter() - started)
@@ -0,0 +1,44 @@
+"""
+検査終了後の処理
+finished が True になった時点でジョブキューに投入する後処理をまとめる。
+"""
+
+from . import archive, artifacts, jobs, registry
+from .store import get_store
+
+# 投入順に実行される（ワーカーが複数あれば並行）
+POST_TEST_JOBS = ("persist", "artifacts", "archive")
+
+@jobs.handler("persist")
+def _persist(payload):
+    # セッション・試行ログと患者の経過比較用の集計行を 1 トランザクションで保存する
+    # （集計は検査中に更新してきたランニング指標をそのまま使う）
+    registry.save_session(payload["session_id"], payload["meta"], payload["logs"], payload.get("summary"),
+                          store=get_store(payload.get("tenant")))
+    return payload["session_id"]
+
+@jobs.handler("artifacts")
+def _build_artifacts(payload):
+    _, files = artifacts.ensure_artifacts(payload["logs"], payload["meta"],
+                                          artifacts.get_cache(payload.get("tenant")))
+    return sorted(files)
+
+@jobs.handler("archive")
+def _archive(payload):
+    return archive.get_archive(payload.get("tenant")).append_session(payload["session_id"], payload["logs"],
+                                                payload.get("trial_times"), payload["meta"].get("started_at"))
+
+def enqueue_finished_session(state):
+    logs = list(state["logs"])
+    meta = artifacts.session_meta(state)
+    session_id = artifacts.session_hash(logs, meta)
+    payload = {"session_id": session_id, "meta": meta, "logs": logs, "summary": state.get("metrics"),
+               "trial_times": list(state.get("trial_times", [])), "tenant": state.get("tenant")}
+    queue = jobs.get_queue()
+    for kind in POST_TEST_JOBS:
+        queue.enqueue(kind, payload, group=session_id)
+    state["session_id"] = session_id
+    return session_id
+
+def job_status(session_id):
+    return jobs.get_queue().group_status(session_id)
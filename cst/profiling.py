@@ -0,0 +1,255 @@
+"""
+オンデマンドのプロファイリング
+CST_PROFILE=1 または ?profile=<CST_PROFILE_TOKEN> のとき、再実行（main）・コールバック・
+フラグメントの 1 回ごとにプロファイラをかけ、施設の保存先の profiles/（default は PROFILE_DIR）に次を書き出す。
+- <時刻>-<名前>.speedscope.json ：https://www.speedscope.app で開けるフレームグラフ
+- <時刻>-<名前>.memory.txt      ：tracemalloc のスナップショット（確保の多い行の上位）
+- slowest.json                  ：遅かった回の一覧（上位 SLOWEST_KEEP 件を更新し続ける）
+
+pyinstrument があればサンプリング、無ければ sys.setprofile による決定的トレースを使う。
+どちらも設定されていないときは profiled() が関数をそのまま返すので、計測のコストは一切かからない。
+"""
+
+import functools
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from .config import DEFAULT_TENANT, PROFILE_DIR, PROFILE_ENABLED, PROFILE_TOKEN, tenant_data_dir
+
+try:
+    from pyinstrument import Profiler as _SamplingProfiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # 任意依存
+    _SamplingProfiler = None
+
+SAMPLING_INTERVAL = 0.001                            # pyinstrument のサンプリング間隔（秒）
+MAX_TRACE_EVENTS = 500_000                           # 決定的トレースで記録するイベント数の上限
+TRACEMALLOC_FRAMES = 16
+MEMORY_TOP = 30                                      # memory.txt に書く行数
+SLOWEST_KEEP = 50
+MAX_PROFILE_FILES = 1000                             # これを超えたら slowest に無い古い回から消す
+
+_local = threading.local()
+_lock = threading.Lock()
+_tracemalloc_users = 0
+_slowest = {}                                        # 書き出し先 -> (秒, 連番, 記録) の min-heap
+_written = {}                                        # 書き出し先 -> 書き出した回の (連番, [ファイル])
+_seq = 0
+
+
+def available():
+    # 有効化できる設定があるか（無ければデコレータは何もしない）
+    return PROFILE_ENABLED or bool(PROFILE_TOKEN)
+
+def requested():
+    if PROFILE_ENABLED:
+        return True
+    import streamlit as st
+    return bool(PROFILE_TOKEN) and st.query_params.get("profile") == PROFILE_TOKEN
+
+def _profile_dir():
+    # 施設ごとに分ける（どの施設の再実行か決まる前に終わった回は default）
+    import streamlit as st
+    tenant = st.session_state.get("tenant", DEFAULT_TENANT)
+    return PROFILE_DIR if tenant == DEFAULT_TENANT else os.path.join(tenant_data_dir(tenant), "profiles")
+
+# ─────────────────────────────────────────
+# 決定的トレース（sys.setprofile → speedscope の evented 形式）
+# ─────────────────────────────────────────
+class _Tracer:
+    def __init__(self):
+        self.frames = []
+        self._frame_index = {}
+        self.events = []
+        self._depth = 0
+        self.truncated = False
+
+    def _frame(self, key, name, file, line):
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": name, "file": file, "line": line})
+        return index
+
+    def _callback(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == "call":
+            code = frame.f_code
+            index = self._frame(code, code.co_qualname if hasattr(code, "co_qualname") else code.co_name,
+                                code.co_filename, code.co_firstlineno)
+        elif event == "c_call":
+            # 束縛メソッドは呼び出しごとに別オブジェクトなので名前で引く
+            name = f"{getattr(arg, '__module__', None) or ''}.{getattr(arg, '__qualname__', repr(arg))}".lstrip(".")
+            index = self._frame(name, name, "<builtin>", 0)
+        elif self._depth == 0:                       # 計測開始前に入った関数からの return
+            return
+        else:
+            index = None
+        if index is not None:
+            self.events.append(("O", index, now))
+            self._depth += 1
+        else:
+            self.events.append(("C", None, now))
+            self._depth -= 1
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            self.truncated = True
+            sys.setprofile(None)
+
+    def start(self):
+        self.started = time.perf_counter()
+        sys.setprofile(self._callback)
+
+    def stop(self):
+        sys.setprofile(None)
+        self.stopped = time.perf_counter()
+
+    def speedscope(self, name):
+        # 閉じイベントに対応するフレーム番号をスタックで補い、開いたままのものは終了時刻で閉じる
+        stack, events = [], []
+        for kind, index, at in self.events:
+            if kind == "O":
+                stack.append(index)
+            else:
+                index = stack.pop()
+            events.append({"type": kind, "frame": index, "at": (at - self.started) * 1000})
+        end = (self.stopped - self.started) * 1000
+        while stack:
+            events.append({"type": "C", "frame": stack.pop(), "at": end})
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{"type": "evented", "name": name + (" (truncated)" if self.truncated else ""),
+                          "unit": "milliseconds", "startValue": 0, "endValue": end, "events": events}],
+            "name": name,
+            "exporter": "cst.profiling",
+        }
+
+
+class _Sampler:
+    def __init__(self):
+        self._profiler = _SamplingProfiler(interval=SAMPLING_INTERVAL, async_mode="disabled")
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def speedscope(self, name):
+        return json.loads(self._profiler.output(SpeedscopeRenderer()))
+
+# ─────────────────────────────────────────
+# tracemalloc（プロセス全体で 1 つなので利用者数で開始・停止する）
+# ─────────────────────────────────────────
+def _tracemalloc_acquire():
+    global _tracemalloc_users
+    with _lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+    tracemalloc.reset_peak()
+
+def _tracemalloc_release():
+    global _tracemalloc_users
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    return snapshot, peak
+
+def _memory_report(snapshot, peak):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    stats = snapshot.statistics("lineno")
+    lines = [f"peak={peak / 1024:.1f}KiB  traced={sum(s.size for s in stats) / 1024:.1f}KiB", ""]
+    lines += [str(s) for s in stats[:MEMORY_TOP]]
+    return "\n".join(lines) + "\n"
+
+# ─────────────────────────────────────────
+# 書き出し
+# ─────────────────────────────────────────
+def _write(name, seconds, profile, memory, directory=PROFILE_DIR):
+    global _seq
+    with _lock:
+        _seq += 1
+        seq = _seq
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{seq:06d}-{name}")
+    files = [stem + ".speedscope.json", stem + ".memory.txt"]
+    with open(files[0], "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False)
+    with open(files[1], "w", encoding="utf-8") as f:
+        f.write(memory)
+
+    record = {"name": name, "ms": round(seconds * 1000, 3), "at": time.time(),
+              "speedscope": os.path.basename(files[0]), "memory": os.path.basename(files[1])}
+    with _lock:
+        slowest = _slowest.setdefault(directory, [])
+        written = _written.setdefault(directory, [])
+        if len(slowest) < SLOWEST_KEEP:
+            heapq.heappush(slowest, (seconds, seq, record))
+        elif seconds > slowest[0][0]:
+            heapq.heapreplace(slowest, (seconds, seq, record))
+        ranking = [r for _, _, r in sorted(slowest, reverse=True)]
+        keep = {s for _, s, _ in slowest}
+        written.append((seq, files))
+        expired = []
+        excess = len(written) - MAX_PROFILE_FILES
+        if excess > 0:
+            for item in [w for w in written if w[0] not in keep][:excess]:
+                written.remove(item)
+                expired += item[1]
+    for path in expired:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    tmp = os.path.join(directory, f"slowest.json.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ranking, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(directory, "slowest.json"))
+
+# ─────────────────────────────────────────
+# デコレータ
+# ─────────────────────────────────────────
+def profiled(name):
+    # 設定が無ければ関数をそのまま返す。入れ子になった呼び出しは外側の 1 回にまとめる
+    def decorator(func):
+        if not available():
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "active", False) or not requested():
+                return func(*args, **kwargs)
+            _local.active = True
+            profiler = _Sampler() if _SamplingProfiler is not None else _Tracer()
+            _tracemalloc_acquire()
+            t0 = time.perf_counter()
+            profiler.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.stop()
+                seconds = time.perf_counter() - t0
+                snapshot, peak = _tracemalloc_release()
+                _local.active = False
+                _write(name, seconds, profiler.speedscope(name), _memory_report(snapshot, peak), _profile_dir())
+        return wrapper
+    return decorator
+
+
+def slowest(directory=None):
+    # 遅い順の記録。directory を渡せばその書き出し先（施設）の分だけ、無ければすべての書き出し先をまとめて
+    with _lock:
+        heaps = [_slowest.get(directory, [])] if directory is not None else list(_slowest.values())
+        return [r for _, _, r in sorted((item for heap in heaps for item in heap), reverse=True)]
@@ -0,0 +1,215 @@
+"""
+患者レジストリ
+患者名はそのまま索引にせず、秘密鍵付きハッシュ（HMAC-SHA256）を患者キーとして使う。
+鍵は施設ごとに別（施設の保存先の patient_key.secret）なので、施設をまたいで同じ患者を突き合わせられない。
+セッションごとの集計（show_results と同じ指標）を session_summaries に 1 行で持ち、
+(患者キー, 実施日時) の索引で経過比較の画面が試行ログを読まずに履歴を引けるようにする。
+集計行はセッション保存（persist ジョブ・CSV 取り込み）のたびに追加する。
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import unicodedata
+
+from . import engine
+from .config import DEFAULT_TENANT, tenant_data_dir
+from .store import get_store
+
+SECRET_NAME = "patient_key.secret"
+
+_ERROR_COLUMNS = {
+    "ミルナー型保続": "milner",
+    "ネルソン型保続": "nelson",
+    "セット維持困難": "failure_to_maintain",
+    "非保続性エラー": "other_errors",
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id     TEXT PRIMARY KEY REFERENCES sessions(session_id),
+    patient_key    TEXT NOT NULL,
+    session_date   REAL,
+    total_trials   INTEGER NOT NULL,
+    categories     INTEGER NOT NULL,
+    total_correct  INTEGER NOT NULL,
+    total_errors   INTEGER NOT NULL,
+    perseverative  INTEGER NOT NULL,
+    max_streak     INTEGER NOT NULL,
+    {", ".join(f"{c} INTEGER NOT NULL" for c in _ERROR_COLUMNS.values())}
+);
+CREATE INDEX IF NOT EXISTS session_summaries_patient_date
+    ON session_summaries (patient_key, session_date);
+"""
+
+SUMMARY_COLUMNS = [
+    "session_id", "patient_key", "session_date", "total_trials", "categories",
+    "total_correct", "total_errors", "perseverative", "max_streak", *_ERROR_COLUMNS.values(),
+]
+
+# ─────────────────────────────────────────
+# 患者キー
+# ─────────────────────────────────────────
+_secrets = {}
+_secret_lock = threading.Lock()
+
+def _get_secret(tenant=None):
+    # 施設の保存先に一度だけ作って使い続ける（default は従来の DATA_DIR/patient_key.secret）。
+    # CST_PATIENT_KEY_SECRET があれば default はその値、他の施設はその値と施設 ID から導いた値
+    tenant = tenant or DEFAULT_TENANT
+    with _secret_lock:
+        if tenant not in _secrets:
+            env = os.environ.get("CST_PATIENT_KEY_SECRET")
+            path = os.path.join(tenant_data_dir(tenant), SECRET_NAME)
+            if env:
+                secret = env.encode("utf-8")
+                if tenant != DEFAULT_TENANT:
+                    secret = hmac.new(secret, tenant.encode("utf-8"), hashlib.sha256).hexdigest().encode("ascii")
+            elif os.path.exists(path):
+                with open(path, "rb") as f:
+                    secret = f.read().strip()
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                secret = secrets.token_hex(32).encode("ascii")
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(secret)
+            _secrets[tenant] = secret
+    return _secrets[tenant]
+
+def normalize_name(name):
+    # 全角・半角や空白の違いで別人にならないようにそろえる
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", name or "")).lower()
+
+def patient_key(name, tenant=None):
+    # 名前が空なら None（匿名のセッションは履歴に結び付けない）
+    name = normalize_name(name)
+    if not name:
+        return None
+    return hmac.new(_get_secret(tenant), name.encode("utf-8"), hashlib.sha256).hexdigest()
+
+# ─────────────────────────────────────────
+# 集計行の追加
+# ─────────────────────────────────────────
+def summary_row(session_id, key, session_date, summary):
+    counts = summary["error_counts"]
+    return (
+        session_id, key, session_date, summary["total_trials"], summary["categories"],
+        summary["total_correct"], summary["total_errors"], summary["perseverative"],
+        summary["max_streak"], *(counts.get(label, 0) for label in _ERROR_COLUMNS),
+    )
+
+def record_sessions(sessions, store=None):
+    # sessions: [(session_id, meta, logs, summary または None, 既定の日時), ...]
+    # 患者名の無いセッションは飛ばす。同じ session_id は上書きしない
+    store = ensure_schema(store)
+    with store.conn:
+        return insert_summaries(sessions, store)
+
+def insert_summaries(sessions, store):
+    # record_sessions の中身。確定しない（呼び出し側のトランザクションに入る）。
+    # executescript は途中のトランザクションを確定してしまうので、ensure_schema は先に済ませておくこと
+    rows = []
+    for session_id, meta, logs, summary, fallback_date in sessions:
+        key = patient_key(meta.get("patient_name"), store.tenant)
+        if key is None:
+            continue
+        summary = summary or engine.summarize(logs, meta.get("categories", 0))
+        date = meta.get("finished_at") or meta.get("started_at") or fallback_date
+        rows.append(summary_row(session_id, key, date, summary))
+    if rows:
+        store.conn.executemany(
+            f"INSERT OR IGNORE INTO session_summaries ({', '.join(SUMMARY_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in SUMMARY_COLUMNS)})",
+            rows,
+        )
+    return len(rows)
+
+def save_sessions(sessions, store=None):
+    # セッション・試行ログと集計行を 1 トランザクションで保存する（片方だけ残ることがない）。
+    # sessions の形は record_sessions と同じ
+    store = ensure_schema(store)
+    with store.conn:
+        store.insert_sessions([(sid, meta, logs) for sid, meta, logs, _, _ in sessions])
+        return insert_summaries(sessions, store)
+
+def save_session(session_id, meta, logs, summary=None, fallback_date=None, store=None):
+    return save_sessions([(session_id, meta, logs, summary, fallback_date)], store)
+
+def record_session(session_id, meta, logs, summary=None, fallback_date=None, store=None):
+    return record_sessions([(session_id, meta, logs, summary, fallback_date)], store)
+
+def backfill(store=None, batch=500):
+    # 集計行の無い保存済みセッション（レジストリ導入前のもの）を埋める
+    store = ensure_schema(store)
+    missing = store.conn.execute(
+        "SELECT session_id, meta_json FROM sessions WHERE patient_name != '' "
+        "AND session_id NOT IN (SELECT session_id FROM session_summaries)"
+    ).fetchall()
+    added = 0
+    for i in range(0, len(missing), batch):
+        chunk = [(row["session_id"], json.loads(row["meta_json"]),
+                  store.load_logs(row["session_id"]), None, None) for row in missing[i:i + batch]]
+        added += record_sessions(chunk, store)
+    return added
+
+def rekey(store=None):
+    # 鍵が替わったとき（施設ごとの鍵に移る前に作った集計行など）に、保存済みの患者名から患者キーを付け直す
+    store = ensure_schema(store)
+    rows = store.conn.execute(
+        "SELECT ss.session_id, s.patient_name FROM session_summaries ss JOIN sessions s USING (session_id)"
+    ).fetchall()
+    with store.conn:
+        store.conn.executemany(
+            "UPDATE session_summaries SET patient_key = ? WHERE session_id = ?",
+            [(patient_key(row["patient_name"], store.tenant), row["session_id"]) for row in rows],
+        )
+    return len(rows)
+
+# ─────────────────────────────────────────
+# 参照
+# ─────────────────────────────────────────
+def history(name, store=None):
+    # 患者 1 人の全セッションの集計行（古い順）。試行ログは読まない
+    store = ensure_schema(store)
+    key = patient_key(name, store.tenant)
+    if key is None:
+        return []
+    rows = store.conn.execute(
+        f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM session_summaries "
+        "WHERE patient_key = ? ORDER BY session_date",
+        (key,),
+    ).fetchall()
+    result = []
+    for row in rows:
+        item = {c: row[c] for c in SUMMARY_COLUMNS if c not in _ERROR_COLUMNS.values()}
+        item["error_counts"] = {label: row[col] for label, col in _ERROR_COLUMNS.items()}
+        result.append(item)
+    return result
+
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def ensure_schema(store=None):
+    store = store or get_store()
+    with _schema_lock:
+        if store.path not in _schema_ready:
+            store.conn.executescript(SCHEMA)
+            _schema_ready.add(store.path)
+    return store
+
+
+if __name__ == "__main__":
+    # python -m cst.registry [テナント] [--rekey]：レジストリ導入前に保存されたセッションの集計行を作る。
+    # --rekey は施設ごとの鍵に移る前の集計行の患者キーを付け直す
+    import sys
+    args = [a for a in sys.argv[1:] if a != "--rekey"]
+    store = get_store(args[0] if args else None)
+    if "--rekey" in sys.argv:
+        print(f"rekeyed {rekey(store)} sessions")
+    print(f"backfilled {backfill(store)} sessions")
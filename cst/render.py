@@ -0,0 +1,156 @@
+"""
+描画ヘルパー
+カードSVG・共通CSS・定型HTMLの生成（Streamlit に依存しない純粋な文字列生成）
+"""
+
+from functools import lru_cache
+
+from .config import BLOG_URL, COLORS, NUMBERS, SHAPES
+
+# ─────────────────────────────────────────
+# 図形（SVG）描画ジェネレーター
+# ─────────────────────────────────────────
+# 組み合わせは 4色×4形×4数×サイズ のみなので結果をキャッシュする
+@lru_cache(maxsize=256)
+def generate_card_svg(color_name, shape_name, number_str, size="normal"):
+    color_map = {"赤": "#ef4444", "緑": "#22c55e", "黄": "#eab308", "青": "#3b82f6"}
+    c = color_map.get(color_name, "#ffffff")
+
+    if shape_name == "丸":
+        shape_svg = f'<circle cx="40" cy="40" r="35" fill="{c}"/>'
+    elif shape_name == "三角":
+        shape_svg = f'<polygon points="40,5 75,75 5,75" fill="{c}"/>'
+    elif shape_name == "十字":
+        shape_svg = f'<polygon points="25,5 55,5 55,25 75,25 75,55 55,55 55,75 25,75 25,55 5,55 5,25 25,25" fill="{c}"/>'
+    elif shape_name == "星":
+        shape_svg = f'<polygon points="40,2 52,27 79,31 59,50 65,77 40,63 15,77 21,50 1,31 28,27" fill="{c}"/>'
+    else:
+        shape_svg = ""
+
+    positions = []
+    n = int(number_str)
+    if n == 1:
+        positions = [(60, 60)]
+    elif n == 2:
+        positions = [(60, 10), (60, 110)]
+    elif n == 3:
+        positions = [(60, 10), (10, 110), (110, 110)]
+    elif n == 4:
+        positions = [(15, 15), (105, 15), (15, 105), (105, 105)]
+
+    items = ""
+    for x, y in positions:
+        items += f'<g transform="translate({x}, {y})">{shape_svg}</g>'
+
+    max_w = "60px" if size == "small" else "110px"
+
+    return f'<div style="display:flex; justify-content:center; align-items:center; width:100%; margin:4px 0;"><svg viewBox="0 0 200 200" style="width:100%; max-width:{max_w}; height:auto;">{items}</svg></div>'
+
+def card_svg(card, size="normal"):
+    return generate_card_svg(card["color"], card["shape"], card["number"], size=size)
+
+@lru_cache(maxsize=1)
+def warm_assets():
+    # 全カード（4色×4形×4数×3サイズ = 192 枚）をプロセス起動後に一度だけ作っておく。
+    # どのテナントの最初のタップもキャッシュから返る
+    for color in COLORS:
+        for shape in SHAPES:
+            for number in NUMBERS:
+                for size in ("small", "normal", "large"):
+                    generate_card_svg(color, shape, number, size=size)      # card_svg と同じ呼び方（キャッシュのキーをそろえる）
+    return generate_card_svg.cache_info().currsize
+
+# ─────────────────────────────────────────
+# テスト画面の定型HTML
+# ─────────────────────────────────────────
+FEEDBACK_HTML = {
+    "correct":   '<div style="background-color:rgba(34,197,94,0.2); color:#4ade80; padding:8px; border-radius:8px; text-align:center; font-weight:bold; margin-bottom:10px;">✅ 正解！</div>',
+    "incorrect": '<div style="background-color:rgba(239,68,68,0.2); color:#f87171; padding:8px; border-radius:8px; text-align:center; font-weight:bold; margin-bottom:10px;">❌ 不正解</div>',
+    None:        '<div style="padding:8px; margin-bottom:10px;">&nbsp;</div>',
+}
+
+REFERENCE_TITLE_HTML = "<p style='text-align:center; color:#94a3b8; font-size:1rem; font-weight:bold; margin-top:4px;'>【基準カード】</p>"
+
+DIVIDER_HTML = "<hr style='border-color:#334155; margin:10px 0;'>"
+
+def target_title_html(hint):
+    return f"<p style='text-align:center; color:#fbbf24; font-size:1rem; font-weight:bold;'>【今から分類するカード】<br><span style='font-size:0.8rem; font-weight:normal; color:#94a3b8;'>{hint}</span></p>"
+
+def target_card_html(target, trial=0):
+    # data-trial は計測スクリプトが「表示が次の試行に進んだ」ことを検出するための目印
+    svg_html = card_svg(target, size="large")
+    return f'<div data-trial="{trial}" style="height:160px; background:#f8fafc; border:4px solid #fbbf24; border-radius:12px; display:flex; justify-content:center; align-items:center; box-shadow:0 0 15px rgba(251,191,36,0.3);">{svg_html}</div>'
+
+# ─────────────────────────────────────────
+# 共通CSS（入力方式ごとの差分は inputs.py 側）
+# ─────────────────────────────────────────
+BASE_CSS = """
+    /* ヘッダーとフッターを消す */
+    header {visibility: hidden !important;}
+    #MainMenu {visibility: hidden !important;}
+    footer {visibility: hidden !important;}
+
+    /* 余白を削る */
+    .block-container {
+        padding-top: 1rem !important;
+        padding-bottom: 1rem !important;
+        max-width: 800px;
+    }
+
+    /* 全体のダークテーマ */
+    .stApp { background-color: #0f172a; color: #e2e8f0; }
+
+    /* primaryボタン（スタート・リセット等） */
+    button[kind="primary"] {
+        background-color: #1e40af !important;
+        color: white !important;
+        border: 1px solid #3b82f6 !important;
+        border-radius: 8px !important;
+        /* iOS修正: transition:all はタップ無効化バグがあるため個別指定 */
+        transition: background-color 0.2s, border-color 0.2s !important;
+        touch-action: manipulation !important;
+        -webkit-tap-highlight-color: transparent !important;
+        padding: 10px 0 !important;
+        font-size: 1rem !important;
+        font-weight: bold !important;
+    }
+    button[kind="primary"]:hover {
+        background-color: #2563eb !important;
+        border-color: #60a5fa !important;
+    }
+"""
+
+@lru_cache(maxsize=8)
+def page_css(mode_css):
+    return f"<style>{BASE_CSS}{mode_css}</style>"
+
+# ─────────────────────────────────────────
+# ブロック画面（ブログ経由以外のアクセスを弾く）
+# ─────────────────────────────────────────
+BLOCK_HIDE_CHROME_CSS = "<style>header {visibility: hidden;} footer {visibility: hidden;}</style>"
+
+# 以前のツールのデザインを再現したHTML/CSS
+BLOCK_SCREEN_HTML = f"""
+    <div style="min-height: 80vh; display: flex; align-items: center; justify-content: center; padding: 20px;">
+        <div style="background-color: white; padding: 40px; border-radius: 20px; box-shadow: 0 10px 25px rgba(0,0,0,0.1); max-width: 500px; width: 100%; text-align: center; border: 4px solid #ffedd5;">
+            <div style="font-size: 60px; margin-bottom: 20px; animation: bounce 2s infinite;">🏠</div>
+            <h1 style="color: #1f2937; font-size: 1.5rem; font-weight: bold; margin-bottom: 15px; line-height: 1.4;">
+                こんにちは！<br/>
+                <span style="color: #4f46e5; font-size: 1.2rem;">STのリハビリ開発室｜自作アプリとプリント教材</span>です
+            </h1>
+            <p style="color: #4b5563; margin-bottom: 30px; line-height: 1.6;">
+                アクセスありがとうございます。<br/>
+                このツールは、ブログ読者様限定で公開しています。
+            </p>
+            <a href="{BLOG_URL}" style="display: block; width: 100%; background: linear-gradient(to right, #6366f1, #9333ea); color: white; font-weight: bold; padding: 15px 20px; border-radius: 9999px; text-decoration: none; box-shadow: 0 4px 6px rgba(0,0,0,0.1); transition: all 0.3s;">
+                ブログの記事に戻る
+            </a>
+        </div>
+    </div>
+    <style>
+        @keyframes bounce {{
+            0%, 100% {{ transform: translateY(-5%); animation-timing-function: cubic-bezier(0.8,0,1,1); }}
+            50% {{ transform: none; animation-timing-function: cubic-bezier(0,0,0.2,1); }}
+        }}
+    </style>
+    """
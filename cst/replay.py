@@ -0,0 +1,145 @@
+"""
+セッションの再生
+記録された試行ログから採点エンジンの状態を組み立て直し、任意の試行へ移動できるようにする。
+SNAPSHOT_EVERY 試行ごとに状態のスナップショットを持つので、移動は直前のスナップショットから
+高々 SNAPSHOT_EVERY - 1 試行を適用するだけで済む（1 試行目から再生し直さない）。
+
+    python -m cst.replay [--workers N] [--limit N] [--tenant ID]   # 保存済みセッションをまとめて再採点（QA）
+"""
+
+import argparse
+import copy
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from . import engine
+from .store import get_store
+
+SNAPSHOT_EVERY = 8
+MAX_CACHED_REPLAYS = 64                              # 再生中のセッションを覚えておく数
+_LOG_KEYS = ("logs", "trial_times")                  # スナップショットに含めない（試行ごとに伸びる）キー
+
+
+def _snapshot(state):
+    # 試行ログ以外を複製する（ログは Replay.logs の先頭部分と同じなので持たない）
+    return {k: copy.deepcopy(v) for k, v in state.items() if k not in _LOG_KEYS}
+
+
+class Replay:
+    def __init__(self, logs, snapshot_every=SNAPSHOT_EVERY):
+        self.logs = logs
+        self.snapshot_every = snapshot_every
+        self.snapshots = []                          # snapshots[i] = i * snapshot_every 試行後の状態
+        self.mismatches = []
+        state = engine.default_state()
+        state["started"] = True
+        for n, entry in enumerate(logs):
+            if n % snapshot_every == 0:
+                self.snapshots.append(_snapshot(state))
+            recomputed = engine.replay_step(state, entry)
+            if recomputed is None or any(recomputed[k] != entry[k] for k in engine.LOG_COLUMNS):
+                self.mismatches.append(entry["試行"])
+        if len(logs) % snapshot_every == 0:
+            self.snapshots.append(_snapshot(state))
+        self.final_state = state
+
+    def __len__(self):
+        return len(self.logs)
+
+    def state_at(self, n):
+        # n 試行を終えた直後の状態（n = 0 は開始直後）。
+        # 返す state["logs"] にはスナップショット以降に適用した分だけが入る（全体は self.logs[:n]）
+        n = max(0, min(n, len(self.logs)))
+        base = n // self.snapshot_every
+        state = copy.deepcopy(self.snapshots[base])
+        state["logs"], state["trial_times"] = [], []
+        for entry in self.logs[base * self.snapshot_every:n]:
+            engine.replay_step(state, entry)
+        return state
+
+    def frame(self, trial):
+        # trial 試行目で患者が見ていたもの（ターゲット・直前のフィードバック・その時点のルール）と選択の結果
+        entry = self.logs[trial - 1]
+        before = self.state_at(trial - 1)
+        return {
+            "trial":          trial,
+            "target":         engine.logged_target(entry),
+            "feedback":       before["feedback"],
+            "rule":           engine.current_rule(before),
+            "categories":     before["categories_achieved"],
+            "streak":         before["consecutive_correct"],
+            "chosen_index":   engine.chosen_index(entry),
+            "correct":        entry["正誤"] == "○",
+            "error_type":     entry["エラー種別"],
+        }
+
+# ─────────────────────────────────────────
+# 保存済みセッションの再生（プロセス内で使い回す）
+# ─────────────────────────────────────────
+_replays = OrderedDict()                             # (ストアのパス, session_id) -> Replay
+_replays_lock = threading.Lock()
+
+def get_replay(session_id, store=None):
+    store = store or get_store()
+    key = (store.path, session_id)
+    with _replays_lock:
+        if key in _replays:
+            _replays.move_to_end(key)
+            return _replays[key]
+    logs = store.load_logs(session_id)
+    if not logs:
+        return None
+    replay = Replay(logs)
+    with _replays_lock:
+        _replays[key] = replay
+        while len(_replays) > MAX_CACHED_REPLAYS:
+            _replays.popitem(last=False)
+    return replay
+
+# ─────────────────────────────────────────
+# まとめて QA（記録と再採点の食い違いを探す）
+# ─────────────────────────────────────────
+def _check_session(session_id, tenant=None):
+    logs = get_store(tenant).load_logs(session_id)
+    _, mismatches = engine.rescore(logs)
+    return session_id, len(logs), mismatches
+
+def check_sessions(session_ids, workers=None, tenant=None):
+    # 戻り値：{session_id: 食い違った試行番号のリスト}（食い違いの無いセッションは含めない）
+    found = {}
+    check = functools.partial(_check_session, tenant=tenant)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for session_id, _, mismatches in pool.map(check, session_ids, chunksize=64):
+            if mismatches:
+                found[session_id] = mismatches
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="保存済みセッションを再採点して記録との食い違いを探す")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--tenant", default=None)
+    args = parser.parse_args(argv)
+
+    sql = "SELECT session_id FROM sessions ORDER BY finished_at DESC"
+    if args.limit:
+        sql += f" LIMIT {int(args.limit)}"
+    session_ids = [row["session_id"] for row in get_store(args.tenant).conn.execute(sql)]
+    t0 = time.perf_counter()
+    found = check_sessions(session_ids, workers=args.workers or os.cpu_count(), tenant=args.tenant)
+    elapsed = time.perf_counter() - t0
+    for session_id, trials in found.items():
+        print(f"{session_id}  trials={trials[:10]}")
+    print(f"checked={len(session_ids)} mismatched={len(found)} elapsed={elapsed:.1f}s "
+          f"sessions/s={len(session_ids) / elapsed if elapsed else 0:.0f}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+セッション再生画面（?view=replay&session=<session_id>）
+指導・QA 用に、保存済みセッションを 1 試行ずつ、または指定した速さで自動再生する。
+患者名を含むので、検査者の合言葉を確かめてから開く（examiner.py）。
+カードの絵は render.card_svg のキャッシュから組み立てる。
+"""
+
+import time
+from functools import lru_cache
+
+import streamlit as st
+
+from . import log_grid
+from .config import REFERENCE_CARDS, RULE_LABEL
+from .perf import timed
+from .render import FEEDBACK_HTML, card_svg, target_card_html
+from .replay import get_replay
+from .store import get_store
+
+SPEEDS = {"0.5倍": 2.0, "1倍": 1.0, "2倍": 0.5, "4倍": 0.25}   # 1 試行あたりの秒数
+
+@lru_cache(maxsize=4096)
+def _frame_html(trial, target, feedback, rule, categories, streak, chosen_index, correct, error_type):
+    refs = []
+    for i, card in enumerate(REFERENCE_CARDS):
+        if i == chosen_index:
+            border = "#22c55e" if correct else "#ef4444"
+            style = f"border:4px solid {border}; box-shadow:0 0 12px {border};"
+        else:
+            style = "border:2px solid #334155;"
+        refs.append(f'<div style="flex:1; height:110px; background:#f8fafc; border-radius:10px; {style} '
+                    f'display:flex; justify-content:center; align-items:center;">{card_svg(card)}</div>')
+    result = "✅ 正解" if correct else f"❌ 不正解（{error_type}）"
+    return (
+        FEEDBACK_HTML.get(feedback, FEEDBACK_HTML[None])
+        + f'<div style="display:flex; gap:8px; margin-bottom:12px;">{"".join(refs)}</div>'
+        + f'<div style="width:40%; margin:0 auto 10px;">{target_card_html(dict(target), trial)}</div>'
+        + f'<p style="text-align:center; color:#94a3b8; margin:0;">{trial}試行目　正解ルール：<b>{RULE_LABEL[rule]}</b>'
+        + f'　達成カテゴリー：{categories}　連続正解：{streak}　→ {result}</p>'
+    )
+
+def frame_html(frame):
+    return _frame_html(frame["trial"], tuple(frame["target"].items()), frame["feedback"], frame["rule"],
+                       frame["categories"], frame["streak"], frame["chosen_index"], frame["correct"],
+                       frame["error_type"])
+
+def _pick_session(store):
+    sessions = store.recent_sessions()
+    if not sessions:
+        st.info("保存済みのセッションはありません。")
+        return None
+    # 選択肢は表示名で照合されるので、同じ日時・氏名のセッションが並んでも取り違えないよう ID の先頭を付ける
+    labels = {
+        s["session_id"]: f"{s['session_id'][:8]}　{time.strftime('%Y-%m-%d %H:%M', time.localtime(s['finished_at'])) if s['finished_at'] else '日時不明'}"
+                         f"　{s['patient_name'] or '（氏名なし）'}　{s['total_trials']}試行"
+        for s in sessions
+    }
+    return st.selectbox("セッション", list(labels), format_func=labels.__getitem__, key="replay_pick")
+
+def _player(replay):
+    # 再生中は speed に応じた間隔でこの枠だけを再実行して 1 試行ずつ進める
+    n = len(replay)
+    ss = st.session_state
+    ss.setdefault("replay_trial", 1)
+    ss.setdefault("replay_playing", False)
+    interval = SPEEDS[ss.get("replay_speed", "1倍")]
+
+    if ss["replay_playing"]:
+        now = time.monotonic()
+        # 操作による再実行では進めない（前回進めてから interval 経っていれば進める）
+        if now - ss.get("replay_advanced_at", 0) >= interval * 0.9:
+            ss["replay_advanced_at"] = now
+            if ss["replay_trial"] < n:
+                ss["replay_trial"] += 1
+            else:
+                ss["replay_playing"] = False
+
+    # 再生・停止・速さの切り替えは run_every を変えるので、フラグメントの外から作り直す
+    if ss.get("replay_ticking") != (ss["replay_playing"], interval):
+        st.rerun()
+
+    ss["replay_trial"] = min(max(ss["replay_trial"], 1), n)
+    if n > 1:
+        st.slider("試行", 1, n, key="replay_trial")
+    col_prev, col_play, col_next, col_speed = st.columns([1, 1, 1, 2])
+    col_prev.button("◀ 前", use_container_width=True, disabled=ss["replay_trial"] <= 1,
+                    on_click=lambda: ss.update(replay_trial=ss["replay_trial"] - 1))
+    col_play.button("⏸ 停止" if ss["replay_playing"] else "▶ 再生", use_container_width=True,
+                    on_click=lambda: ss.update(replay_playing=not ss["replay_playing"], replay_advanced_at=time.monotonic()))
+    col_next.button("次 ▶", use_container_width=True, disabled=ss["replay_trial"] >= n,
+                    on_click=lambda: ss.update(replay_trial=ss["replay_trial"] + 1))
+    col_speed.selectbox("速さ", list(SPEEDS), index=1, key="replay_speed", label_visibility="collapsed")
+
+    st.markdown(frame_html(replay.frame(ss["replay_trial"])), unsafe_allow_html=True)
+
+@timed("replay.render")
+def show_replay(session_id=None):
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>🎞️ セッション再生</h2>""", unsafe_allow_html=True)
+
+    store = get_store(st.session_state.get("tenant"))
+    session_id = session_id or _pick_session(store)
+    if session_id is None:
+        return
+    if st.session_state.get("replay_session") != session_id:
+        st.session_state["replay_session"] = session_id
+        st.session_state["replay_trial"] = 1
+        st.session_state["replay_playing"] = False
+
+    replay = get_replay(session_id, store)
+    if replay is None:
+        st.error("このセッションの記録が見つかりません。")
+        return
+    if replay.mismatches:
+        st.warning(f"記録と再採点が一致しない試行があります：{replay.mismatches[:10]}")
+
+    playing = st.session_state.get("replay_playing", False)
+    interval = SPEEDS[st.session_state.get("replay_speed", "1倍")]
+    st.session_state["replay_ticking"] = (playing, interval)
+    st.fragment(_player, run_every=interval if playing else None)(replay)
+
+    with st.expander("試行ログ"):
+        log_grid.show_log_grid(log_grid.StoreSource(store, [session_id]), key="replay_grid")
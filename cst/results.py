@@ -0,0 +1,133 @@
+"""
+結果レポート画面
+"""
+
+import streamlit as st
+
+from . import artifacts, engine, log_grid, pipeline
+from .charts import accuracy_timeline_svg, error_donut_svg, error_pie_figure
+from .config import resolve_chart_mode
+from .engine import reset_test
+from .perf import timed
+
+# 同じ内訳のグラフは作り直さない
+@st.cache_data(max_entries=256, show_spinner=False)
+def _error_pie(error_counts_items):
+    return error_pie_figure(dict(error_counts_items))
+
+DOWNLOADS = [
+    # (成果物名, ラベル, 拡張子, MIME)
+    (artifacts.CSV_NAME,  "📥 結果をCSVでダウンロード",  "csv",  "text/csv"),
+    (artifacts.PDF_NAME,  "📄 PDFレポート",             "pdf",  "application/pdf"),
+    (artifacts.PNG_NAME,  "🖼️ グラフ画像（PNG）",        "png",  "image/png"),
+    (artifacts.JSON_NAME, "🗂️ JSON",                    "json", "application/json"),
+]
+
+def _artifacts_pending(session_id):
+    job = pipeline.job_status(session_id).get("artifacts")
+    return job is not None and job["state"] in ("pending", "running")
+
+def _show_downloads(session_id, logs, meta, patient):
+    cache = artifacts.get_cache(st.session_state.get("tenant"))
+    files = cache.get_all(session_id)
+    if not files:
+        # ジョブが失敗した・キャッシュから追い出された場合はここで作る
+        _, files = artifacts.ensure_artifacts(logs, meta, cache)
+
+    dl_cols = st.columns(len(DOWNLOADS))
+    for col, (name, label, ext, mime) in zip(dl_cols, DOWNLOADS):
+        if name not in files:                       # 任意依存が無い環境では PDF/PNG を出さない
+            continue
+        # secondary ボタンは入力方式の CSS で隠される・変形されるため primary で統一
+        col.download_button(
+            label=label,
+            data=files[name],
+            file_name=f"cst_result_{patient or 'patient'}.{ext}",
+            mime=mime,
+            type="primary",
+            key=f"dl_{ext}",
+        )
+
+@st.fragment(run_every=0.5)
+def _downloads_when_ready(session_id, logs, meta, patient):
+    if _artifacts_pending(session_id):
+        st.info("⏳ レポート（CSV・PDF）を作成しています…")
+        return
+    # 完了したら全体を再実行し、定期実行しない通常表示に切り替える
+    st.rerun()
+
+@timed("results.render")
+def show_results(chart_mode=None):
+    chart_mode = chart_mode or resolve_chart_mode(st.query_params.get("charts"))
+    logs = st.session_state["logs"]
+
+    st.markdown("""<h2 style='color:#60a5fa; font-family:"BIZ UDPGothic",sans-serif; margin-bottom:0;'>📊 テスト結果レポート</h2>""", unsafe_allow_html=True)
+
+    p = st.session_state.get("patient_name", "")
+    e = st.session_state.get("examiner_name", "")
+    if p or e:
+        st.markdown(f"**患者名：** {p}　　**検査者：** {e}")
+
+    meta = artifacts.session_meta(st.session_state)
+    # 集計は on_card_selected で試行ごとに更新済み（全ログの再集計はしない）
+    summary = st.session_state.get("metrics") or engine.summarize(logs, meta["categories"])
+    session_id = st.session_state.get("session_id") or pipeline.enqueue_finished_session(st.session_state)
+
+    total_trials    = summary["total_trials"]
+    total_correct   = summary["total_correct"]
+    total_errors    = summary["total_errors"]
+    categories      = summary["categories"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("総試行数", total_trials)
+    col2.metric("達成カテゴリー", categories)
+    col3.metric("総正解数", total_correct)
+    col4.metric("総エラー数", total_errors)
+
+    st.markdown("---")
+
+    counts = summary["error_counts"]
+
+    col_left, col_right = st.columns(2)
+
+    with col_left:
+        st.subheader("エラー種別の内訳")
+        if chart_mode == "plotly":
+            st.plotly_chart(_error_pie(tuple(counts.items())), use_container_width=True)
+        else:
+            st.markdown(error_donut_svg(counts), unsafe_allow_html=True)
+
+    with col_right:
+        st.subheader("エラーの臨床的解釈")
+        milner_n  = counts.get("ミルナー型保続", 0)
+        nelson_n  = counts.get("ネルソン型保続", 0)
+        ftm_n     = counts.get("セット維持困難", 0)
+        other_n   = counts.get("非保続性エラー", 0)
+
+        st.markdown(f"""
+| エラー種別 | 回数 | 解釈 |
+|---|---|---|
+| 🔴 ミルナー型保続 | {milner_n}回 | 過去の成功体験からの切り替え困難 |
+| 🟠 ネルソン型保続 | {nelson_n}回 | 直前の自分の行動パターンからの脱却困難 |
+| 🟡 セット維持困難 | {ftm_n}回 | 注意維持困難・ルール保持の不安定さ |
+| ⬜ 非保続性エラー | {other_n}回 | 注意逸脱・ワーキングメモリ低下の疑い |
+        """)
+
+    st.subheader("試行ごとの正誤")
+    st.markdown(accuracy_timeline_svg(logs, final_categories=categories), unsafe_allow_html=True)
+
+    st.markdown("---")
+
+    st.subheader("全試行の詳細ログ")
+    # ブラウザへは表示中のページだけを送る（絞り込み・並べ替えはサーバー側）
+    log_grid.show_log_grid(log_grid.MemorySource(logs), key="results_grid")
+
+    # 成果物はバックグラウンドで作られる。できるまでこの枠だけを定期的に再実行する
+    if _artifacts_pending(session_id):
+        _downloads_when_ready(session_id, logs, meta, p)
+    else:
+        _show_downloads(session_id, logs, meta, p)
+
+    st.markdown("---")
+    st.button("🔄 テストをリセットして最初から", type="primary",
+              use_container_width=True, on_click=reset_test, args=(st.session_state,))
@@ -0,0 +1,149 @@
+"""
+永続ストア（SQLite）
+終了したセッションのメタ情報と全試行ログを保存する。スレッドごとに接続を持ち、WAL で読み書きを並行させる。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from .config import DATA_DIR, DEFAULT_TENANT, tenant_data_dir
+from .engine import LOG_COLUMNS
+
+STORE_PATH = os.environ.get("CST_STORE_PATH", os.path.join(DATA_DIR, "cst.sqlite3"))
+
+TRIAL_COLUMNS = list(LOG_COLUMNS.values())
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id     TEXT PRIMARY KEY,
+    patient_name   TEXT NOT NULL DEFAULT '',
+    examiner_name  TEXT NOT NULL DEFAULT '',
+    started_at     REAL,
+    finished_at    REAL,
+    total_trials   INTEGER NOT NULL,
+    categories     INTEGER NOT NULL,
+    meta_json      TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE TABLE IF NOT EXISTS trials (
+    session_id        TEXT NOT NULL REFERENCES sessions(session_id),
+    {", ".join(f"{c} {'INTEGER' if c in ('trial', 'categories_before') else 'TEXT'} NOT NULL" for c in TRIAL_COLUMNS)},
+    started_at        REAL NOT NULL DEFAULT 0,       -- セッションの開始日時（不明は 0）。試行ログの表の並び順
+    PRIMARY KEY (session_id, trial)
+) WITHOUT ROWID;
+"""
+# 試行ログの表（log_grid.SORTS）の並べ替えごとの索引。どれも (並べ替えの列, 開始日時, セッション, 試行) の順で、
+# 同じ列で絞り込んだときも索引の順のまま引ける。正誤で絞ってほかの列で並べる表と、ルールと正誤の両方で
+# 絞る表は trials_by_correct_* で引く。それ以外の組み合わせ（ルールで絞ってエラー種別で並べるなど）は絞った行を並べ替える
+TRIAL_INDEXES = """
+CREATE INDEX IF NOT EXISTS trials_in_order              ON trials (started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_error_type         ON trials (error_type, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_rule               ON trials (rule, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_correct            ON trials (correct, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_categories         ON trials (categories_before, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_correct_error_type ON trials (correct, error_type, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_correct_rule       ON trials (correct, rule, started_at, session_id, trial);
+CREATE INDEX IF NOT EXISTS trials_by_correct_categories ON trials (correct, categories_before, started_at, session_id, trial);
+"""
+
+
+class Store:
+    def __init__(self, path=STORE_PATH, tenant=DEFAULT_TENANT):
+        self.path = path
+        self.tenant = tenant                         # 患者キーの鍵など、施設ごとの設定を引くため
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn.executescript(SCHEMA)
+        self._add_trial_started_at()
+        self.conn.executescript(TRIAL_INDEXES)
+
+    def _add_trial_started_at(self):
+        # 以前の trials には開始日時の列が無い。足して sessions から埋める（1 回だけ）
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(trials)")}
+        if "started_at" in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE trials ADD COLUMN started_at REAL NOT NULL DEFAULT 0")
+            self.conn.execute(
+                "UPDATE trials SET started_at = COALESCE("
+                "(SELECT s.started_at FROM sessions s WHERE s.session_id = trials.session_id), 0)")
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ── 書き込み ──
+    def save_session(self, session_id, meta, logs):
+        self.save_sessions([(session_id, meta, logs)])
+
+    def save_sessions(self, sessions):
+        # sessions: [(session_id, meta, logs), ...] を 1 トランザクションで保存。
+        # 同じ session_id は上書きしない（再実行しても結果が変わらない）
+        with self.conn:
+            self.insert_sessions(sessions)
+
+    def insert_sessions(self, sessions):
+        # save_sessions の中身。確定しないので、他の表と同じトランザクションに入れるときは
+        # 呼び出し側が with store.conn: で囲む
+        placeholders = ", ".join("?" for _ in range(len(TRIAL_COLUMNS) + 2))
+        for session_id, meta, logs in sessions:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, patient_name, examiner_name, "
+                "started_at, finished_at, total_trials, categories, meta_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, meta.get("patient_name", ""), meta.get("examiner_name", ""),
+                 meta.get("started_at"), meta.get("finished_at"), len(logs),
+                 meta.get("categories", 0), json.dumps(meta, ensure_ascii=False)),
+            )
+            if cur.rowcount == 0:
+                continue
+            started_at = meta.get("started_at") or 0
+            self.conn.executemany(
+                f"INSERT INTO trials (session_id, {', '.join(TRIAL_COLUMNS)}, started_at) VALUES ({placeholders})",
+                [(session_id, *(entry[k] for k in LOG_COLUMNS), started_at) for entry in logs],
+            )
+
+    # ── 読み出し ──
+    def has_session(self, session_id):
+        row = self.conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None
+
+    def get_session(self, session_id):
+        row = self.conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent_sessions(self, limit=50):
+        rows = self.conn.execute(
+            "SELECT session_id, patient_name, finished_at, total_trials, categories FROM sessions "
+            "ORDER BY finished_at DESC LIMIT ?", (limit,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_logs(self, session_id):
+        # 保存用の列名から score_selection と同じ日本語キーの dict に戻す
+        rows = self.conn.execute(
+            f"SELECT {', '.join(TRIAL_COLUMNS)} FROM trials WHERE session_id = ? ORDER BY trial",
+            (session_id,),
+        ).fetchall()
+        return [{jp: row[col] for jp, col in LOG_COLUMNS.items()} for row in rows]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(tenant=None):
+    # テナントごとに別の DB（default は従来の STORE_PATH）
+    tenant = tenant or DEFAULT_TENANT
+    with _stores_lock:
+        if tenant not in _stores:
+            path = STORE_PATH if tenant == DEFAULT_TENANT else os.path.join(tenant_data_dir(tenant), "cst.sqlite3")
+            _stores[tenant] = Store(path, tenant)
+        return _stores[tenant]
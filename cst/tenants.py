@@ -0,0 +1,192 @@
+"""
+マルチテナント（施設ごとの分離と上限）
+1 つのデプロイで複数の施設を受け持つ。施設は次のどれかで決まる。
+- ?tenant=<トークン>
+- リバースプロキシが付けるヘッダ X-CST-Tenant-Token（/clinic-a/ などパスごとにトークンを付ける）
+- ?from=<値>（"from" を設定した施設。既定の default テナントは従来の ?from=blog）
+患者側のトークンとは別に、検査者用の画面（ライブモニターなど）を開く合言葉を examiner_tokens に持つ
+（default テナントは CST_EXAMINER_TOKEN でもよい）。検査者の合言葉は URL に載せずフォームで入力する（examiner.py）。
+
+施設ごとに保存先（config.tenant_data_dir）を分け、同時に実施できる検査数（max_concurrent）と
+再実行・タップの頻度（rate_per_minute・burst）に上限を設けて、混んでいる施設が他の施設を遅くしないようにする。
+頻度の上限は待たずに判定する（スクリプトのスレッドを止めない）。上限を超えたときは新しい検査の開始と
+検査中以外の再実行を断り（利用者が少し後に再読み込みする）、検査中のタップは待たせも落としもしない（数えるだけ）。
+カード SVG・CSS・プロトコル表は施設に依存しないので、プロセスに 1 つだけ持って共有する（render.warm_assets）。
+
+tenants.json の例：
+    {
+      "default":  {"from": "blog"},
+      "clinic-a": {"name": "A病院", "tokens": ["..."], "examiner_tokens": ["..."],
+                   "max_concurrent": 20, "rate_per_minute": 1200},
+      "clinic-b": {"name": "Bクリニック", "tokens": ["..."], "max_concurrent": 5, "rate_per_minute": 300}
+    }
+"""
+
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from .config import DEFAULT_TENANT, EXAMINER_TOKEN, TENANTS_FILE
+
+TOKEN_HEADER = "X-CST-Tenant-Token"
+SLOT_IDLE_TTL = 30 * 60                              # 操作の止まった検査の枠を空けるまでの秒数
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    name: str = ""
+    tokens: tuple = ()
+    from_value: str = None                           # ?from= で入れる場合の値
+    max_concurrent: int = 0                          # 0 は無制限
+    rate_per_minute: int = 0                         # 0 は無制限
+    burst: int = 30
+    examiner_tokens: tuple = ()                      # 検査者用の画面の合言葉
+
+
+def _examiner_tokens(tenant_id, conf):
+    tokens = tuple(conf.get("examiner_tokens") or ())
+    if not tokens and tenant_id == DEFAULT_TENANT and EXAMINER_TOKEN:
+        tokens = (EXAMINER_TOKEN,)
+    return tokens
+
+
+def load_tenants(path=TENANTS_FILE):
+    if not os.path.exists(path):
+        return {DEFAULT_TENANT: Tenant(DEFAULT_TENANT, from_value="blog",
+                                       examiner_tokens=_examiner_tokens(DEFAULT_TENANT, {}))}
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    tenants = {}
+    for tenant_id, conf in raw.items():
+        if not _TENANT_ID.match(tenant_id):
+            raise ValueError(f"invalid tenant id: {tenant_id!r}")
+        tokens = conf.get("tokens") or ([conf["token"]] if conf.get("token") else [])
+        tenants[tenant_id] = Tenant(
+            id=tenant_id,
+            name=conf.get("name", ""),
+            tokens=tuple(tokens),
+            from_value=conf.get("from"),
+            max_concurrent=int(conf.get("max_concurrent", 0)),
+            rate_per_minute=int(conf.get("rate_per_minute", 0)),
+            burst=int(conf.get("burst", 30)),
+            examiner_tokens=_examiner_tokens(tenant_id, conf),
+        )
+    return tenants
+
+
+_tenants = None
+_tenants_lock = threading.Lock()
+
+def get_tenants():
+    global _tenants
+    with _tenants_lock:
+        if _tenants is None:
+            _tenants = load_tenants()
+    return _tenants
+
+# ─────────────────────────────────────────
+# 施設の特定
+# ─────────────────────────────────────────
+def _by_token(token):
+    if not token:
+        return None
+    for tenant in get_tenants().values():
+        if any(hmac.compare_digest(token, t) for t in tenant.tokens):
+            return tenant
+    return None
+
+def resolve(query_token=None, header_token=None, from_value=None):
+    # 戻り値：(Tenant, 使ったトークン)。どれにも当たらなければ (None, None)
+    for token in (query_token, header_token):
+        tenant = _by_token(token)
+        if tenant is not None:
+            return tenant, token
+    if from_value:
+        for tenant in get_tenants().values():
+            if tenant.from_value == from_value:
+                return tenant, None
+    return None, None
+
+def is_examiner(tenant, secret):
+    # 検査者の合言葉が一致するか。合言葉の無い施設では常に False（検査者用の画面は開けない）
+    return bool(secret) and any(hmac.compare_digest(secret, t) for t in tenant.examiner_tokens)
+
+# ─────────────────────────────────────────
+# 同時実施数の上限
+# ─────────────────────────────────────────
+class SessionSlots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}                            # tenant_id -> {session_key: 最終操作時刻}
+
+    def acquire(self, tenant, session_key):
+        # 枠を取れたら True（すでに持っていれば時刻を更新して True）
+        now = time.time()
+        with self._lock:
+            active = self._active.setdefault(tenant.id, {})
+            for key in [k for k, t in active.items() if now - t > SLOT_IDLE_TTL]:
+                del active[key]
+            if session_key in active or not tenant.max_concurrent or len(active) < tenant.max_concurrent:
+                active[session_key] = now
+                return True
+            return False
+
+    def touch(self, tenant_id, session_key):
+        with self._lock:
+            active = self._active.get(tenant_id, {})
+            if session_key in active:
+                active[session_key] = time.time()
+
+    def release(self, tenant_id, session_key):
+        with self._lock:
+            self._active.get(tenant_id, {}).pop(session_key, None)
+
+    def usage(self, tenant_id):
+        with self._lock:
+            return len(self._active.get(tenant_id, {}))
+
+# ─────────────────────────────────────────
+# 再実行の頻度の上限（トークンバケット）
+# ─────────────────────────────────────────
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # 1 つ取れたら True。取れなければ待たずに False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+_slots = SessionSlots()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_slots():
+    return _slots
+
+def allow_rerun(tenant):
+    # 施設の頻度の上限の中なら True。待たないので、検査中のタップでは結果を見ずに呼んで数えるだけにする
+    if not tenant.rate_per_minute:
+        return True
+    with _buckets_lock:
+        bucket = _buckets.get(tenant.id)
+        if bucket is None:
+            bucket = _buckets[tenant.id] = TokenBucket(tenant.rate_per_minute, tenant.burst)
+    return bucket.acquire()
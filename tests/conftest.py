@@ -0,0 +1,37 @@
+import os
+import random
+import sys
+import tempfile
+
+# cst.config は読み込み時に CST_DATA_DIR を読むので、cst を import する前に一時ディレクトリへ向ける
+os.environ.setdefault("CST_DATA_DIR", tempfile.mkdtemp(prefix="cst-test-"))
+os.environ.setdefault("CST_PATIENT_KEY_SECRET", "test-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from cst import artifacts, engine  # noqa: E402
+from cst.store import Store  # noqa: E402
+
+
+def finished_state(seed=0, patient_name=""):
+    # 決まった乱数で最後まで進めた検査
+    rng = random.Random(seed)
+    state = engine.default_state()
+    state["patient_name"] = patient_name
+    engine.start_test(state)
+    while not state["finished"]:
+        engine.score_selection(state, rng.randrange(4))
+    return state
+
+
+def make_session(seed=0, patient_name=""):
+    # (session_id, meta, logs)
+    state = finished_state(seed, patient_name)
+    meta = artifacts.session_meta(state)
+    return artifacts.session_hash(state["logs"], meta), meta, state["logs"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return Store(str(tmp_path / "cst.sqlite3"))
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from cst import archive
+
+from conftest import finished_state, make_session
+
+
+def test_round_trip(tmp_path):
+    state = finished_state(seed=7)
+    records = archive.encode_logs(state["logs"], times=state["trial_times"], started_at=state["started_at"])
+    assert records.dtype.itemsize == 16
+    assert archive.decode_records(records) == state["logs"]
+
+    arc = archive.Archive(str(tmp_path))
+    assert arc.append_session("s1", state["logs"], state["trial_times"], state["started_at"])
+    assert not arc.append_session("s1", state["logs"])
+    assert arc.load_logs("s1") == state["logs"]
+    assert np.allclose(arc.load_times("s1"), state["trial_times"], atol=1e-3)
+    assert archive.scan(arc)["trials"] == len(state["logs"])
+
+
+def test_two_writers_share_session_numbers(tmp_path):
+    # 別プロセスの書き込みを、同じディレクトリの別の Archive で模す
+    a, b = archive.Archive(str(tmp_path)), archive.Archive(str(tmp_path))
+    sid_a, _, logs_a = make_session(1)
+    sid_b, _, logs_b = make_session(2)
+    assert a.has_session(sid_a) is False
+    assert a.append_session(sid_a, logs_a)
+    assert b.append_session(sid_b, logs_b)
+    assert not b.append_session(sid_a, logs_a)       # a が書いた分も見えている
+    assert b.session_nos() == {sid_a: 0, sid_b: 1}
+    assert a.load_logs(sid_b) == logs_b
+    assert list(a.session(sid_b)["session"]) == [1] * len(logs_b)
+
+
+def test_crashed_append_is_truncated_before_next_write(tmp_path):
+    arc = archive.Archive(str(tmp_path))
+    sid, _, logs = make_session(3)
+    arc.append_session(sid, logs)
+    segment = arc.segment_paths()[-1]
+    with open(segment, "ab") as f:                   # レコードだけ書いて索引の前に落ちた
+        f.write(b"\x01" * 16 * 5)
+    with open(os.path.join(str(tmp_path), "sessions.idx"), "ab") as f:
+        f.write(b"\x02" * 10)                        # 索引の行の途中で落ちた
+
+    other = archive.Archive(str(tmp_path))
+    sid2, _, logs2 = make_session(4)
+    assert other.append_session(sid2, logs2)
+    assert other.load_logs(sid) == logs and other.load_logs(sid2) == logs2
+    assert archive.scan(other)["trials"] == len(logs) + len(logs2)
+
+
+def test_append_waits_for_the_file_lock(tmp_path):
+    arc = archive.Archive(str(tmp_path))
+    sid, _, logs = make_session(5)
+    done = threading.Event()
+    with archive.Archive(str(tmp_path)).locked():
+        thread = threading.Thread(target=lambda: (arc.append_session(sid, logs), done.set()))
+        thread.start()
+        time.sleep(0.2)
+        assert not done.is_set()
+    thread.join(5)
+    assert done.is_set() and arc.has_session(sid)
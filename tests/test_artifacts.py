@@ -0,0 +1,50 @@
+import os
+
+from cst import artifacts
+from cst.cache import ArtifactCache
+
+from conftest import make_session
+
+
+def test_ensure_artifacts_builds_once_per_session(tmp_path, monkeypatch):
+    _, meta, logs = make_session(1)
+    cache = ArtifactCache(str(tmp_path), 10 * 2**20)
+    key, first = artifacts.ensure_artifacts(logs, meta, cache)
+    assert key == artifacts.session_hash(logs, meta)
+    assert {artifacts.CSV_NAME, artifacts.JSON_NAME, artifacts.PDF_NAME} <= set(first)
+    assert first[artifacts.PDF_NAME].startswith(b"%PDF")
+
+    # 同じハッシュなら生成しない（再起動して開き直したキャッシュでも）
+    def build(*_):
+        raise AssertionError("キャッシュにあるのに生成した")
+    monkeypatch.setattr(artifacts, "build_artifacts", build)
+    for reopened in (cache, ArtifactCache(str(tmp_path), 10 * 2**20)):
+        assert artifacts.ensure_artifacts(logs, meta, reopened) == (key, first)
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 2**20)
+    cache.put("ab12", {"report.csv": b"a,b\n1,2\n", "chart.png": b"\x89PNG"})
+    assert cache.has("ab12") and not cache.has("cd34")
+    assert cache.get("ab12", "report.csv") == b"a,b\n1,2\n"
+    assert cache.get("ab12", "report.pdf") is None
+    assert cache.get_all("ab12") == {"report.csv": b"a,b\n1,2\n", "chart.png": b"\x89PNG"}
+    assert cache.get_all("cd34") is None
+    assert ArtifactCache(str(tmp_path), 2**20).total_bytes() == cache.total_bytes() > 0
+
+
+def test_cache_evicts_least_recently_used_over_budget(tmp_path):
+    # 圧縮が効かない 1000 バイトずつ。上限 2500 バイトなら 2 件まで残る
+    cache = ArtifactCache(str(tmp_path), 2500)
+    blob = {name: os.urandom(1000) for name in ("a", "b", "c")}
+    cache.put("aa01", {"x": blob["a"]})
+    cache.put("bb02", {"x": blob["b"]})
+    os.utime(cache._entry_dir("aa01"), (1, 1))
+    os.utime(cache._entry_dir("bb02"), (2, 2))
+    assert cache.get("aa01", "x") == blob["a"]        # 読んだ aa01 が新しくなる
+
+    cache.put("cc03", {"x": blob["c"]})
+    assert cache.has("aa01") and cache.has("cc03") and not cache.has("bb02")
+    assert not os.path.exists(cache._entry_dir("bb02"))
+    assert cache.total_bytes() <= 2500
+    assert cache.get("cc03", "x") == blob["c"]
@@ -0,0 +1,36 @@
+from cst import engine
+
+from conftest import finished_state
+
+
+def test_rescore_reproduces_recorded_session():
+    state = finished_state(seed=3)
+    replayed, mismatches = engine.rescore(state["logs"])
+    assert mismatches == []
+    assert replayed["categories_achieved"] == state["categories_achieved"]
+
+
+def test_rescore_reports_tampered_trial():
+    logs = [dict(entry) for entry in finished_state(seed=4)["logs"]]
+    logs[5]["正誤"] = "×" if logs[5]["正誤"] == "○" else "○"
+    _, mismatches = engine.rescore(logs)
+    assert mismatches[0] == 6
+
+
+def test_rescore_reports_unknown_choice():
+    logs = [dict(entry) for entry in finished_state(seed=5)["logs"]]
+    logs[0]["選択_色"] = "紫"
+    _, mismatches = engine.rescore(logs)
+    assert 1 in mismatches
+
+
+def test_finished_session_logs_every_trial_in_order():
+    state = finished_state(seed=6)
+    assert [entry["試行"] for entry in state["logs"]] == list(range(1, len(state["logs"]) + 1))
+    assert len(state["logs"]) <= engine.MAX_TRIALS
+    assert list(state["logs"][0]) == list(engine.LOG_COLUMNS)
+
+
+def test_running_metrics_match_full_summary():
+    state = finished_state(seed=7)
+    assert state["metrics"] == engine.summarize(state["logs"], state["categories_achieved"])
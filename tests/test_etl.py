@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from cst import etl
+
+from conftest import make_session
+
+
+def _add(store, seeds, patient_name=""):
+    store.save_sessions([make_session(s, patient_name) for s in seeds])
+
+
+def _rows(analytics, kind):
+    return len(analytics.read(kind, columns=["session_id"]))
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    return etl.Analytics(str(tmp_path / "analytics"))
+
+
+def test_second_run_reads_only_new_sessions(store, analytics):
+    _add(store, range(3))
+    first = etl.run(analytics, store, batch=2)
+    assert (first["sessions"], first["batches"], first["watermark"]) == (3, 2, 3)
+
+    _add(store, range(3, 5))
+    second = etl.run(analytics, store, batch=2)
+    assert (second["sessions"], second["watermark"]) == (2, 5)
+    assert _rows(analytics, "sessions") == 5
+    assert _rows(analytics, "trials") == store.conn.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+
+
+def test_rerun_without_new_sessions_changes_nothing(store, analytics):
+    _add(store, range(3))
+    etl.run(analytics, store)
+    before = analytics.manifest()
+    again = etl.run(analytics, store)
+    assert again["sessions"] == 0 and again["batches"] == 0
+    assert analytics.manifest() == before
+    assert _rows(analytics, "sessions") == 3
+
+
+def test_crash_before_commit_leaves_orphans_that_are_removed(store, analytics, monkeypatch):
+    _add(store, range(2))
+    etl.run(analytics, store)
+    _add(store, range(2, 4))
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(analytics, "commit", crash)
+    with pytest.raises(OSError):
+        etl.run(analytics, store)
+    monkeypatch.undo()
+    assert analytics.watermark("store") == 2
+
+    listed = set(analytics.manifest()["files"])
+    on_disk = {os.path.relpath(os.path.join(d, n), analytics.root).replace(os.sep, "/")
+               for kind in etl.SCHEMAS for d, _, names in os.walk(os.path.join(analytics.root, kind)) for n in names}
+    assert on_disk - listed                          # 確定前のファイルが残っている
+
+    result = etl.run(analytics, store)
+    assert result["orphans_removed"] == len(on_disk - listed)
+    assert result["sessions"] == 2 and analytics.watermark("store") == 4
+    assert _rows(analytics, "sessions") == 4
+
+
+def test_manifest_lists_files_and_runs(store, analytics):
+    _add(store, range(3), patient_name="山田 太郎")
+    etl.run(analytics, store, batch=1)
+    manifest = analytics.manifest()
+    for rel, info in manifest["files"].items():
+        assert os.path.getsize(os.path.join(analytics.root, rel)) == info["bytes"]
+    assert manifest["runs"][-1]["sessions"] == 3
+    keys = analytics.read("sessions", columns=["patient_key"])["patient_key"]
+    assert keys.nunique() == 1 and "山田" not in keys.iloc[0]
+
+
+def test_compact_keeps_rows(store, analytics):
+    _add(store, range(4))
+    etl.run(analytics, store, batch=1)
+    with analytics.locked():
+        assert analytics.compact(min_files=2) > 0
+    assert all("compact-" in rel for rel in analytics.files("trials"))
+    assert _rows(analytics, "sessions") == 4
+    assert _rows(analytics, "trials") == store.conn.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from cst import importer, registry
+from cst.artifacts import build_csv
+
+from conftest import finished_state
+
+
+def write_files(root, n):
+    os.makedirs(root, exist_ok=True)
+    for i in range(n):
+        with open(os.path.join(root, f"cst_result_患者{i}.csv"), "wb") as f:
+            f.write(build_csv(finished_state(seed=i)["logs"]))
+
+
+def count(store, table):
+    return store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_rerun_is_idempotent(tmp_path, store):
+    write_files(tmp_path / "csv", 3)
+    first = importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert first["imported"] == 3
+    assert count(store, "sessions") == 3 and count(store, "session_summaries") == 3
+
+    again = importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert again["skipped"] == 3 and again["imported"] == 0
+    assert count(store, "sessions") == 3
+
+
+def test_redownloaded_copy_is_duplicate(tmp_path, store):
+    write_files(tmp_path / "csv", 1)
+    src = tmp_path / "csv" / "cst_result_患者0.csv"
+    (tmp_path / "csv" / "cst_result_患者0 (1).csv").write_bytes(src.read_bytes())
+    stats = importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert stats["imported"] == 1 and stats["duplicate"] == 1
+    assert count(store, "sessions") == 1
+
+
+def test_invalid_file_is_recorded_not_imported(tmp_path, store):
+    write_files(tmp_path / "csv", 1)
+    (tmp_path / "csv" / "cst_result_broken.csv").write_bytes("試行\n1\n".encode("utf-8-sig"))
+    stats = importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert stats["imported"] == 1 and stats["invalid"] == 1
+    assert count(store, "sessions") == 1
+
+
+def test_failed_save_leaves_no_bookkeeping(tmp_path, store, monkeypatch):
+    # 集計行の保存が失敗したら、取り込み済みの記録も残さず、次の実行で取り込み直せること
+    write_files(tmp_path / "csv", 3)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(registry, "insert_summaries", fail)
+    with pytest.raises(RuntimeError):
+        importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert count(store, "sessions") == 0
+    assert count(store, "import_seen") == 0 and count(store, "import_files") == 0
+
+    monkeypatch.undo()
+    stats = importer.Importer(store, workers=1).run([str(tmp_path / "csv")])
+    assert stats == {"scanned": 3, "skipped": 0, "imported": 3, "duplicate": 0, "invalid": 0}
+    assert count(store, "sessions") == 3 and count(store, "session_summaries") == 3
+
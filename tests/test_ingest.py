@@ -0,0 +1,154 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from cst import ingest, registry
+from cst.store import get_store
+
+from conftest import make_session
+
+
+def line(meta, logs, **kwargs):
+    return json.dumps({"meta": meta, "logs": logs}, ensure_ascii=False, **kwargs)
+
+
+def test_key_order_does_not_matter():
+    _, meta, logs = make_session(1, "順番")
+    plain, _ = ingest.process_batch(gzip.compress(line(meta, logs).encode()), "gzip")
+    shuffled, rejected = ingest.process_batch(gzip.compress(line(meta, logs, sort_keys=True).encode()), "gzip")
+    assert rejected == []
+    assert [s[0] for s in shuffled] == [s[0] for s in plain]
+    assert list(shuffled[0][2][0]) == list(logs[0])
+
+
+def test_missing_or_extra_columns_are_rejected():
+    _, meta, logs = make_session(2)
+    missing = [dict(entry) for entry in logs]
+    del missing[0]["正誤"]
+    extra = [dict(entry, 備考="") for entry in logs]
+    body = "\n".join([line(meta, missing), line(meta, extra)]).encode()
+    sessions, rejected = ingest.process_batch(body)
+    assert sessions == [] and [r["line"] for r in rejected] == [1, 2]
+
+
+def test_multi_member_gzip_is_read_to_the_end():
+    members = [gzip.compress(line(*make_session(seed)[1:]).encode() + b"\n") for seed in range(3)]
+    sessions, rejected = ingest.process_batch(b"".join(members), "gzip")
+    assert rejected == [] and len(sessions) == 3
+
+
+def test_decompression_limit_covers_all_members(monkeypatch):
+    member = gzip.compress(b"x" * 1000)
+    monkeypatch.setattr(ingest, "MAX_DECOMPRESSED", 1500)
+    assert ingest._decompress(member, "gzip") == b"x" * 1000
+    with pytest.raises(ingest.InvalidFile):
+        ingest._decompress(member + member, "gzip")
+    with pytest.raises(ingest.InvalidFile):
+        ingest._decompress(member[:-4], "gzip")
+
+
+def _write(tenant_id, batches):
+    async def run():
+        writer = ingest.Writer()
+        task = asyncio.create_task(writer.run())
+        futures = [writer.try_submit(tenant_id, sessions) for sessions in batches]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        task.cancel()
+        return writer, results
+    return asyncio.run(run())
+
+
+def _accepted(seeds):
+    body = "\n".join(line(*make_session(seed, f"患者{seed}")[1:]) for seed in seeds).encode()
+    sessions, rejected = ingest.process_batch(body)
+    assert rejected == []
+    return sessions
+
+
+def test_writer_batches_requests_into_one_transaction():
+    first = _accepted([10, 11])
+    writer, results = _write("writer-batch", [first, _accepted([12]), first[:1]])   # 最後は同じ本文の再送
+    assert results == [None, None, None]
+    assert writer.stats["transactions"] == 1
+    store = get_store("writer-batch")
+    assert store.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 3
+    assert store.conn.execute("SELECT COUNT(*) FROM session_summaries").fetchone()[0] == 3
+
+
+def test_writer_failure_stores_nothing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(registry, "insert_summaries", fail)
+    writer, results = _write("writer-fail", [_accepted([20, 21])])
+    assert isinstance(results[0], RuntimeError) and writer.queued == 0
+    store = get_store("writer-fail")
+    assert store.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+
+def test_metrics_requires_token(monkeypatch):
+    server = ingest.IngestServer(workers=1)
+    dispatch = lambda headers: asyncio.run(server._dispatch("GET", "/metrics", headers, None))[0]  # noqa: E731
+    assert dispatch({}) == 401
+    monkeypatch.setattr(ingest, "METRICS_TOKEN", "ops")
+    assert dispatch({"authorization": "Bearer nope"}) == 401
+    assert dispatch({"authorization": "Bearer ops"}) == 200
+
+
+def test_writer_answers_each_tenant_after_its_own_commit(monkeypatch):
+    save = registry.save_sessions
+    seen = {}
+
+    def save_sessions(sessions, store):
+        if store.tenant == "writer-bad":
+            seen["good_done_before_bad"] = futures[0].done()
+            raise RuntimeError("disk full")
+        return save(sessions, store)
+
+    async def run():
+        writer = ingest.Writer()
+        task = asyncio.create_task(writer.run())
+        futures[:] = [writer.try_submit("writer-good", _accepted([30])),
+                      writer.try_submit("writer-bad", _accepted([31])),
+                      writer.try_submit("writer-good", _accepted([32]))]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        task.cancel()
+        return writer, results
+
+    futures = []
+    monkeypatch.setattr(registry, "save_sessions", save_sessions)
+    writer, results = asyncio.run(run())
+    assert results[0] is None and results[2] is None and isinstance(results[1], RuntimeError)
+    assert seen == {"good_done_before_bad": True}
+    assert writer.queued == 0
+    assert get_store("writer-good").conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 2
+    assert get_store("writer-bad").conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+
+class _Transport:
+    def __init__(self):
+        self.sent, self.closed = b"", False
+
+    def write(self, data):
+        self.sent += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_body_cut_short_closes_quietly():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"POST /ingest HTTP/1.1\r\nContent-Length: 100\r\n\r\n" + b"x" * 10)
+        reader.feed_eof()
+        transport = _Transport()
+        await ingest.IngestServer(workers=1)._handle(reader, transport)
+        return transport
+
+    transport = asyncio.run(run())
+    assert transport.closed and transport.sent == b""
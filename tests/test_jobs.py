@@ -0,0 +1,78 @@
+import json
+import time
+
+from cst import jobs
+
+_ran = []
+
+@jobs.handler("test.record")
+def _record(payload):
+    _ran.append(payload["n"])
+    return payload["n"]
+
+
+def _wait(queue):
+    deadline = time.time() + 5
+    while queue.depth() and time.time() < deadline:
+        time.sleep(0.01)
+    assert queue.depth() == 0
+
+
+def _events(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["event"] for line in f]
+
+
+def test_job_journal_is_per_tenant(tmp_path):
+    queue = jobs.JobQueue(str(tmp_path), workers=1)
+    queue.enqueue("test.record", {"n": 1, "tenant": "clinic-a", "logs": ["患者の記録"]})
+    queue.enqueue("test.record", {"n": 2, "tenant": None})
+    _wait(queue)
+    assert _events(tmp_path / "tenants" / "clinic-a" / "jobs.jsonl") == ["enqueued", "done"]
+    default = (tmp_path / "jobs.jsonl").read_text(encoding="utf-8")
+    assert "clinic-a" not in default and "患者の記録" not in default
+
+
+def test_recovery_moves_legacy_jobs_to_their_tenant(tmp_path):
+    legacy = {"event": "enqueued", "id": "j1", "kind": "test.record", "group": "s1",
+              "payload": {"n": 42, "tenant": "clinic-b"}}
+    (tmp_path / "jobs.jsonl").write_text(json.dumps(legacy) + "\n", encoding="utf-8")
+    _ran.clear()
+    queue = jobs.JobQueue(str(tmp_path), workers=1)
+    _wait(queue)
+    assert _ran == [42]
+    assert (tmp_path / "jobs.jsonl").read_text(encoding="utf-8") == ""
+    assert _events(tmp_path / "tenants" / "clinic-b" / "jobs.jsonl") == ["enqueued", "done"]
+
+    # 完了済みなので次の起動では拾わない
+    _ran.clear()
+    _wait(jobs.JobQueue(str(tmp_path), workers=1))
+    assert _ran == []
+
+
+def test_metrics_count_per_tenant(tmp_path):
+    queue = jobs.JobQueue(str(tmp_path), workers=1)
+    queue.enqueue("test.record", {"n": 1, "tenant": "clinic-a"})
+    queue.enqueue("test.record", {"n": 2, "tenant": "clinic-a"})
+    queue.enqueue("test.record", {"n": 3, "tenant": None})
+    _wait(queue)
+    a = queue.metrics("clinic-a")
+    assert (a["enqueued"], a["done"], a["failed"], a["depth"]) == (2, 2, 0, 0)
+    assert queue.metrics("clinic-b")["enqueued"] == 0
+    assert queue.metrics()["enqueued"] == 3
+    assert a["latency"]["job.test.record.run"]["n"] >= 3
+
+
+def test_app_recovers_journal_on_first_rerun(monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    from cst.config import DATA_DIR
+    legacy = {"event": "enqueued", "id": "j-startup", "kind": "test.record", "group": "s1",
+              "payload": {"n": 7, "tenant": None}}
+    with open(f"{DATA_DIR}/jobs.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps(legacy) + "\n")
+    monkeypatch.setattr(jobs, "_queue", None)
+    _ran.clear()
+    AppTest.from_file("../app.py", default_timeout=30).run()   # ?from= なし（ブロック画面）でも作る
+    _wait(jobs.get_queue())
+    assert _ran == [7]
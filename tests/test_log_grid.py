@@ -0,0 +1,113 @@
+from cst import log_grid
+from cst.store import Store
+
+from conftest import make_session
+
+
+def _save(store, seed, started_at, session_id):
+    _, meta, logs = make_session(seed)
+    meta = {**meta, "started_at": started_at}
+    store.save_session(session_id, meta, logs)
+    return logs
+
+
+def test_trial_order_follows_start_time_not_hash(store):
+    # ハッシュの並び（c < b < a）と開始日時の並び（a < b < c）を逆にしておく
+    _save(store, 1, 100.0, "cccc")
+    _save(store, 2, 300.0, "aaaa")
+    _save(store, 3, 200.0, "bbbb")
+    source = log_grid.StoreSource(store)
+    rows, _ = source.page({}, "試行順", False, source.count({}))
+    sessions = list(dict.fromkeys(r["session_id"] for r in rows))
+    assert sessions == ["cccc", "bbbb", "aaaa"]
+    assert [r["試行"] for r in rows if r["session_id"] == "bbbb"] == sorted(
+        r["試行"] for r in rows if r["session_id"] == "bbbb")
+
+    newest = source.page({}, "試行順", True, 1)[0][0]
+    assert newest["session_id"] == "aaaa"
+
+
+def test_filters_and_session_subset(store):
+    logs = _save(store, 1, 100.0, "s1")
+    _save(store, 2, 200.0, "s2")
+    source = log_grid.StoreSource(store, ["s1"])
+    errors = [e for e in logs if e["正誤"] == "×"]
+    assert source.count({"correct": ["×"]}) == len(errors)
+    rows, _ = source.page({"correct": ["×"]}, "エラー種別", False, 1000)
+    assert {r["session_id"] for r in rows} == {"s1"}
+    assert [r["エラー種別"] for r in rows] == sorted(e["エラー種別"] for e in errors)
+
+
+def _walk(source, filters, sort, descending, limit):
+    # 最初のページから after で最後まで、最後のページから before で最初まで送る
+    forward, after = [], None
+    while True:
+        rows, keys = source.page(filters, sort, descending, limit, after=after)
+        if not rows:
+            break
+        forward.append([(r.get("session_id"), r["試行"]) for r in rows])
+        after = keys[-1]
+    backward, before, from_end = [], None, True
+    while True:
+        rows, keys = source.page(filters, sort, descending, limit, before=before, from_end=from_end)
+        if not rows:
+            break
+        backward.insert(0, [(r.get("session_id"), r["試行"]) for r in rows])
+        before, from_end = keys[0], False
+    return forward, backward
+
+
+def test_keyset_pages_match_full_sort(store):
+    for i, seed in enumerate(range(1, 5)):
+        _save(store, seed, 100.0 + i, f"s{i}")
+    source = log_grid.StoreSource(store)
+    for sort in log_grid.SORTS:
+        for descending in (False, True):
+            everything = [(r["session_id"], r["試行"]) for r in source.page({}, sort, descending, 10_000)[0]]
+            forward, backward = _walk(source, {"correct": ["×", "○"]}, sort, descending, 7)
+            assert [x for page in forward for x in page] == everything
+            assert [x for page in backward for x in page] == everything
+            assert all(len(page) == 7 for page in forward[:-1])
+
+
+def test_memory_source_pages_like_store(store):
+    logs = _save(store, 3, 100.0, "only")
+    memory, stored = log_grid.MemorySource(logs), log_grid.StoreSource(store, ["only"])
+    for sort in log_grid.SORTS:
+        m_forward, m_backward = _walk(memory, {}, sort, True, 5)
+        s_forward, _ = _walk(stored, {}, sort, True, 5)
+        assert [[t for _, t in p] for p in m_forward] == [[t for _, t in p] for p in s_forward]
+        assert [x for p in m_backward for x in p] == [x for p in m_forward for x in p]
+
+
+def test_every_sort_uses_an_index(store):
+    # 並べ替えの列そのもので絞る表・誤答で絞る表・ルールと正誤で絞る表は、どれも一時的な並べ替えなしで引ける
+    source = log_grid.StoreSource(store)
+    for sort, leading in ((s, c[0]) for s, c in log_grid.SORTS.items()):
+        cases = [{}, {"correct": ["×"]}, {"rule": ["形"], "correct": ["×"]}]
+        if leading in log_grid.FILTER_OPTIONS:
+            cases += [{leading: log_grid.FILTER_OPTIONS[leading][:1]}, {leading: log_grid.FILTER_OPTIONS[leading][:2]}]
+        for filters in cases:
+            clauses, params = source._where(filters)
+            columns = source.order_columns(filters, sort)
+            clauses.append(f"({', '.join(columns)}) > ({', '.join('?' for _ in columns)})")
+            plan = store.conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM trials WHERE {' AND '.join(clauses)} "
+                f"ORDER BY {', '.join(columns)} LIMIT 50", params + [0] * len(columns)).fetchall()
+            detail = " ".join(row[-1] for row in plan)
+            assert "USING INDEX" in detail and "TEMP B-TREE" not in detail, (sort, filters, detail)
+
+
+def test_old_store_gets_trial_start_times(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    store = Store(path)
+    _save(store, 1, 250.0, "old")
+    for name in [r[0] for r in store.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'trials' AND sql IS NOT NULL")]:
+        store.conn.execute(f"DROP INDEX {name}")
+    store.conn.execute("ALTER TABLE trials DROP COLUMN started_at")
+    store.conn.close()
+
+    rows, _ = log_grid.StoreSource(Store(path)).page({}, "試行順", False, 1000)
+    assert rows and {r["session_id"] for r in rows} == {"old"}
+    assert {r[0] for r in Store(path).conn.execute("SELECT DISTINCT started_at FROM trials")} == {250.0}
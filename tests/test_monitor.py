@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from cst import live
+from cst.monitor import _board_html, _script_json
+
+
+@pytest.mark.parametrize("room", ["default", "ward-3", "A_1", "x" * 64])
+def test_valid_room(room):
+    assert live.valid_room(room)
+
+
+@pytest.mark.parametrize("room", ["", "x" * 65, "a/b", "</script>", "部屋", "a b", None])
+def test_invalid_room(room):
+    assert not live.valid_room(room)
+
+
+def test_script_json_cannot_close_script():
+    value = "</script><script>alert(1)</script><!--&"
+    text = _script_json(value)
+    assert not any(c in text for c in "<>&/")
+    assert json.loads(text) == value
+
+
+def test_board_html_embeds_values_escaped():
+    html = _board_html("default/</script>", 8765, "", "tok</script>")
+    script = html.split("<script>", 1)[1]
+    assert script.count("</script>") == 1
+
+
+def test_room_ticket_is_bound_to_room_and_expires():
+    ticket = live.room_ticket("default/ward")
+    assert live.check_ticket("default/ward", ticket)
+    assert not live.check_ticket("default/other", ticket)
+    assert not live.check_ticket("default/ward", None)
+    assert not live.check_ticket("default/ward", live.room_ticket("default/ward", ttl=-1))
+
+
+def test_examiner_secret_is_required_even_without_tenant_tokens():
+    from cst import tenants
+    open_tenant = tenants.Tenant("default", from_value="blog")
+    assert not tenants.is_examiner(open_tenant, "")
+    assert not tenants.is_examiner(open_tenant, "anything")
+    guarded = tenants.Tenant("default", from_value="blog", examiner_tokens=("s3cret",))
+    assert tenants.is_examiner(guarded, "s3cret")
+    assert not tenants.is_examiner(guarded, "s3cre")
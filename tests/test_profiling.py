@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+from cst import profiling
+
+
+def _work(seconds):
+    time.sleep(seconds)
+    return sum(range(1000))
+
+
+def test_disabled_profiling_returns_the_function_unchanged(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ENABLED", False)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert profiling.profiled("noop")(_work) is _work
+
+
+def test_enabled_profiling_writes_profile_memory_and_ranking(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(profiling, "_profile_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(profiling, "_slowest", {})
+    monkeypatch.setattr(profiling, "_written", {})
+
+    fast = profiling.profiled("fast")(lambda: _work(0.001))
+    slow = profiling.profiled("slow")(lambda: _work(0.05))
+    assert fast() == slow() == sum(range(1000))
+
+    ranking = profiling.slowest()
+    assert [r["name"] for r in ranking] == ["slow", "fast"]
+    assert ranking[0]["ms"] >= ranking[1]["ms"]
+    assert profiling.slowest(str(tmp_path)) == ranking
+    assert profiling.slowest(str(tmp_path / "other")) == []
+
+    for record in ranking:
+        with open(tmp_path / record["speedscope"], encoding="utf-8") as f:
+            assert "profiles" in json.load(f)
+        assert (tmp_path / record["memory"]).read_text(encoding="utf-8").startswith("peak=")
+    with open(tmp_path / "slowest.json", encoding="utf-8") as f:
+        assert json.load(f) == ranking
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_nested_calls_are_profiled_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(profiling, "_profile_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(profiling, "_slowest", {})
+    monkeypatch.setattr(profiling, "_written", {})
+
+    inner = profiling.profiled("inner")(lambda: _work(0))
+    outer = profiling.profiled("outer")(lambda: inner())
+    outer()
+    assert [r["name"] for r in profiling.slowest()] == ["outer"]
@@ -0,0 +1,36 @@
+import pytest
+
+from cst import pipeline, registry
+from cst.store import Store, get_store
+
+from conftest import make_session
+
+
+def test_patient_keys_differ_between_tenants(tmp_path):
+    a = Store(str(tmp_path / "a.sqlite3"), "clinic-a")
+    b = Store(str(tmp_path / "b.sqlite3"), "clinic-b")
+    assert registry.patient_key("山田 太郎", a.tenant) != registry.patient_key("山田 太郎", b.tenant)
+    assert registry.patient_key("山田　太郎", a.tenant) == registry.patient_key("山田太郎", a.tenant)
+
+
+def _persist_payload(tenant):
+    session_id, meta, logs = make_session(7, patient_name="佐藤 花子")
+    return {"session_id": session_id, "meta": meta, "logs": logs, "summary": None, "tenant": tenant}
+
+
+def test_persist_saves_session_and_summary():
+    payload = _persist_payload("clinic-persist")
+    pipeline._persist(payload)
+    store = get_store("clinic-persist")
+    assert len(store.load_logs(payload["session_id"])) == len(payload["logs"])
+    assert [row["session_id"] for row in registry.history("佐藤 花子", store)] == [payload["session_id"]]
+
+
+def test_persist_keeps_nothing_when_summary_fails(monkeypatch):
+    payload = _persist_payload("clinic-rollback")
+    def fail(*_):
+        raise RuntimeError("集計行の保存に失敗")
+    monkeypatch.setattr(registry, "insert_summaries", fail)
+    with pytest.raises(RuntimeError):
+        pipeline._persist(payload)
+    assert get_store("clinic-rollback").load_logs(payload["session_id"]) == []
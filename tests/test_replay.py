@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from cst import engine
+from cst.config import REFERENCE_CARDS, RULE_LABEL
+from cst.replay import Replay
+
+# 試行ごとに変わる・時刻で決まるので比べないキー
+_SKIP = {"logs", "trial_times", "target_card", "finished_at"}
+
+
+def _played_logs(seed):
+    # たいていはルールどおりに選び、ときどき外す検査（カテゴリーの達成とルールの切り替えを含む）
+    rng = random.Random(seed)
+    state = engine.default_state()
+    engine.start_test(state)
+    while not state["finished"]:
+        rule, target = engine.current_rule(state), state["target_card"]
+        matching = [i for i, card in enumerate(REFERENCE_CARDS) if card[rule] == target[rule]]
+        index = matching[0] if matching and rng.random() < 0.85 else rng.randrange(len(REFERENCE_CARDS))
+        engine.score_selection(state, index)
+    assert state["categories_achieved"] >= 2
+    return state["logs"]
+
+
+def _naive(logs, n):
+    # 1 試行目から n 試行目までをそのまま適用した状態
+    state = engine.default_state()
+    state["started"] = True
+    for entry in logs[:n]:
+        engine.replay_step(state, entry)
+    return state
+
+
+@pytest.mark.parametrize("snapshot_every", [1, 5, 8])
+def test_state_at_matches_full_replay(snapshot_every):
+    logs = _played_logs(seed=snapshot_every)
+    replay = Replay(logs, snapshot_every=snapshot_every)
+    assert replay.mismatches == []
+    # スナップショットの境目とその前後をすべて含む。後ろから引き直しても（スナップショットを書き換えていなければ）同じ
+    for n in [*range(len(logs) + 1), *reversed(range(len(logs) + 1))]:
+        expected, got = _naive(logs, n), replay.state_at(n)
+        assert {k: v for k, v in got.items() if k not in _SKIP} == \
+               {k: v for k, v in expected.items() if k not in _SKIP}, n
+        start = n // snapshot_every * snapshot_every
+        assert got["logs"] == expected["logs"][start:n]
+
+
+def test_frame_shows_previous_feedback_and_rule_in_force():
+    logs = _played_logs(seed=12)
+    replay = Replay(logs)
+    for n in range(1, len(logs) + 1):
+        frame, entry = replay.frame(n), logs[n - 1]
+        expected_feedback = None if n == 1 else ("correct" if logs[n - 2]["正誤"] == "○" else "incorrect")
+        assert frame["feedback"] == expected_feedback, n
+        assert RULE_LABEL[frame["rule"]] == entry["正解ルール"], n
+        assert frame["categories"] == entry["達成カテゴリー"], n
+        assert frame["target"] == engine.logged_target(entry)
+        assert frame["correct"] == (entry["正誤"] == "○")
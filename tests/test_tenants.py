@@ -0,0 +1,11 @@
+import time
+
+from cst import tenants
+
+
+def test_rate_limit_does_not_block():
+    tenant = tenants.Tenant("busy-test", rate_per_minute=60, burst=2)
+    t0 = time.perf_counter()
+    results = [tenants.allow_rerun(tenant) for _ in range(5)]
+    assert time.perf_counter() - t0 < 0.1
+    assert results == [True, True, False, False, False]